@@ -23,10 +23,13 @@ import numpy
 def with_slots(cls):
     """
     Decorator for a class with __slots__. It automatically defines
-    the methods __eq__, __ne__, assert_equal, __getstate__ and __setstate__
+    the methods __eq__, __ne__, assert_equal, __getstate__ and __setstate__.
+    The slots with a name starting with an underscore are considered caches:
+    they are ignored in the comparisons, they are not pickled and they are
+    set to None when unpickling.
     """
     def _compare(self, other):
-        for slot in self.__class__.__slots__:
+        for slot in _public(self.__class__.__slots__):
             attr = operator.attrgetter(slot)
             source = attr(self)
             target = attr(other)
@@ -50,11 +53,11 @@ def with_slots(cls):
 
     def __getstate__(self):
         return dict((slot, getattr(self, slot))
-                    for slot in self.__class__.__slots__)
+                    for slot in _public(self.__class__.__slots__))
 
     def __setstate__(self, state):
         for slot in self.__class__.__slots__:
-            setattr(self, slot, state[slot])
+            setattr(self, slot, None if slot.startswith('_') else state[slot])
 
     cls.__slots__  # raise an AttributeError for missing slots
     cls.__eq__ = __eq__
@@ -63,3 +66,10 @@ def with_slots(cls):
     cls.__getstate__ = __getstate__
     cls.__setstate__ = __setstate__
     return cls
+
+
+def _public(slots):
+    """
+    :returns: the slots with a name not starting with an underscore
+    """
+    return [slot for slot in slots if not slot.startswith('_')]
@@ -15,8 +15,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 :mod:`openquake.hazardlib.calc.disagg` contains
-:func:`disaggregation` as well as several aggregation functions for
-extracting a specific PMF from the result of :func:`disaggregation`.
+:func:`disaggregation`, its multi-site counterpart :func:`disaggregations`,
+its multiprocessing counterpart :func:`parallel_disaggregation`
+as well as several aggregation functions for extracting a specific PMF from
+the result of :func:`disaggregation`.
 """
 from __future__ import division
 from openquake.baselib.python3compat import range
@@ -24,9 +26,18 @@ import sys
 import numpy
 import warnings
 import collections
+import multiprocessing
 from openquake.baselib.python3compat import raise_
 
+from openquake.hazardlib import const
 from openquake.hazardlib.calc import filters
+from openquake.hazardlib.calc.hazard_curve import zero_curves
+from openquake.hazardlib.gsim.base import (
+    shared_terms, _truncnorm_sf, _disaggregate_standard_imls)
+from openquake.hazardlib.imt import from_string
+from openquake.hazardlib.source.rupture import (
+    ParametricProbabilisticRupture)
+from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.geo.geodetic import npoints_between
 from openquake.hazardlib.geo.utils import get_longitudinal_extent
 from openquake.hazardlib.geo.utils import get_spherical_bounding_box, cross_idl
@@ -37,7 +48,7 @@ def disaggregation(
         sources, site, imt, iml, gsims, truncation_level,
         n_epsilons, mag_bin_width, dist_bin_width, coord_bin_width,
         source_site_filter=filters.source_site_noop_filter,
-        rupture_site_filter=filters.rupture_site_noop_filter):
+        rupture_site_filter=filters.rupture_site_noop_filter, sparse=False):
     """
     Compute "Disaggregation" matrix representing conditional probability of an
     intensity mesaure type ``imt`` exceeding, at least once, an intensity
@@ -95,6 +106,9 @@ def disaggregation(
     :param rupture_site_filter:
         Optional rupture-site filter function. See
         :mod:`openquake.hazardlib.calc.filters`.
+    :param sparse:
+        If true, return the disaggregation matrix as a
+        :class:`SparseDisaggMatrix`, storing only the nonzero bins.
 
     :returns:
         A tuple of two items. First is itself a tuple of bin edges information
@@ -104,7 +118,7 @@ def disaggregation(
         Second item is 6d-array representing the full disaggregation matrix.
         Dimensions are in the same order as bin edges in the first item
         of the result tuple. The matrix can be used directly by pmf-extractor
-        functions.
+        functions, in both the dense and the sparse format.
     """
     bins_data = _collect_bins_data(sources, site, imt, iml, gsims,
                                    truncation_level, n_epsilons,
@@ -120,7 +134,7 @@ def disaggregation(
 
     bin_edges = _define_bins(bins_data, mag_bin_width, dist_bin_width,
                              coord_bin_width, truncation_level, n_epsilons)
-    diss_matrix = _arrange_data_in_bins(bins_data, bin_edges)
+    diss_matrix = _arrange_data_in_bins(bins_data, bin_edges, sparse)
     return bin_edges, diss_matrix
 
 
@@ -207,6 +221,538 @@ def _collect_bins_data(sources, site, imt, iml, gsims,
     return (mags, dists, lons, lats, tect_reg_types, trt_bins, probs_no_exceed)
 
 
+def parallel_disaggregation(
+        sources, site, imt, iml, gsims, truncation_level, n_epsilons,
+        mag_bins, dist_bins, lon_bins, lat_bins, trt_bins=None,
+        source_site_filter=filters.source_site_noop_filter,
+        rupture_site_filter=filters.rupture_site_noop_filter,
+        sparse=False, block_size=10, processes=None):
+    """
+    Compute the disaggregation matrix of :func:`disaggregation`, optionally
+    in a pool of processes, given the bin edges in advance. The sources are
+    split in blocks of ``block_size`` sources and each block is processed
+    by a task, which returns the bin indices and the logarithms of the
+    probabilities of no exceedance of its ruptures; they are accumulated
+    in the order of the blocks, i.e. of the ruptures, so that the result
+    does not depend on the number of processes and is exactly the one of
+    :func:`disaggregation` with the same bin edges. Ruptures outside of
+    the bin edges are discarded.
+
+    :param mag_bins:
+        Magnitude bin edges.
+    :param dist_bins:
+        Joyner-Boore distance bin edges, in km.
+    :param lon_bins:
+        Longitude bin edges, in decimal degrees.
+    :param lat_bins:
+        Latitude bin edges, in decimal degrees.
+    :param trt_bins:
+        Optional list of tectonic region types. If not given, they are
+        ordered by first appearance in the sources passing the source-site
+        filter, as in :func:`disaggregation`.
+    :param block_size:
+        Number of sources per task.
+    :param processes:
+        Number of worker processes; by default (None or 1) the blocks are
+        processed in the current process.
+
+    The other parameters are the same as in :func:`disaggregation`, except
+    that the sources, the GSIMs and the filters must be picklable when
+    ``processes`` is greater than 1.
+
+    :returns:
+        A pair (bin_edges, matrix) as in :func:`disaggregation`.
+    """
+    sitecol = SiteCollection([site])
+    sources = [src for src, _ in source_site_filter(
+        (source, sitecol) for source in sources)]
+    if trt_bins is None:
+        trt_bins = []
+        for source in sources:
+            if source.tectonic_region_type not in trt_bins:
+                trt_bins.append(source.tectonic_region_type)
+    bin_edges = (numpy.array(mag_bins, float), numpy.array(dist_bins, float),
+                 numpy.array(lon_bins, float), numpy.array(lat_bins, float),
+                 numpy.linspace(-truncation_level, truncation_level,
+                                n_epsilons + 1), list(trt_bins))
+    shape = tuple(len(edges) - 1 for edges in bin_edges[:-1]) + (
+        len(trt_bins),)
+    blocks = [(sources[i:i + block_size], site, imt, iml, gsims,
+               truncation_level, n_epsilons, rupture_site_filter, bin_edges)
+              for i in range(0, len(sources), block_size)]
+    if processes is None or processes == 1:
+        partials = [_disagg_block(block) for block in blocks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            partials = pool.map(_disagg_block, blocks)
+        finally:
+            pool.close()
+            pool.join()
+
+    if not any(num for num, _, _ in partials):
+        warnings.warn(
+            'No ruptures have contributed to the hazard at site %s'
+            % site,
+            RuntimeWarning
+        )
+        return None, None
+    flat_idx = numpy.concatenate([idx for _, idx, _ in partials])
+    log_pnes = numpy.concatenate([lp for _, _, lp in partials])
+    return bin_edges, _get_matrix(shape, flat_idx, log_pnes, sparse)
+
+
+def _disagg_block(args):
+    """
+    Task of :func:`parallel_disaggregation`.
+
+    :returns:
+        A triple (number of ruptures, flat bin indices, logarithms of the
+        probabilities of no exceedance) as returned by
+        :func:`_get_log_pnes`, for the ruptures within the bin edges.
+    """
+    (sources, site, imt, iml, gsims, truncation_level, n_epsilons,
+     rupture_site_filter, bin_edges) = args
+    trt_bins = bin_edges[-1]
+    bins_data = _collect_bins_data(
+        sources, site, imt, iml, gsims, truncation_level, n_epsilons,
+        filters.source_site_noop_filter, rupture_site_filter)
+    mags, dists, lons, lats, tect_reg_types, block_trts, pnes = bins_data
+    if len(mags) == 0:
+        return 0, numpy.zeros(0, int), numpy.zeros(0)
+    missing = set(block_trts) - set(trt_bins)
+    if missing:
+        raise ValueError('Tectonic region types not in trt_bins: %s'
+                         % ', '.join(sorted(missing)))
+    # convert the numbering of the block into the global one
+    trt_nums = numpy.array([trt_bins.index(trt) for trt in block_trts])
+    bins_data = (mags, dists, lons, lats, trt_nums[tect_reg_types],
+                 trt_bins, pnes)
+    _, flat_idx, log_pnes = _get_log_pnes(bins_data, bin_edges)
+    return len(mags), flat_idx, log_pnes
+
+
+def disaggregations(
+        sources, sites, imtls, gsims, truncation_level,
+        n_epsilons, mag_bin_width, dist_bin_width, coord_bin_width,
+        source_site_filter=filters.source_site_noop_filter,
+        rupture_site_filter=filters.rupture_site_noop_filter, sparse=False):
+    """
+    Compute the disaggregation matrices for many sites, intensity measure
+    types and intensity measure levels at once. The result is the same as
+    calling :func:`disaggregation` once per site, IMT and IML, but each
+    rupture is generated only once and the contexts are computed for all
+    the sites affected by it together.
+
+    :param sources:
+        Seismic source model, as for :func:`disaggregation`.
+    :param sites:
+        :class:`~openquake.hazardlib.site.SiteCollection` of interest.
+    :param imtls:
+        Dictionary mapping intensity measure type objects to the levels
+        to disaggregate, as an array of shape (N, L) where N is the number
+        of sites and L the number of levels for the IMT; a 1d array of
+        length N is accepted for a single level per site.
+    :param gsims:
+        Tectonic region type to GSIM objects mapping.
+
+    The other parameters, including ``sparse``, are the same as in
+    :func:`disaggregation`.
+
+    :returns:
+        A dictionary (site index, imt, level index) -> (bin_edges, matrix),
+        where the site index is the position of the site in ``sites``
+        and (bin_edges, matrix) is what :func:`disaggregation` would return
+        for that site, IMT and level, i.e. (None, None) if no ruptures have
+        contributed to the hazard at the site.
+    """
+    imtls = dict((imt, numpy.array(imls, float).reshape(len(sites), -1))
+                 for imt, imls in imtls.items())
+    all_bins_data = _collect_sites_bins_data(
+        sources, sites, imtls, gsims, truncation_level, n_epsilons,
+        source_site_filter, rupture_site_filter)
+    keys = [(imt, lvl) for imt, imls in imtls.items()
+            for lvl in range(imls.shape[1])]
+    return _build_matrices(sites, all_bins_data, keys, mag_bin_width,
+                           dist_bin_width, coord_bin_width, truncation_level,
+                           n_epsilons, sparse)
+
+
+def _build_matrices(sites, all_bins_data, keys, mag_bin_width,
+                    dist_bin_width, coord_bin_width, truncation_level,
+                    n_epsilons, sparse):
+    """
+    Build the disaggregation matrices from the output of
+    :func:`_collect_sites_bins_data`.
+
+    :param keys: a list of pairs (imt, level index)
+    :returns: a dictionary as described in :func:`disaggregations`
+    """
+    result = {}
+    for sid, (site, bins_data) in enumerate(zip(sites, all_bins_data)):
+        mags, dists, lons, lats, tect_reg_types, trt_bins, pnes = bins_data
+        if len(mags) == 0:
+            warnings.warn(
+                'No ruptures have contributed to the hazard at site %s'
+                % site,
+                RuntimeWarning
+            )
+            for imt, lvl in keys:
+                result[sid, imt, lvl] = None, None
+            continue
+        bin_edges = _define_bins(bins_data, mag_bin_width, dist_bin_width,
+                                 coord_bin_width, truncation_level,
+                                 n_epsilons)
+        for imt, lvl in keys:
+            diss_matrix = _arrange_data_in_bins(
+                (mags, dists, lons, lats, tect_reg_types, trt_bins,
+                 pnes[imt, lvl]), bin_edges, sparse)
+            result[sid, imt, lvl] = bin_edges, diss_matrix
+    return result
+
+
+def _collect_sites_bins_data(sources, sites, imtls, gsims,
+                             truncation_level, n_epsilons,
+                             source_site_filter, rupture_site_filter):
+    """
+    Multi-site version of :func:`_collect_bins_data`. Returns a list with
+    an item per site, like the output of :func:`_collect_bins_data` but for
+    the last element, which is a dictionary (imt, level index) ->
+    probabilities of no exceedance.
+    """
+    sites_data = []
+    for _ in range(len(sites)):
+        pnes = dict(((imt, lvl), [])
+                    for imt, imls in imtls.items()
+                    for lvl in range(imls.shape[1]))
+        # mags, dists, lons, lats, tect_reg_types, trt_nums, pnes
+        sites_data.append(([], [], [], [], [], {}, pnes))
+
+    sources_sites = ((source, sites) for source in sources)
+    for source, s_sites in source_site_filter(sources_sites):
+        try:
+            tect_reg = source.tectonic_region_type
+            gsim = gsims[tect_reg]
+            # the tectonic region types are numbered per site in order of
+            # appearance, as :func:`_collect_bins_data` does
+            for pos in numpy.searchsorted(sites.indices, s_sites.indices):
+                trt_nums = sites_data[pos][5]
+                if tect_reg not in trt_nums:
+                    trt_nums[tect_reg] = len(trt_nums)
+
+            ruptures_sites = ((rupture, s_sites)
+                              for rupture in source.iter_ruptures())
+            for rupture, r_sites in rupture_site_filter(ruptures_sites):
+                positions = numpy.searchsorted(sites.indices, r_sites.indices)
+                sitemesh = r_sites.mesh
+                jb_dists = rupture.surface.get_joyner_boore_distance(sitemesh)
+                closest_points = rupture.surface.get_closest_points(sitemesh)
+                sctx, rctx, dctx = gsim.make_contexts(r_sites, rupture)
+                pnes = {}
+                for imt, imls in imtls.items():
+                    for lvl in range(imls.shape[1]):
+                        poes_given_rup_eps = gsim.disaggregate_poe(
+                            sctx, rctx, dctx, imt, imls[positions, lvl],
+                            truncation_level, n_epsilons)
+                        pnes[imt, lvl] = rupture.get_probability_no_exceedance(
+                            poes_given_rup_eps)
+                for i, pos in enumerate(positions):
+                    (mags, dists, lons, lats, tect_reg_types, trt_nums,
+                     probs_no_exceed) = sites_data[pos]
+                    mags.append(rupture.mag)
+                    dists.append(jb_dists[i])
+                    lons.append(closest_points.lons[i])
+                    lats.append(closest_points.lats[i])
+                    tect_reg_types.append(trt_nums[tect_reg])
+                    for key, pne in pnes.items():
+                        probs_no_exceed[key].append(pne[i])
+        except Exception as err:
+            etype, err, tb = sys.exc_info()
+            msg = 'An error occurred with source id=%s. Error: %s'
+            msg %= (source.source_id, str(err))
+            raise_(etype, msg, tb)
+
+    all_bins_data = []
+    for (mags, dists, lons, lats, tect_reg_types, trt_nums,
+         probs_no_exceed) in sites_data:
+        trt_bins = [
+            trt for (num, trt) in sorted((num, trt)
+                                         for (trt, num) in trt_nums.items())
+        ]
+        all_bins_data.append((
+            numpy.array(mags, float), numpy.array(dists, float),
+            numpy.array(lons, float), numpy.array(lats, float),
+            numpy.array(tect_reg_types, int), trt_bins,
+            dict((key, numpy.array(pnes, float))
+                 for key, pnes in probs_no_exceed.items())))
+    return all_bins_data
+
+
+# per rupture-site pair data stored by calc_hazard_curves_and_disagg
+disagg_pair_dt = numpy.dtype([
+    ('sid', numpy.uint32), ('rup', numpy.uint32), ('trt', numpy.uint16),
+    ('mag', float), ('dist', float), ('lon', float), ('lat', float)])
+
+
+class DisaggData(object):
+    """
+    Data collected by :func:`calc_hazard_curves_and_disagg` during the
+    hazard pass, enough to compute the disaggregation matrices for any
+    intensity measure level without generating the ruptures or calling the
+    GSIMs again.
+
+    :param sites:
+        The :class:`~openquake.hazardlib.site.SiteCollection` of the
+        calculation.
+    :param truncation_level:
+        The truncation level of the calculation.
+    :param gsims:
+        A list of GSIMs, one for each tectonic region type in ``trts``.
+    :param trts:
+        A list of tectonic region types.
+    :param site_trts:
+        A list with, for each site, the indices in ``trts`` of the
+        tectonic region types affecting the site, in order of appearance.
+    :param pairs:
+        A :data:`disagg_pair_dt` array with the site index, the rupture
+        index, the tectonic region type index, the rupture magnitude,
+        the Joyner-Boore distance and the closest point of each pair
+        rupture-site.
+    :param means:
+        A dictionary IMT string -> array with the mean of each pair, in
+        the GSIM distribution space.
+    :param stddevs:
+        A dictionary IMT string -> array with the total standard deviation
+        of each pair.
+    :param no_occurrence:
+        An array with the probability of no occurrence in the time span
+        of each Poissonian rupture, NaN for the other ruptures.
+    :param ruptures:
+        A dictionary rupture index -> rupture for the ruptures with a NaN
+        in ``no_occurrence``.
+    """
+    def __init__(self, sites, truncation_level, gsims, trts, site_trts,
+                 pairs, means, stddevs, no_occurrence, ruptures):
+        self.sites = sites
+        self.truncation_level = truncation_level
+        self.gsims = gsims
+        self.trts = trts
+        self.site_trts = site_trts
+        self.pairs = pairs
+        self.means = means
+        self.stddevs = stddevs
+        self.no_occurrence = no_occurrence
+        self.ruptures = ruptures
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def get_probs_no_exceed(self, imt, imls, n_epsilons):
+        """
+        :param imt:
+            An intensity measure type, as a string or an object.
+        :param imls:
+            An array with a level for each site.
+        :param n_epsilons:
+            Integer number of epsilon histogram bins.
+        :returns:
+            An array of shape (P, n_epsilons), with P the number of pairs,
+            with the probabilities of no exceedance of the levels, as
+            :func:`disaggregations` would compute them.
+        """
+        imt = str(imt)
+        imls = numpy.asarray(imls, float)[self.pairs['sid']]
+        values = numpy.zeros(len(self.pairs))
+        for t, gsim in enumerate(self.gsims):
+            idx = self.pairs['trt'] == t
+            values[idx] = gsim.to_distribution_values(imls[idx])
+        standard_imls = (values - self.means[imt]) / self.stddevs[imt]
+        poes = _disaggregate_standard_imls(
+            standard_imls, self.truncation_level, n_epsilons)
+        no_occ = self.no_occurrence[self.pairs['rup']]
+        pnes = no_occ[:, None] ** poes
+        if self.ruptures:
+            # group the pairs by rupture with a single sort
+            order = numpy.argsort(self.pairs['rup'], kind='mergesort')
+            rups = self.pairs['rup'][order]
+            rup_idxs = sorted(self.ruptures)
+            starts = numpy.searchsorted(rups, rup_idxs, 'left')
+            stops = numpy.searchsorted(rups, rup_idxs, 'right')
+            for rup_idx, start, stop in zip(rup_idxs, starts, stops):
+                idx = order[start:stop]
+                rupture = self.ruptures[rup_idx]
+                pnes[idx] = rupture.get_probability_no_exceedance(poes[idx])
+        return pnes
+
+    def disaggregations(self, imtls, n_epsilons, mag_bin_width,
+                        dist_bin_width, coord_bin_width, sparse=False):
+        """
+        Compute the disaggregation matrices for the given levels.
+
+        :param imtls:
+            Dictionary mapping intensity measure types, as strings or
+            objects, to the levels to disaggregate, as an array of shape
+            (N, L) where N is the number of sites and L the number of
+            levels; a 1d array of length N is accepted for a single level
+            per site. The IMTs must be among the ones of the hazard pass.
+
+        The other parameters are the same as in :func:`disaggregation`.
+
+        :returns:
+            A dictionary (site index, imt, level index) -> (bin_edges, matrix)
+            as in :func:`disaggregations`.
+        """
+        num_sites = len(self.sites)
+        imtls = dict((imt, numpy.array(imls, float).reshape(num_sites, -1))
+                     for imt, imls in imtls.items())
+        keys = [(imt, lvl) for imt, imls in imtls.items()
+                for lvl in range(imls.shape[1])]
+        pnes = dict(((imt, lvl), self.get_probs_no_exceed(
+            imt, imtls[imt][:, lvl], n_epsilons)) for imt, lvl in keys)
+
+        all_bins_data = []
+        order = numpy.argsort(self.pairs['sid'], kind='mergesort')
+        sids = self.pairs['sid'][order]
+        for sid in range(num_sites):
+            start, stop = numpy.searchsorted(sids, [sid, sid + 1])
+            idx = order[start:stop]
+            pairs = self.pairs[idx]
+            # map the tectonic region types of the calculation into the
+            # tectonic region type bins of the site
+            trt_nums = numpy.zeros(len(self.trts), int)
+            trt_nums[self.site_trts[sid]] = numpy.arange(
+                len(self.site_trts[sid]))
+            all_bins_data.append((
+                pairs['mag'], pairs['dist'], pairs['lon'], pairs['lat'],
+                trt_nums[pairs['trt']],
+                [self.trts[t] for t in self.site_trts[sid]],
+                dict((key, pne[idx]) for key, pne in pnes.items())))
+        return _build_matrices(self.sites, all_bins_data, keys,
+                               mag_bin_width, dist_bin_width,
+                               coord_bin_width, self.truncation_level,
+                               n_epsilons, sparse)
+
+
+def calc_hazard_curves_and_disagg(
+        sources, sites, imtls, gsim_by_trt, truncation_level,
+        source_site_filter=filters.source_site_noop_filter,
+        rupture_site_filter=filters.rupture_site_noop_filter):
+    """
+    Compute the hazard curves as
+    :func:`~openquake.hazardlib.calc.hazard_curve.calc_hazard_curves` does
+    and, in the same pass over the ruptures, collect the data needed to
+    disaggregate the hazard at any level, i.e. the disaggregation keys
+    (magnitude, Joyner-Boore distance, closest point and tectonic region
+    type) of each rupture-site pair and the means and standard deviations
+    computed by the GSIMs. Typically the levels are obtained from the
+    curves, for instance for a target probability of exceedance, and then
+    passed to :meth:`DisaggData.disaggregations`.
+
+    The parameters are the same as in
+    :func:`~openquake.hazardlib.calc.hazard_curve.calc_hazard_curves`,
+    except that ``truncation_level`` must be positive, as in
+    :func:`disaggregation`.
+
+    :returns:
+        A pair (curves, disagg_data), where ``curves`` is the same array
+        returned by
+        :func:`~openquake.hazardlib.calc.hazard_curve.calc_hazard_curves`
+        and ``disagg_data`` is a :class:`DisaggData` instance.
+    """
+    if not truncation_level > 0:
+        raise ValueError('truncation level must be positive')
+    imts = [(imt, from_string(imt), numpy.array(imls, float))
+            for imt, imls in imtls.items()]
+    pnos = dict((imt, numpy.ones((len(sites), len(imls))))
+                for imt, _, imls in imts)
+    trts = []
+    gsims = []
+    trt_idx = {}
+    site_trts = [[] for _ in range(len(sites))]
+    pairs = []
+    means = dict((imt, []) for imt in imtls)
+    stddevs = dict((imt, []) for imt in imtls)
+    no_occurrence = []
+    ruptures = {}
+
+    sources_sites = ((source, sites) for source in sources)
+    for source, s_sites in source_site_filter(sources_sites):
+        try:
+            trt = source.tectonic_region_type
+            gsim = gsim_by_trt[trt]
+            if trt not in trt_idx:
+                trt_idx[trt] = len(trts)
+                trts.append(trt)
+                gsims.append(gsim)
+            t = trt_idx[trt]
+            # the tectonic region types are numbered per site in order of
+            # appearance, as :func:`_collect_bins_data` does
+            for pos in numpy.searchsorted(sites.indices, s_sites.indices):
+                if t not in site_trts[pos]:
+                    site_trts[pos].append(t)
+
+            ruptures_sites = ((rupture, s_sites)
+                              for rupture in source.iter_ruptures())
+            for rupture, r_sites in rupture_site_filter(ruptures_sites):
+                rup_idx = len(no_occurrence)
+                tom = getattr(rupture, 'temporal_occurrence_model', None)
+                if (isinstance(rupture, ParametricProbabilisticRupture) and
+                        isinstance(tom, PoissonTOM)):
+                    no_occurrence.append(
+                        1 - tom.get_probability_one_or_more_occurrences(
+                            rupture.occurrence_rate))
+                else:
+                    no_occurrence.append(numpy.nan)
+                    ruptures[rup_idx] = rupture
+
+                positions = numpy.searchsorted(sites.indices, r_sites.indices)
+                sitemesh = r_sites.mesh
+                closest_points = rupture.surface.get_closest_points(sitemesh)
+                rup_pairs = numpy.zeros(len(positions), disagg_pair_dt)
+                rup_pairs['sid'] = positions
+                rup_pairs['rup'] = rup_idx
+                rup_pairs['trt'] = t
+                rup_pairs['mag'] = rupture.mag
+                rup_pairs['dist'] = rupture.surface.get_joyner_boore_distance(
+                    sitemesh)
+                rup_pairs['lon'] = closest_points.lons
+                rup_pairs['lat'] = closest_points.lats
+                pairs.append(rup_pairs)
+
+                sctx, rctx, dctx = gsim.make_contexts(r_sites, rupture)
+                with shared_terms(gsim):
+                    for imt, imt_obj, imls in imts:
+                        gsim._check_imt(imt_obj)
+                        mean, [stddev] = gsim.get_mean_and_stddevs(
+                            sctx, rctx, dctx, imt_obj, [const.StdDev.TOTAL])
+                        means[imt].append(mean)
+                        stddevs[imt].append(stddev)
+                        values = ((gsim.to_distribution_values(imls) -
+                                   mean[:, None]) / stddev[:, None])
+                        poes = _truncnorm_sf(truncation_level, values)
+                        pnos[imt][positions] *= (
+                            rupture.get_probability_no_exceedance(poes))
+        except Exception as err:
+            etype, err, tb = sys.exc_info()
+            msg = 'An error occurred with source id=%s. Error: %s'
+            msg %= (source.source_id, str(err))
+            raise_(etype, msg, tb)
+
+    curves = zero_curves(len(sites), imtls)
+    for imt in imtls:
+        curves[imt] = 1. - pnos[imt]
+
+    def concat(arrays, dtype=float):
+        return numpy.concatenate(arrays) if arrays else numpy.zeros(0, dtype)
+    disagg_data = DisaggData(
+        sites, truncation_level, gsims, trts, site_trts,
+        concat(pairs, disagg_pair_dt),
+        dict((imt, concat(means[imt])) for imt in imtls),
+        dict((imt, concat(stddevs[imt])) for imt in imtls),
+        numpy.array(no_occurrence, float), ruptures)
+    return curves, disagg_data
+
+
 def _define_bins(bins_data, mag_bin_width, dist_bin_width,
                  coord_bin_width, truncation_level, n_epsilons):
     """
@@ -249,10 +795,51 @@ def _define_bins(bins_data, mag_bin_width, dist_bin_width,
     return mag_bins, dist_bins, lon_bins, lat_bins, eps_bins, trt_bins
 
 
-def _arrange_data_in_bins(bins_data, bin_edges):
+class SparseDisaggMatrix(object):
     """
-    Given bins data, as it comes from :func:`_collect_bins_data`, and bin edges
-    from :func:`_define_bins`, create a normalized 6d disaggregation matrix.
+    Disaggregation matrix in coordinate (COO) format: only the bins with
+    a nonzero probability are stored. It can be passed directly to the
+    pmf-extractor functions, without building the dense 6d-array.
+
+    :param shape:
+        Shape of the equivalent dense matrix, a tuple of six integers.
+    :param coords:
+        Integer array of shape (6, K) with the indices of the K nonzero bins.
+    :param values:
+        Float array of length K with the probabilities of the bins.
+    """
+    def __init__(self, shape, coords, values):
+        self.shape = tuple(shape)
+        self.coords = coords
+        self.values = values
+
+    def todense(self):
+        """
+        :returns: the equivalent dense 6d-array
+        """
+        matrix = numpy.zeros(self.shape)
+        matrix[tuple(self.coords)] = self.values
+        return matrix
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return '<%s shape=%s, %d nonzero bins>' % (
+            self.__class__.__name__, self.shape, len(self))
+
+
+def _get_log_pnes(bins_data, bin_edges):
+    """
+    Given bins data, as it comes from :func:`_collect_bins_data`, and bin
+    edges, as they come from :func:`_define_bins`, find the bin of each
+    (rupture, epsilon) pair.
+
+    :returns:
+        A triple (shape, flat_idx, log_pnes) with the shape of the
+        disaggregation matrix, the flat indices of the bins in the matrix
+        and the logarithms of the probabilities of no exceedance. Ruptures
+        outside of the bin edges are discarded.
     """
     (mags, dists, lons, lats, tect_reg_types, trt_bins, probs_no_exceed) = \
         bins_data
@@ -262,8 +849,8 @@ def _arrange_data_in_bins(bins_data, bin_edges):
     dim2 = len(dist_bins) - 1
     dim3 = len(lon_bins) - 1
     dim4 = len(lat_bins) - 1
-    shape = (dim1, dim2, dim3, dim4, len(eps_bins) - 1, len(trt_bins))
-    diss_matrix = numpy.ones(shape)
+    n_eps = len(eps_bins) - 1
+    shape = (dim1, dim2, dim3, dim4, n_eps, len(trt_bins))
 
     # find bin indexes of rupture attributes; bins are assumed closed
     # on the lower bound, and open on the upper bound, that is [ )
@@ -285,14 +872,75 @@ def _arrange_data_in_bins(bins_data, bin_edges):
     lons_idx[lons_idx == dim3] = dim3 - 1
     lats_idx[lats_idx == dim4] = dim4 - 1
 
-    for i, (i_mag, i_dist, i_lon, i_lat, i_trt) in \
-        enumerate(
-            zip(mags_idx, dists_idx, lons_idx, lats_idx, tect_reg_types)):
+    # the bin edges computed by _define_bins contain all the ruptures,
+    # but the ones given by the user may not
+    ok = ((mags_idx >= 0) & (mags_idx < dim1) &
+          (dists_idx >= 0) & (dists_idx < dim2) &
+          (lons_idx >= 0) & (lons_idx < dim3) &
+          (lats_idx >= 0) & (lats_idx < dim4))
+    probs_no_exceed = numpy.asarray(probs_no_exceed, float)
+    if not ok.all():
+        mags_idx, dists_idx, lons_idx, lats_idx = (
+            mags_idx[ok], dists_idx[ok], lons_idx[ok], lats_idx[ok])
+        tect_reg_types = numpy.asarray(tect_reg_types)[ok]
+        probs_no_exceed = probs_no_exceed[ok]
+
+    # flat index of each (rupture, epsilon) pair in the 6d matrix
+    num_ruptures = len(mags_idx)
+    eps_idx = numpy.tile(numpy.arange(n_eps), num_ruptures)
+    flat_idx = numpy.ravel_multi_index(
+        [numpy.repeat(mags_idx, n_eps), numpy.repeat(dists_idx, n_eps),
+         numpy.repeat(lons_idx, n_eps), numpy.repeat(lats_idx, n_eps),
+         eps_idx, numpy.repeat(tect_reg_types, n_eps)], shape)
+    with numpy.errstate(divide='ignore'):
+        log_pnes = numpy.log(probs_no_exceed.reshape(-1))
+    return shape, flat_idx, log_pnes
+
+
+def _arrange_data_in_bins(bins_data, bin_edges, sparse=False):
+    """
+    Given bins data, as it comes from :func:`_collect_bins_data`, and bin edges
+    from :func:`_define_bins`, create a normalized 6d disaggregation matrix.
+
+    The probabilities of no exceedance of the ruptures falling in the same
+    bin are multiplied by summing their logarithms, so there is no loop
+    on the ruptures. If ``sparse`` is true a :class:`SparseDisaggMatrix`
+    is returned instead of a dense array.
+    """
+    shape, flat_idx, log_pnes = _get_log_pnes(bins_data, bin_edges)
+    return _get_matrix(shape, flat_idx, log_pnes, sparse)
+
+
+def _get_matrix(shape, flat_idx, log_pnes, sparse=False):
+    """
+    :returns: the disaggregation matrix, dense or sparse, from the flat
+        indices and the logarithms of the probabilities of no exceedance
+        returned by :func:`_get_log_pnes`
+    """
+    if not sparse:
+        return 1 - numpy.exp(_log_pne_matrix(shape, flat_idx, log_pnes))
+    uniq, inverse = numpy.unique(flat_idx, return_inverse=True)
+    values = 1 - numpy.exp(numpy.bincount(inverse, log_pnes))
+    return _to_sparse(shape, uniq, values)
 
-        diss_matrix[i_mag, i_dist, i_lon, i_lat, :, i_trt] *= \
-            probs_no_exceed[i, :]
 
-    return 1 - diss_matrix
+def _log_pne_matrix(shape, flat_idx, log_pnes):
+    """
+    :returns: the 6d-array of the summed logarithms of the probabilities
+        of no exceedance, as returned by :func:`_get_log_pnes`
+    """
+    return numpy.bincount(flat_idx, log_pnes,
+                          minlength=numpy.prod(shape)).reshape(shape)
+
+
+def _to_sparse(shape, flat_idx, values):
+    """
+    Build a :class:`SparseDisaggMatrix` from the flat indices and the
+    values of the bins, discarding the zeros.
+    """
+    nonzero = values != 0
+    coords = numpy.array(numpy.unravel_index(flat_idx[nonzero], shape))
+    return SparseDisaggMatrix(shape, coords.reshape(6, -1), values[nonzero])
 
 
 def _digitize_lons(lons, lon_bins):
@@ -320,6 +968,32 @@ def _digitize_lons(lons, lon_bins):
         return numpy.digitize(lons, lon_bins) - 1
 
 
+def _fold(matrix, axes):
+    """
+    Fold a disaggregation matrix, dense or :class:`SparseDisaggMatrix`,
+    keeping only the given axes: the probabilities of the bins sharing the
+    same indices on those axes are combined as
+    ``1 - prod(1 - matrix)`` over the other axes.
+
+    :param matrix:
+        A 6d-array or a :class:`SparseDisaggMatrix`.
+    :param axes:
+        Increasing sequence of the indices of the axes to keep.
+    :returns:
+        An array with as many dimensions as ``axes``.
+    """
+    if isinstance(matrix, SparseDisaggMatrix):
+        shape = [matrix.shape[axis] for axis in axes]
+        flat_idx = numpy.ravel_multi_index(
+            [matrix.coords[axis] for axis in axes], shape)
+        with numpy.errstate(divide='ignore'):
+            log_pne = numpy.bincount(flat_idx, numpy.log1p(-matrix.values),
+                                     minlength=numpy.prod(shape))
+        return 1 - numpy.exp(log_pne).reshape(shape)
+    others = tuple(axis for axis in range(6) if axis not in axes)
+    return 1 - numpy.prod(1 - numpy.asarray(matrix), axis=others)
+
+
 def mag_pmf(matrix):
     """
     Fold full disaggregation matrix to magnitude PMF.
@@ -327,18 +1001,7 @@ def mag_pmf(matrix):
     :returns:
         1d array, a histogram representing magnitude PMF.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    mag_pmf = numpy.zeros(nmags)
-    for i in range(nmags):
-        mag_pmf[i] = numpy.prod(
-            [1 - matrix[i][j][k][l][m][n]
-             for j in range(ndists)
-             for k in range(nlons)
-             for l in range(nlats)
-             for m in range(neps)
-             for n in range(ntrts)]
-        )
-    return 1 - mag_pmf
+    return _fold(matrix, (0,))
 
 
 def dist_pmf(matrix):
@@ -348,18 +1011,7 @@ def dist_pmf(matrix):
     :returns:
         1d array, a histogram representing distance PMF.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    dist_pmf = numpy.zeros(ndists)
-    for j in range(ndists):
-        dist_pmf[j] = numpy.prod(
-            [1 - matrix[i][j][k][l][m][n]
-             for i in range(nmags)
-             for k in range(nlons)
-             for l in range(nlats)
-             for m in range(neps)
-             for n in range(ntrts)]
-        )
-    return 1 - dist_pmf
+    return _fold(matrix, (1,))
 
 
 def trt_pmf(matrix):
@@ -369,18 +1021,7 @@ def trt_pmf(matrix):
     :returns:
         1d array, a histogram representing tectonic region type PMF.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    trt_pmf = numpy.zeros(ntrts)
-    for n in range(ntrts):
-        trt_pmf[n] = numpy.prod(
-            [1 - matrix[i][j][k][l][m][n]
-             for i in range(nmags)
-             for j in range(ndists)
-             for k in range(nlons)
-             for l in range(nlats)
-             for m in range(neps)]
-        )
-    return 1 - trt_pmf
+    return _fold(matrix, (5,))
 
 
 def mag_dist_pmf(matrix):
@@ -391,18 +1032,7 @@ def mag_dist_pmf(matrix):
         2d array. First dimension represents magnitude histogram bins,
         second one -- distance histogram bins.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    mag_dist_pmf = numpy.zeros((nmags, ndists))
-    for i in range(nmags):
-        for j in range(ndists):
-            mag_dist_pmf[i][j] = numpy.prod(
-                [1 - matrix[i][j][k][l][m][n]
-                 for k in range(nlons)
-                 for l in range(nlats)
-                 for m in range(neps)
-                 for n in range(ntrts)]
-            )
-    return 1 - mag_dist_pmf
+    return _fold(matrix, (0, 1))
 
 
 def mag_dist_eps_pmf(matrix):
@@ -414,18 +1044,7 @@ def mag_dist_eps_pmf(matrix):
         second one -- distance histogram bins, third one -- epsilon
         histogram bins.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    mag_dist_eps_pmf = numpy.zeros((nmags, ndists, neps))
-    for i in range(nmags):
-        for j in range(ndists):
-            for m in range(neps):
-                mag_dist_eps_pmf[i][j][m] = numpy.prod(
-                    [1 - matrix[i][j][k][l][m][n]
-                     for k in range(nlons)
-                     for l in range(nlats)
-                     for n in range(ntrts)]
-                )
-    return 1 - mag_dist_eps_pmf
+    return _fold(matrix, (0, 1, 4))
 
 
 def lon_lat_pmf(matrix):
@@ -436,18 +1055,7 @@ def lon_lat_pmf(matrix):
         2d array. First dimension represents longitude histogram bins,
         second one -- latitude histogram bins.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    lon_lat_pmf = numpy.zeros((nlons, nlats))
-    for k in range(nlons):
-        for l in range(nlats):
-            lon_lat_pmf[k][l] = numpy.prod(
-                [1 - matrix[i][j][k][l][m][n]
-                 for i in range(nmags)
-                 for j in range(ndists)
-                 for m in range(neps)
-                 for n in range(ntrts)]
-            )
-    return 1 - lon_lat_pmf
+    return _fold(matrix, (2, 3))
 
 
 def mag_lon_lat_pmf(matrix):
@@ -459,18 +1067,7 @@ def mag_lon_lat_pmf(matrix):
         second one -- longitude histogram bins, third one -- latitude
         histogram bins.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    mag_lon_lat_pmf = numpy.zeros((nmags, nlons, nlats))
-    for i in range(nmags):
-        for k in range(nlons):
-            for l in range(nlats):
-                mag_lon_lat_pmf[i][k][l] = numpy.prod(
-                    [1 - matrix[i][j][k][l][m][n]
-                     for j in range(ndists)
-                     for m in range(neps)
-                     for n in range(ntrts)]
-                )
-    return 1 - mag_lon_lat_pmf
+    return _fold(matrix, (0, 2, 3))
 
 
 def lon_lat_trt_pmf(matrix):
@@ -482,18 +1079,7 @@ def lon_lat_trt_pmf(matrix):
         3d array. Dimension represent longitude, latitude and tectonic region
         type histogram bins respectively.
     """
-    nmags, ndists, nlons, nlats, neps, ntrts = matrix.shape
-    lon_lat_trt_pmf = numpy.zeros((nlons, nlats, ntrts))
-    for k in range(nlons):
-        for l in range(nlats):
-            for n in range(ntrts):
-                lon_lat_trt_pmf[k][l][n] = numpy.prod(
-                    [1 - matrix[i][j][k][l][m][n]
-                     for i in range(nmags)
-                     for j in range(ndists)
-                     for m in range(neps)]
-                )
-    return 1 - lon_lat_trt_pmf
+    return _fold(matrix, (2, 3, 5))
 
 
 # this dictionary is useful to extract a fixed set of
@@ -51,7 +51,9 @@ Module :mod:`openquake.hazardlib.calc.filters` exports one distance-based
 filter function of each kind (see :func:`source_site_distance_filter` and
 :func:`rupture_site_distance_filter`) as well as "no operation" filters
 (:func:`source_site_noop_filter` and :func:`rupture_site_noop_filter`).
+All of them can be pickled, so that they can be sent to other processes.
 """
+import functools
 
 
 def filter_sites_by_distance_to_rupture(rupture, integration_distance, sites):
@@ -92,15 +94,18 @@ def source_site_distance_filter(integration_distance):
         :meth:`openquake.hazardlib.source.base.BaseSeismicSource.filter_sites_by_distance_to_source`
         which is what is actually used for filtering.
     """
-    def filter_func(sources_sites):
-        for source, sites in sources_sites:
-            s_sites = source.filter_sites_by_distance_to_source(
-                integration_distance, sites
-            )
-            if s_sites is None:
-                continue
-            yield source, s_sites
-    return filter_func
+    return functools.partial(_source_site_distance_filter,
+                             integration_distance)
+
+
+def _source_site_distance_filter(integration_distance, sources_sites):
+    for source, sites in sources_sites:
+        s_sites = source.filter_sites_by_distance_to_source(
+            integration_distance, sites
+        )
+        if s_sites is None:
+            continue
+        yield source, s_sites
 
 
 def rupture_site_distance_filter(integration_distance):
@@ -112,19 +117,29 @@ def rupture_site_distance_filter(integration_distance):
         :func:`openquake.hazardlib.calc.filters.filter_sites_by_distance_to_rupture`
         which is what is actually used for filtering.
     """
-    def filter_func(ruptures_sites):
-        for rupture, sites in ruptures_sites:
-            r_sites = filter_sites_by_distance_to_rupture(
-                rupture, integration_distance, sites)
-            if r_sites is None:
-                continue
-            yield rupture, r_sites
-    return filter_func
-
-
-#: Transparent source-site "no-op" filter -- behaves like a real filter
-#: but never filters anything out and doesn't have any overhead.
-source_site_noop_filter = lambda sources_sites: sources_sites
-
-#: Rupture-site "no-op" filter, same as :func:`source_site_noop_filter`.
-rupture_site_noop_filter = lambda ruptures_sites: ruptures_sites
+    return functools.partial(_rupture_site_distance_filter,
+                             integration_distance)
+
+
+def _rupture_site_distance_filter(integration_distance, ruptures_sites):
+    for rupture, sites in ruptures_sites:
+        r_sites = filter_sites_by_distance_to_rupture(
+            rupture, integration_distance, sites)
+        if r_sites is None:
+            continue
+        yield rupture, r_sites
+
+
+def source_site_noop_filter(sources_sites):
+    """
+    Transparent source-site "no-op" filter -- behaves like a real filter
+    but never filters anything out and doesn't have any overhead.
+    """
+    return sources_sites
+
+
+def rupture_site_noop_filter(ruptures_sites):
+    """
+    Rupture-site "no-op" filter, same as :func:`source_site_noop_filter`.
+    """
+    return ruptures_sites
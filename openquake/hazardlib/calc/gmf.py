@@ -20,11 +20,11 @@ Module :mod:`~openquake.hazardlib.calc.gmf` exports
 import collections
 
 import numpy
-import scipy.stats
+from scipy.special import ndtr, ndtri
 
 from openquake.hazardlib.const import StdDev
 from openquake.hazardlib.calc import filters
-from openquake.hazardlib.gsim.base import gsim_imt_dt
+from openquake.hazardlib.gsim.base import gsim_imt_dt, shared_terms
 from openquake.hazardlib.imt import from_string
 
 
@@ -42,6 +42,65 @@ intra event standard deviations.''' % (
             self.corr.__class__.__name__, self.gsim.__class__.__name__)
 
 
+def sample_epsilons(truncation_level, size, out=None, rng=None):
+    """
+    Sample standard normal deviates, truncated symmetrically if
+    ``truncation_level`` is given; the output for a given seed is always
+    the same.
+
+    The truncated deviates are obtained by inverting the cumulative
+    distribution function on uniform numbers scaled to the range
+    ``[ndtr(-truncation_level), ndtr(truncation_level)]``, which is
+    much faster than ``scipy.stats.truncnorm(...).rvs``.
+
+    :param truncation_level:
+        Positive float number representing the truncation on both sides
+        around the mean, in units of sigma, or ``None``
+    :param size:
+        Integer or tuple with the shape of the output
+    :param out:
+        Optional array of floats with the given shape, used as output
+        buffer
+    :param rng:
+        A :class:`numpy.random.RandomState` instance, or ``None`` to use
+        the global numpy generator
+    :returns:
+        an array of floats with the given shape
+    """
+    if rng is None:
+        rng = numpy.random
+    if truncation_level is None:
+        values = rng.standard_normal(size)
+    else:
+        assert truncation_level > 0, truncation_level
+        values = rng.random_sample(size)
+    if out is None:
+        out = numpy.asarray(values, dtype=float)
+    else:
+        out[...] = values
+    if truncation_level is not None:
+        lower = ndtr(-truncation_level)
+        out *= 1. - 2. * lower
+        out += lower
+        ndtri(out, out=out)
+    return out
+
+
+def get_rng(seed):
+    """
+    :param seed:
+        an integer, a :class:`numpy.random.RandomState` instance or None
+    :returns:
+        a random number generator for the given seed; the global numpy
+        generator if the seed is None
+    """
+    if seed is None:
+        return numpy.random
+    elif isinstance(seed, numpy.random.RandomState):
+        return seed
+    return numpy.random.RandomState(seed)
+
+
 class GmfComputer(object):
     """
     Given an earthquake rupture, the ground motion field computer computes
@@ -50,11 +109,14 @@ class GmfComputer(object):
 
        gmfcomputer = GmfComputer(rupture, r_sites, imts, gsims,
                                  truncation_level, correlation_model)
-       gmf1 = gmfcomputer.compute(seed1)
-       gmf2 = gmfcomputer.compute(seed2)
+       gmf1, gmf2 = gmfcomputer.compute([seed1, seed2])
+       gmfs = gmfcomputer.compute_all(gsim, num_events, seed)
 
     :param :class:`openquake.hazardlib.source.rupture.Rupture` rupture:
-        Rupture to calculate ground motion fields radiated from.
+        Rupture to calculate ground motion fields radiated from. Ruptures
+        transferred between processes are better sent as a
+        :class:`openquake.hazardlib.source.rupture.RuptureArray` and
+        rebuilt by indexing it.
 
     :param :class:`openquake.hazardlib.site.SiteCollection` sites:
         Sites of interest to calculate GMFs.
@@ -76,44 +138,57 @@ class GmfComputer(object):
         :mod:`openquake.hazardlib.correlation`. Can be ``None``, in which
         case non-correlated ground motion fields are calculated.
         Correlation model is not used if ``truncation_level`` is zero.
+
+    :param integration_distance:
+        Threshold distance in km, or ``None``. If given, only the sites
+        with a Joyner-Boore distance from the rupture not greater than
+        it are considered: the attribute ``sites`` contains only them
+        (or it is ``None`` if there are no such sites) and the output of
+        the computer is restricted to them.
     """
     def __init__(self, rupture, sites, imts, gsims,
-                 truncation_level=None, correlation_model=None):
+                 truncation_level=None, correlation_model=None,
+                 integration_distance=None):
         assert sites and imts, (sites, imts)
+        if integration_distance is not None:
+            sites = filters.filter_sites_by_distance_to_rupture(
+                rupture, integration_distance, sites)
         self.rupture = rupture
         self.sites = sites
         self.imts = list(map(from_string, imts))
         self.gsims = gsims
         self.truncation_level = truncation_level
         self.correlation_model = correlation_model
-        self.ctx = {gsim: gsim.make_contexts(sites, rupture) for gsim in gsims}
+        self.ctx = {} if sites is None else {
+            gsim: gsim.make_contexts(sites, rupture) for gsim in gsims}
         self.gmf_dt = gsim_imt_dt(gsims, imts)
 
-    def _compute(self, seed, gsim, realizations):
-        # the method doing the real stuff; use compute instead
-        if seed is not None:
-            numpy.random.seed(seed)
+    def _compute(self, seed, gsim, realizations, out=None):
+        # the method doing the real stuff; use compute instead; if ``out``
+        # is given, an array of shape (N, R, I), the fields of each IMT are
+        # written in it instead of being returned in a dictionary
+        rng = get_rng(seed)
         result = collections.OrderedDict()
         sctx, rctx, dctx = self.ctx[gsim]
 
         if self.truncation_level == 0:
             assert self.correlation_model is None
-            for imt in self.imts:
+            for i, imt in enumerate(self.imts):
                 mean, _stddevs = gsim.get_mean_and_stddevs(
                     sctx, rctx, dctx, imt, stddev_types=[])
                 mean = gsim.to_imt_unit_values(mean)
                 mean.shape += (1, )
-                mean = mean.repeat(realizations, axis=1)
-                result[str(imt)] = mean
-            return result
-        elif self.truncation_level is None:
-            distribution = scipy.stats.norm()
-        else:
-            assert self.truncation_level > 0
-            distribution = scipy.stats.truncnorm(
-                - self.truncation_level, self.truncation_level)
-
-        for imt in self.imts:
+                if out is None:
+                    result[str(imt)] = mean.repeat(realizations, axis=1)
+                else:
+                    out[:, :, i] = mean
+            return result if out is None else out
+
+        # buffers for the epsilons, reused for all the IMTs
+        num_sites = len(self.sites)
+        eps_sites = numpy.empty((num_sites, realizations))
+        eps_events = numpy.empty(realizations)
+        for i, imt in enumerate(self.imts):
             if gsim.DEFINED_FOR_STANDARD_DEVIATION_TYPES == \
                set([StdDev.TOTAL]):
                 # If the GSIM provides only total standard deviation, we need
@@ -130,9 +205,9 @@ class GmfComputer(object):
                 stddev_total = stddev_total.reshape(stddev_total.shape + (1, ))
                 mean = mean.reshape(mean.shape + (1, ))
 
-                total_residual = stddev_total * distribution.rvs(
-                    size=(len(self.sites), realizations)
-                )
+                total_residual = stddev_total * sample_epsilons(
+                    self.truncation_level, (num_sites, realizations),
+                    eps_sites, rng)
                 gmf = gsim.to_imt_unit_values(mean + total_residual)
             else:
                 mean, [stddev_inter, stddev_intra] = gsim.get_mean_and_stddevs(
@@ -143,55 +218,90 @@ class GmfComputer(object):
                 stddev_inter = stddev_inter.reshape(stddev_inter.shape + (1, ))
                 mean = mean.reshape(mean.shape + (1, ))
 
-                intra_residual = stddev_intra * distribution.rvs(
-                    size=(len(self.sites), realizations)
-                )
+                intra_residual = stddev_intra * sample_epsilons(
+                    self.truncation_level, (num_sites, realizations),
+                    eps_sites, rng)
 
                 if self.correlation_model is not None:
                     intra_residual = self.correlation_model.apply_correlation(
                         self.sites, imt, intra_residual
                     )
 
-                inter_residual = stddev_inter * distribution.rvs(
-                    size=realizations)
+                inter_residual = stddev_inter * sample_epsilons(
+                    self.truncation_level, realizations, eps_events, rng)
 
                 gmf = gsim.to_imt_unit_values(
                     mean + intra_residual + inter_residual)
 
-            result[str(imt)] = gmf
+            if out is None:
+                result[str(imt)] = gmf
+            else:
+                out[:, :, i] = gmf
 
-        return result
+        return result if out is None else out
 
     def compute(self, seeds):
         """
         Compute the ground motion field for the given sites and seeds.
 
         :param seeds:
-            S seeds for the numpy random number generator
+            S seeds for the numpy random number generator, or
+            :class:`numpy.random.RandomState` instances, for instance
+            built with :func:`openquake.hazardlib.calc.stochastic.make_rng`
         :returns:
-            a list of numpy arrays of dtype gmf_dt and length num_sites
+            a list of numpy arrays of dtype gmf_dt and length num_sites,
+            with the indices of the sites in the field ``idx``; only the
+            sites within the integration distance are included
         """
+        if self.sites is None:  # no sites close to the rupture
+            return [numpy.zeros(0, self.gmf_dt) for _ in seeds]
         n = len(self.sites)
         indices = self.sites.indices
-        gmfs = []
-        for seed in seeds:
-            gmfa = numpy.zeros(n, self.gmf_dt)
-            for gsim in self.gsims:
-                gs = str(gsim)
-                for imt, value in self._compute(
-                        seed, gsim, realizations=1).items():
-                    # 1 realization, get the 0-th colum of the v-array
-                    array = list(map(float, value[:, 0]))
-                    # NB: with correlation, the value is a numpy.matrix
-                    # not an array, flatten does not work and the only
-                    # way to extract the numbers is the map before!
-                    # something is wrong and must be fixed in the future
-                    for i, gmv in enumerate(array):
-                        gmfa[i]['idx'] = indices[i]
-                        gmfa[i][gs][imt] = gmv
-            gmfs.append(gmfa)
+        gmfs = [numpy.zeros(n, self.gmf_dt) for _ in seeds]
+        for gsim in self.gsims:
+            gs = str(gsim)
+            # the contexts are the same for all seeds, so the terms not
+            # depending on the IMT are computed only once per GSIM
+            with shared_terms(gsim):
+                for seed, gmfa in zip(seeds, gmfs):
+                    gmfa['idx'] = indices
+                    for imt, value in self._compute(
+                            seed, gsim, realizations=1).items():
+                        # 1 realization, get the 0-th colum of the v-array;
+                        # NB: with correlation, the value is a numpy.matrix
+                        # not an array, so it is converted first
+                        gmfa[gs][imt] = numpy.asarray(value)[:, 0]
         return gmfs
 
+    def compute_all(self, gsim, num_events, seed=None):
+        """
+        Compute the ground motion fields for several events of the rupture
+        in a single pass: the mean and the standard deviations are computed
+        once per IMT and the residuals for all the events are sampled
+        together. Notice that the random numbers are not the same as
+        the ones used by :meth:`compute`, which reseeds the generator for
+        each event.
+
+        :param gsim:
+            one of the GSIMs passed to the constructor
+        :param num_events:
+            the number of events (occurrences of the rupture)
+        :param seed:
+            the seed for the numpy random number generator, or a
+            :class:`numpy.random.RandomState` instance, or None
+        :returns:
+            an array of shape (N, E, I) with N the number of sites, E the
+            number of events and I the number of IMTs, in the order of
+            ``self.imts``; the sites are the ones in ``self.sites``, i.e.
+            the ones with indices ``self.sites.indices``, and N is zero if
+            there are no sites within the integration distance
+        """
+        if self.sites is None:  # no sites close to the rupture
+            return numpy.zeros((0, num_events, len(self.imts)))
+        gmfs = numpy.empty((len(self.sites), num_events, len(self.imts)))
+        with shared_terms(gsim):
+            return self._compute(seed, gsim, num_events, gmfs)
+
 
 # this is not used in the engine; it is still useful for usage in IPython
 # when demonstrating hazardlib capabilities
@@ -254,7 +364,8 @@ def ground_motion_fields(rupture, sites, imts, gsim, truncation_level,
 
     gc = GmfComputer(rupture, sites, list(map(str, imts)), [gsim],
                      truncation_level, correlation_model)
-    result = gc._compute(seed, gsim, realizations)
+    with shared_terms(gsim):
+        result = gc._compute(seed, gsim, realizations)
     for imt, gmf in result.items():
         # makes sure the lenght of the arrays in output is the same as sites
         if rupture_site_filter is not filters.rupture_site_noop_filter:
@@ -29,7 +29,7 @@ import numpy
 from openquake.baselib.performance import DummyMonitor
 from openquake.hazardlib.calc import filters
 from openquake.hazardlib.imt import from_string
-from openquake.hazardlib.gsim.base import deprecated
+from openquake.hazardlib.gsim.base import deprecated, shared_terms
 
 
 def zero_curves(num_sites, imtls):
@@ -195,7 +195,7 @@ def hazard_curves_per_trt(
                 for i, gsim in enumerate(gsims):
                     with ctx_mon:
                         sctx, rctx, dctx = gsim.make_contexts(r_sites, rupture)
-                    with pne_mon:
+                    with pne_mon, shared_terms(gsim):
                         for imt in imts:
                             poes = gsim.get_poes(
                                 sctx, rctx, dctx, imt, imts[imt],
@@ -18,16 +18,51 @@
 :func:`stochastic_event_set`.
 """
 import sys
+import numbers
+import numpy
 from openquake.baselib.python3compat import range
 from openquake.baselib.python3compat import raise_
 from openquake.hazardlib.calc import filters
 
 
+def make_rng(seed, *ids):
+    """
+    Build an independent random number generator from a master seed and
+    a sequence of identifiers (for instance a source ID and the index of
+    a rupture in the source). The generator depends only on the seed and
+    on the identifiers, so the numbers it produces do not depend on the
+    order of the computation nor on the process or thread doing it.
+
+    >>> rng1, rng2 = make_rng(42, 'src', 1), make_rng(42, 'src', 1)
+    >>> rng1.randint(1000) == rng2.randint(1000)
+    True
+
+    :param seed:
+        A non negative integer smaller than 2 ** 32
+    :param ids:
+        Non negative integers smaller than 2 ** 32 or strings
+    :returns:
+        a :class:`numpy.random.RandomState` instance
+    """
+    key = [seed]
+    for ident in ids:
+        if isinstance(ident, numbers.Integral):
+            key.extend([0, ident])
+        else:
+            # strings are converted into 32 bit words, after their length
+            data = ident.encode('utf8')
+            key.extend([1, len(data)])
+            data += b'\0' * (-len(data) % 4)
+            key.extend(numpy.frombuffer(data, numpy.uint32))
+    return numpy.random.RandomState(numpy.array(key, numpy.uint32))
+
+
 def stochastic_event_set(
         sources,
         sites=None,
         source_site_filter=filters.source_site_noop_filter,
-        rupture_site_filter=filters.rupture_site_noop_filter):
+        rupture_site_filter=filters.rupture_site_noop_filter,
+        seed=None):
     """
     Generates a 'Stochastic Event Set' (that is a collection of earthquake
     ruptures) representing a possible *realization* of the seismicity as
@@ -40,7 +75,8 @@ def stochastic_event_set(
 
     .. note::
         This calculator is using random numbers. In order to reproduce the
-        same results numpy random numbers generator needs to be seeded, see
+        same results either a ``seed`` must be passed or the numpy random
+        numbers generator needs to be seeded, see
         http://docs.scipy.org/doc/numpy/reference/generated/numpy.random.seed.html
 
     :param sources:
@@ -52,6 +88,13 @@ def stochastic_event_set(
         The source filter to use (only meaningful is sites is not None)
     :param source_site_filter:
         The rupture filter to use (only meaningful is sites is not None)
+    :param seed:
+        If given, the occurrences of all the ruptures of each source are
+        sampled at once by the method ``sample_ruptures`` of the source,
+        with the generator returned by ``make_rng(seed, source.source_id)``,
+        and only the ruptures occurring at least once are built; the event
+        set of a source does not depend on the other sources nor on the
+        filtering. Otherwise the global numpy generator is used
     :returns:
         Generator of :class:`~openquake.hazardlib.source.rupture.Rupture`
         objects that are contained in an event set. Some ruptures can be
@@ -60,8 +103,8 @@ def stochastic_event_set(
     if sites is None:  # no filtering
         for source in sources:
             try:
-                for rupture in source.iter_ruptures():
-                    for i in range(rupture.sample_number_of_occurrences()):
+                for rupture, num_occ in _sample_ruptures(source, seed):
+                    for i in range(num_occ):
                         yield rupture
             except Exception as err:
                 etype, err, tb = sys.exc_info()
@@ -73,13 +116,54 @@ def stochastic_event_set(
     sources_sites = source_site_filter((source, sites) for source in sources)
     for source, r_sites in sources_sites:
         try:
-            ruptures_sites = rupture_site_filter(
-                (rupture, r_sites) for rupture in source.iter_ruptures())
-            for rupture, _sites in ruptures_sites:
-                for i in range(rupture.sample_number_of_occurrences()):
-                    yield rupture
+            if seed is None:
+                ruptures_sites = rupture_site_filter(
+                    (rupture, r_sites) for rupture in source.iter_ruptures())
+                for rupture, _sites in ruptures_sites:
+                    for i in range(rupture.sample_number_of_occurrences()):
+                        yield rupture
+                continue
+            # the occurrences are sampled for all the ruptures of the
+            # source before filtering, so that the random numbers used
+            # for a rupture do not depend on the filter
+            for rupture, num_occ in _sample_ruptures(source, seed):
+                if num_occ:
+                    ruptures_sites = rupture_site_filter([(rupture, r_sites)])
+                    for rupture, _sites in ruptures_sites:
+                        for i in range(num_occ):
+                            yield rupture
         except Exception as err:
             etype, err, tb = sys.exc_info()
             msg = 'An error occurred with source id=%s. Error: %s'
             msg %= (source.source_id, str(err))
             raise_(etype, msg, tb)
+
+
+def _sample_ruptures(source, seed):
+    """
+    Yield pairs (rupture, number of occurrences) for the ruptures of the
+    given source; if ``seed`` is None the global numpy generator is used
+    and all the ruptures are yielded, otherwise the generator returned by
+    ``make_rng(seed, source.source_id)`` is used and only the ruptures
+    occurring at least once are yielded. The sources able to build a
+    subset of their ruptures (point and area sources) sample all the
+    occurrences at once with their method ``sample_ruptures`` and build
+    only the ruptures occurring; the other sources are iterated once,
+    drawing the same random numbers as
+    :meth:`openquake.hazardlib.source.base.BaseSeismicSource.sample_ruptures`
+    """
+    if seed is None:
+        for rupture in source.iter_ruptures():
+            yield rupture, rupture.sample_number_of_occurrences()
+        return
+    rng = make_rng(seed, source.source_id)
+    if hasattr(source, 'get_ruptures'):
+        table = source.sample_ruptures(rng)
+        ruptures = source.get_ruptures(table['rup_idx'])
+        for rupture, num_occ in zip(ruptures, table['n_occ']):
+            yield rupture, int(num_occ)
+    else:
+        for rupture in source.iter_ruptures():
+            num_occ = rupture.sample_number_of_occurrences(rng)
+            if num_occ:
+                yield rupture, num_occ
@@ -18,12 +18,42 @@ Module :mod:`openquake.hazardlib.correlation` defines correlation models for
 spatially-distributed ground-shaking intensities.
 """
 import abc
+import collections
 import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+from scipy.spatial import cKDTree
 
 from openquake.hazardlib.imt import SA, PGA
+from openquake.hazardlib.geo.geodetic import EARTH_RADIUS
+from openquake.hazardlib.geo.mesh import Mesh
+from openquake.hazardlib.geo.utils import spherical_to_cartesian
 from openquake.baselib.python3compat import with_metaclass
 
 
+def _get_sites_key(sites):
+    """
+    Return a key identifying the given sites of a complete site collection;
+    the complete collection must be kept alive as long as the key is used.
+    """
+    return id(sites.complete), numpy.asarray(sites.indices).tobytes()
+
+
+def _get_cached(cache, cache_size, key, func, *args):
+    """
+    Return ``func(*args)``, using the ordered dictionary ``cache`` as a least
+    recently used cache with at most ``cache_size`` elements.
+    """
+    try:
+        value = cache.pop(key)
+    except KeyError:
+        value = func(*args)
+    cache[key] = value  # now it is the most recently used
+    while len(cache) > cache_size:
+        cache.popitem(last=False)
+    return value
+
+
 class BaseCorrelationModel(with_metaclass(abc.ABCMeta)):
     """
     Base class for correlation models for spatially-distributed ground-shaking
@@ -78,6 +108,13 @@ class BaseCorrelationModel(with_metaclass(abc.ABCMeta)):
         corma = self.get_lower_triangle_correlation_matrix(sites, imt)
         return numpy.dot(corma, residuals)
 
+    def _get_cached(self, cache, key, func, *args):
+        """
+        Return ``func(*args)``, using ``cache`` as a least recently used
+        cache with at most ``self.cache_size`` elements.
+        """
+        return _get_cached(cache, self.cache_size, key, func, *args)
+
 
 class JB2009CorrelationModel(BaseCorrelationModel):
     """
@@ -89,11 +126,43 @@ class JB2009CorrelationModel(BaseCorrelationModel):
         Boolean value to indicate whether "Case 1" or "Case 2" from page 1700
         should be applied. ``True`` value means that Vs 30 values show or are
         expected to show clustering ("Case 2"), ``False`` means otherwise.
+    :param cache_size:
+        Maximum number of distance matrices and of lower-triangle matrices
+        kept in memory. The distance matrix of a site collection is shared
+        by all the IMTs, while the decomposed correlation matrix is shared
+        by the IMTs with the same correlation range. Use 0 to disable
+        the cache.
     """
-    def __init__(self, vs30_clustering):
+    def __init__(self, vs30_clustering, cache_size=10):
         self.vs30_clustering = vs30_clustering
+        self.cache_size = cache_size
+        self._distances = collections.OrderedDict()
+        self._lower_triangles = collections.OrderedDict()
         super(JB2009CorrelationModel, self).__init__()
 
+    def __getstate__(self):
+        # the cached matrices are not transferred
+        return dict(vs30_clustering=self.vs30_clustering,
+                    cache_size=self.cache_size)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _get_distance_matrix(self, sites):
+        """
+        Return the distance matrix of the given sites, computed only once
+        for the same sites of the same complete site collection.
+        """
+        key = _get_sites_key(sites)
+        distances, _ = self._get_cached(
+            self._distances, key, self._compute_distances, sites)
+        return distances, key
+
+    def _compute_distances(self, sites):
+        # the complete collection is stored together with the matrix,
+        # so that its id cannot be reused while the matrix is cached
+        return sites.mesh.get_distance_matrix(), sites.complete
+
     def _get_correlation_matrix(self, sites, imt):
         """
         Calculate correlation matrix for a given sites collection.
@@ -104,19 +173,13 @@ class JB2009CorrelationModel(BaseCorrelationModel):
         Parameters are the same as for
         :meth:`BaseCorrelationModel.get_lower_triangle_correlation_matrix`.
         """
-        distances = sites.mesh.get_distance_matrix()
+        distances, _ = self._get_distance_matrix(sites)
         return self._get_correlation_model(distances, imt)
 
-    def _get_correlation_model(self, distances, imt):
+    def _get_correlation_range(self, imt):
         """
-        Returns the correlation model for a set of distances, given the
-        appropriate period
-
-        :param numpy.ndarray distances:
-            Distance matrix
-
-        :param float period:
-            Period of spectral acceleration
+        Returns the range parameter ``b`` of the correlation model for
+        the given intensity measure type
         """
         if isinstance(imt, SA):
             period = imt.period
@@ -135,12 +198,277 @@ class JB2009CorrelationModel(BaseCorrelationModel):
         else:
             # both cases, eq. (19)
             b = 22.0 + 3.7 * period
+        return b
+
+    def _get_correlation_model(self, distances, imt):
+        """
+        Returns the correlation model for a set of distances, given the
+        appropriate period
 
+        :param numpy.ndarray distances:
+            Distance matrix
+
+        :param float period:
+            Period of spectral acceleration
+        """
+        b = self._get_correlation_range(imt)
         # eq. (20)
         return numpy.exp((- 3.0 / b) * distances)
 
     def get_lower_triangle_correlation_matrix(self, sites, imt):
         """
         See :meth:`BaseCorrelationModel.get_lower_triangle_correlation_matrix`.
+
+        The matrices are cached: the Cholesky decomposition is performed
+        only once for the same sites and correlation range.
+        """
+        distances, key = self._get_distance_matrix(sites)
+        b = self._get_correlation_range(imt)
+        corma, _ = self._get_cached(self._lower_triangles, key + (b, ),
+                                    self._decompose, distances, imt, sites)
+        return corma
+
+    def _decompose(self, distances, imt, sites):
+        """
+        Return the Cholesky decomposition of the correlation matrix for
+        the given distances and IMT, together with the complete site
+        collection
+        """
+        corma = self._get_correlation_model(distances, imt)
+        return numpy.linalg.cholesky(corma), sites.complete
+
+
+class VecchiaCorrelationModel(object):
+    """
+    Nearest neighbours (Vecchia) approximation of a correlation model
+    depending only on the distance between the sites, like
+    :class:`JB2009CorrelationModel`, for site collections too large
+    for the full correlation matrix.
+
+    It is not a :class:`BaseCorrelationModel`, since it never builds the
+    (dense) lower triangle matrix, but it can be used in place of one to
+    sample correlated residuals, since it implements
+    :meth:`apply_correlation`.
+
+    The sites are visited in a pseudo-random order and the residual of each
+    site is sampled conditionally on the residuals of (at most)
+    ``num_neighbors`` of the closest sites visited before. The resulting
+    sparse triangular system requires O(N * num_neighbors) memory instead
+    of the O(N^2) needed by the Cholesky decomposition of the full matrix.
+    The error introduced on the correlation structure can be estimated
+    with :meth:`get_approximation_error`.
+
+    :param model:
+        The exact correlation model; its method ``_get_correlation_model``
+        must accept arrays of distances of any shape.
+    :param num_neighbors:
+        Maximum number of conditioning sites for each site.
+    :param seed:
+        Seed used to order the sites and to select the sites for the
+        estimate of the error.
+    :param cache_size:
+        Maximum number of neighbours structures and of factorized
+        systems kept in memory.
+    """
+    #: maximum number of elements of the arrays used to compute the weights
+    #: of the neighbours for a chunk of sites
+    CHUNK_SIZE = 10 ** 7
+
+    def __init__(self, model, num_neighbors=20, seed=42, cache_size=10):
+        self.model = model
+        self.num_neighbors = num_neighbors
+        self.seed = seed
+        self.cache_size = cache_size
+        self._neighbors = collections.OrderedDict()
+        self._factors = collections.OrderedDict()
+
+    def __getstate__(self):
+        # the cached structures are not transferred
+        return dict(model=self.model, num_neighbors=self.num_neighbors,
+                    seed=self.seed, cache_size=self.cache_size)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _get_neighbors(self, sites):
+        """
+        Order the sites and find for each site the closest sites preceding
+        it in the order.
+
+        :returns:
+            a tuple (order, xyz, neighbors, valid) where ``order`` is the
+            permutation of the sites, ``xyz`` the Cartesian coordinates of
+            the permuted sites and ``neighbors`` an array of shape
+            (N, num_neighbors) with the positions in the order of the
+            neighbours of each site, meaningful only where the boolean
+            array ``valid`` is True
+        """
+        num_sites = len(sites)
+        num_nb = self.num_neighbors
+        order = numpy.random.RandomState(self.seed).permutation(num_sites)
+        mesh = sites.mesh
+        xyz = spherical_to_cartesian(mesh.lons, mesh.lats, None)[order]
+        neighbors = numpy.zeros((num_sites, num_nb), int)
+        valid = numpy.zeros((num_sites, num_nb), bool)
+        # the neighbours of the sites in the positions start...stop - 1
+        # are searched among the sites up to stop; the nearest candidates
+        # include sites following in the order, so the sites with fewer
+        # than min(num_nb, position) preceding candidates are searched
+        # again with twice the candidates
+        start = 1
+        while start < num_sites:
+            stop = min(2 * start, num_sites)
+            tree = cKDTree(xyz[:stop])
+            rows = numpy.arange(start, stop)
+            num_cand = min(3 * num_nb, stop)
+            while len(rows):
+                _, cand = tree.query(xyz[rows], num_cand)
+                cand = cand.reshape(len(rows), num_cand)
+                ok = cand < rows.reshape(-1, 1)
+                done = ok.sum(axis=1) >= numpy.minimum(num_nb, rows)
+                cand, ok = cand[done], ok[done]
+                ok &= numpy.cumsum(ok, axis=1) <= num_nb
+                # move the selected candidates to the front, keeping
+                # the order
+                sel = numpy.argsort(~ok, axis=1, kind='mergesort')[:, :num_nb]
+                idx = numpy.arange(len(sel)).reshape(-1, 1)
+                neighbors[rows[done], :sel.shape[1]] = cand[idx, sel]
+                valid[rows[done], :sel.shape[1]] = ok[idx, sel]
+                rows = rows[~done]
+                num_cand = min(2 * num_cand, stop)
+            start = stop
+        return order, xyz, neighbors, valid
+
+    def _get_weights(self, xyz, neighbors, valid, imt):
+        """
+        Compute the weights of the neighbours and the conditional standard
+        deviations by solving a small system for each site.
+        """
+        num_sites, num_nb = neighbors.shape
+        weights = numpy.zeros((num_sites, num_nb))
+        stddevs = numpy.ones(num_sites)
+        eye = numpy.eye(num_nb)
+        chunk = max(1, self.CHUNK_SIZE // (num_nb * num_nb * 3))
+        for start in range(0, num_sites, chunk):
+            sl = slice(start, start + chunk)
+            ok = valid[sl]
+            nbs = xyz[neighbors[sl]]  # shape (C, num_nb, 3)
+            corr_nn = self._get_correlations(
+                nbs[:, :, None] - nbs[:, None], imt)
+            corr_nn = numpy.where(ok[:, :, None] & ok[:, None], corr_nn, eye)
+            corr_in = numpy.where(
+                ok, self._get_correlations(nbs - xyz[sl, None], imt), 0)
+            # a tiny nugget keeps the systems solvable for coincident sites
+            w = numpy.linalg.solve(corr_nn + 1E-10 * eye,
+                                   corr_in[:, :, None])[:, :, 0]
+            weights[sl] = w
+            stddevs[sl] = numpy.sqrt(
+                numpy.maximum(1. - (w * corr_in).sum(axis=1), 0.))
+        return weights, stddevs
+
+    def _get_correlations(self, vectors, imt):
+        """
+        Return the correlation coefficients for the given arrays of
+        Cartesian vectors between the sites
+        """
+        chords = numpy.sqrt((vectors ** 2).sum(axis=-1))
+        dists = 2. * EARTH_RADIUS * numpy.arcsin(
+            numpy.minimum(chords / (2. * EARTH_RADIUS), 1.))
+        return numpy.asarray(self.model._get_correlation_model(dists, imt))
+
+    def _get_factor(self, sites, imt):
+        """
+        :returns:
+            a tuple (order, lu, stddevs, complete) with the order of the
+            sites, the LU decomposition of the sparse lower triangular
+            matrix of the conditional dependencies, the conditional
+            standard deviations and the complete site collection
+        """
+        key = _get_sites_key(sites)
+        order, xyz, neighbors, valid, _ = _get_cached(
+            self._neighbors, self.cache_size, key, self._compute_neighbors,
+            sites)
+        b = self.model._get_correlation_range(imt)
+        return _get_cached(
+            self._factors, self.cache_size, key + (b, ), self._factorize,
+            order, xyz, neighbors, valid, imt, sites)
+
+    def _compute_neighbors(self, sites):
+        # the complete collection is stored too, see _get_sites_key
+        return self._get_neighbors(sites) + (sites.complete, )
+
+    def _factorize(self, order, xyz, neighbors, valid, imt, sites):
+        weights, stddevs = self._get_weights(xyz, neighbors, valid, imt)
+        num_sites = len(order)
+        rows = numpy.arange(num_sites).repeat(valid.sum(axis=1))
+        matrix = scipy.sparse.csc_matrix(
+            (-weights[valid], (rows, neighbors[valid])),
+            shape=(num_sites, num_sites)) + scipy.sparse.identity(
+                num_sites, format='csc')
+        # the matrix is already triangular: no permutations, no pivoting
+        lu = scipy.sparse.linalg.splu(
+            matrix, permc_spec='NATURAL', diag_pivot_thresh=0,
+            options=dict(SymmetricMode=True))
+        return order, lu, stddevs, sites.complete
+
+    def apply_correlation(self, sites, imt, residuals):
+        """
+        Apply the approximated correlation to randomly sampled residuals,
+        see :meth:`BaseCorrelationModel.apply_correlation`.
+        """
+        order, lu, stddevs, _ = self._get_factor(sites, imt)
+        residuals = numpy.asarray(residuals, dtype=float)
+        correlated = numpy.empty_like(residuals)
+        correlated[order] = lu.solve(
+            stddevs.reshape(-1, 1) * residuals[order].reshape(len(order), -1)
+        ).reshape(residuals.shape)
+        return correlated
+
+    def get_approximation_error(self, sites, imt, num_sites=200,
+                                batch_size=16):
+        """
+        Estimate the error of the approximation on the correlation
+        structure, by comparing the correlation coefficients implied by the
+        approximation with the exact ones for the pairs of a random subset
+        of the sites.
+
+        :param sites:
+            :class:`~openquake.hazardlib.site.SiteCollection` instance
+        :param imt:
+            Intensity measure type object
+        :param num_sites:
+            Number of sites in the subset
+        :param batch_size:
+            Number of sites of the subset processed at once; the memory
+            required is proportional to the total number of sites times
+            ``batch_size``
+        :returns:
+            a dictionary with the maximum and the root mean square of the
+            absolute errors, keys 'max' and 'rms'
         """
-        return numpy.linalg.cholesky(self._get_correlation_matrix(sites, imt))
+        order, lu, stddevs, _ = self._get_factor(sites, imt)
+        num_sites = min(num_sites, len(order))
+        subset = numpy.random.RandomState(self.seed).choice(
+            len(order), num_sites, replace=False)
+        # the covariance implied by the approximation is
+        # A^-1 D A^-T where D are the conditional variances; its columns
+        # corresponding to the subset are computed a batch at a time,
+        # keeping only the rows of the subset
+        position = numpy.empty_like(order)
+        position[order] = numpy.arange(len(order))
+        subset_pos = position[subset]
+        variances = stddevs.reshape(-1, 1) ** 2
+        approx = numpy.empty((num_sites, num_sites))
+        for start in range(0, num_sites, batch_size):
+            stop = min(start + batch_size, num_sites)
+            unit = numpy.zeros((len(order), stop - start))
+            unit[subset_pos[start:stop], numpy.arange(stop - start)] = 1.
+            columns = lu.solve(variances * lu.solve(unit, trans='T'))
+            approx[:, start:stop] = columns[subset_pos]
+        mesh = sites.mesh
+        distances = Mesh(mesh.lons[subset], mesh.lats[subset],
+                         None).get_distance_matrix()
+        exact = numpy.asarray(
+            self.model._get_correlation_model(distances, imt))
+        errors = numpy.abs(approx - exact)
+        return dict(max=errors.max(), rms=numpy.sqrt((errors ** 2).mean()))
@@ -16,11 +16,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 Module :mod:`openquake.hazardlib.geo.mesh` defines classes :class:`Mesh` and
-its subclass :class:`RectangularMesh`.
+its subclasses :class:`SiteMesh` and :class:`RectangularMesh`.
 """
+import itertools
+
 import numpy
+import scipy.sparse
 import shapely.geometry
 import shapely.ops
+from scipy.spatial import cKDTree
 
 from openquake.hazardlib.geo.point import Point
 from openquake.hazardlib.geo import geodetic
@@ -50,6 +54,10 @@ class Mesh(object):
     #: approximation is required -- set to 5 meters.
     DIST_TOLERANCE = 0.005
 
+    #: Maximum number of distances computed at once (approximately, for the
+    #: sparse distance matrix).
+    CHUNK_SIZE = 10 ** 6
+
     def __init__(self, lons, lats, depths=None):
         assert (isinstance(lons, numpy.ndarray)
                 and isinstance(lats, numpy.ndarray)
@@ -146,6 +154,16 @@ class Mesh(object):
         """
         return self.lons.size
 
+    def get_xyz(self):
+        """
+        :returns:
+            The position vectors of the points in Cartesian space, as
+            returned by
+            :func:`~openquake.hazardlib.geo.utils.spherical_to_cartesian`.
+        """
+        return geo_utils.spherical_to_cartesian(self.lons, self.lats,
+                                                self.depths)
+
     def get_min_distance(self, mesh):
         """
         Compute and return the minimum distance from the mesh to each point
@@ -278,37 +296,113 @@ class Mesh(object):
         return geodetic.min_distance(self.lons, self.lats, depths1,
                                      mesh.lons, mesh.lats, depths2, indices)
 
-    def get_distance_matrix(self):
+    def get_distance_matrix(self, out=None):
         """
         Compute and return distances between each pairs of points in the mesh.
 
         This method requires that all the points lie on Earth surface (have
         zero depth) and coordinate arrays are one-dimensional.
 
+        The distances are computed in blocks of rows of at most
+        :attr:`CHUNK_SIZE` elements, so the intermediate storage does not
+        depend on the size of the mesh.
+
         .. warning::
             Because of its quadratic space and time complexity this method
             is safe to use for meshes of up to several thousand points. For
-            mesh of 10k points it needs ~800 Mb for just the resulting matrix
-            and four times that much for intermediate storage.
+            mesh of 10k points it needs ~800 Mb for the resulting matrix:
+            for larger meshes pass a memory-mapped array as ``out`` or use
+            :meth:`get_sparse_distance_matrix`.
 
+        :param out:
+            Optional array of shape (N, N), for instance a
+            :class:`numpy.memmap`, where the distances are written.
         :returns:
             Two-dimensional numpy array, square matrix of distances. The matrix
             has zeros on main diagonal and positive distances in kilometers
             on all other cells. That is, value in cell (3, 5) is the distance
             between mesh's points 3 and 5 in km, and it is equal to value
-            in cell (5, 3).
+            in cell (5, 3). If ``out`` is given, it is returned; otherwise
+            the result is a :class:`numpy.matrix`.
 
         Uses :func:`openquake.hazardlib.geo.geodetic.geodetic_distance`.
         """
         assert self.lons.ndim == 1
         assert self.depths is None or (self.depths == 0).all()
-        distances = geodetic.geodetic_distance(
-            self.lons.reshape(self.lons.shape + (1, )),
-            self.lats.reshape(self.lats.shape + (1, )),
-            self.lons,
-            self.lats
-        )
-        return numpy.matrix(distances, copy=False)
+        num_points = len(self.lons)
+        if out is None:
+            distances = numpy.matrix(numpy.empty((num_points, num_points)),
+                                     copy=False)
+        else:
+            assert out.shape == (num_points, num_points), out.shape
+            distances = out
+        step = max(self.CHUNK_SIZE // max(num_points, 1), 1)
+        for start in range(0, num_points, step):
+            stop = min(start + step, num_points)
+            distances[start:stop] = geodetic.geodetic_distance(
+                self.lons[start:stop].reshape(-1, 1),
+                self.lats[start:stop].reshape(-1, 1),
+                self.lons, self.lats)
+        return distances
+
+    def get_sparse_distance_matrix(self, cutoff):
+        """
+        Compute the distances between the pairs of points of the mesh
+        which are not farther than ``cutoff``.
+
+        The candidate pairs are found with a k-d tree on the Cartesian
+        coordinates of the points, in blocks of about :attr:`CHUNK_SIZE`
+        pairs, so the memory needed is proportional to the number of pairs
+        within the cutoff rather than to the square of the number of points.
+        Same requirements as :meth:`get_distance_matrix`.
+
+        :param cutoff:
+            Maximum distance in km.
+        :returns:
+            A :class:`scipy.sparse.csr_matrix` of shape (N, N), with the
+            same values of :meth:`get_distance_matrix` for the pairs within
+            the cutoff. The zero distances (the main diagonal and the
+            coincident points) are stored explicitly, so that the structure
+            of the matrix identifies the pairs.
+        """
+        assert self.lons.ndim == 1
+        assert self.depths is None or (self.depths == 0).all()
+        num_points = len(self.lons)
+        xyz = self.get_xyz()
+        tree = cKDTree(xyz)
+        # chord corresponding to the cutoff, with a margin for the rounding
+        # errors; the pairs are then filtered on the geodetic distance
+        radius = 2. * geodetic.EARTH_RADIUS * numpy.sin(
+            min(cutoff / (2. * geodetic.EARTH_RADIUS), numpy.pi / 2))
+        radius += self.DIST_TOLERANCE
+        all_rows, all_cols, all_dists = [], [], []
+        start, step = 0, 1000
+        while start < num_points:
+            neighbors = tree.query_ball_point(xyz[start:start + step], radius)
+            counts = numpy.array([len(nbs) for nbs in neighbors], int)
+            rows = numpy.arange(start, start + len(neighbors)).repeat(counts)
+            cols = numpy.fromiter(itertools.chain.from_iterable(neighbors),
+                                  int, counts.sum())
+            dists = geodetic.geodetic_distance(
+                self.lons[rows], self.lats[rows],
+                self.lons[cols], self.lats[cols])
+            ok = dists <= cutoff
+            all_rows.append(rows[ok])
+            all_cols.append(cols[ok])
+            all_dists.append(dists[ok])
+            # the size of the next block depends on the density of pairs
+            start += len(neighbors)
+            step = max(self.CHUNK_SIZE * len(neighbors) // len(rows), 1)
+        rows = numpy.concatenate(all_rows)
+        cols = numpy.concatenate(all_cols)
+        dists = numpy.concatenate(all_dists)
+        order = numpy.lexsort((cols, rows))
+        indptr = numpy.zeros(num_points + 1, int)
+        numpy.cumsum(numpy.bincount(rows, minlength=num_points),
+                     out=indptr[1:])
+        return scipy.sparse.csr_matrix(
+            (dists[order], cols[order], indptr),
+            shape=(num_points, num_points))
 
     def _get_proj_convex_hull(self):
         """
@@ -370,6 +464,45 @@ class Mesh(object):
         return Polygon._from_2d(polygon2d, proj)
 
 
+class SiteMesh(Mesh):
+    """
+    A one-dimensional :class:`Mesh` of sites on the earth surface, which
+    computes the Cartesian coordinates of its points only once. Since the
+    same sites are used for all the ruptures of a calculation, the
+    surfaces that work in Cartesian space (like
+    :class:`~openquake.hazardlib.geo.surface.planar.PlanarSurface`) can
+    reuse them, instead of converting the coordinates for each rupture.
+    The meshes of site collections are of this kind.
+
+    The coordinate arrays must not be changed after the creation of the
+    mesh.
+    """
+    def __init__(self, lons, lats):
+        super(SiteMesh, self).__init__(lons, lats, None)
+        self._xyz = None
+
+    def get_xyz(self):
+        """
+        Same as :meth:`Mesh.get_xyz`, but the result is computed at the
+        first call and then kept.
+        """
+        if self._xyz is None:
+            self._xyz = super(SiteMesh, self).get_xyz()
+        return self._xyz
+
+    def take(self, indices):
+        """
+        :param indices: an array of indices of points of the mesh
+        :returns: a :class:`SiteMesh` with the given points; the Cartesian
+            coordinates are taken from this mesh, so that they are computed
+            only once for all the subsets of the sites
+        """
+        mesh = self.__class__(self.lons.take(indices),
+                              self.lats.take(indices))
+        mesh._xyz = self.get_xyz().take(indices, axis=0)
+        return mesh
+
+
 class RectangularMesh(Mesh):
     """
     A specification of :class:`Mesh` that requires coordinate numpy-arrays
@@ -410,6 +543,76 @@ class RectangularMesh(Mesh):
             depths = None
         return cls(lons, lats, depths)
 
+    def get_floating_distances(self, mesh, rupture_shapes):
+        """
+        Compute the rupture and Joyner-Boore distances between the points of
+        ``mesh`` and all the sub-meshes of given shapes floating on this
+        mesh, like the surfaces of the ruptures of
+        :class:`~openquake.hazardlib.source.simple_fault.SimpleFaultSource`.
+
+        The distances to the nodes and to the cells of this mesh are computed
+        only once, then the distances to each sub-mesh are obtained as
+        minima over sliding windows of nodes and cells. The rupture
+        distances are the same returned by :meth:`Mesh.get_min_distance`
+        for the sub-meshes. The Joyner-Boore distances follow
+        :meth:`Mesh.get_joyner_boore_distance` and the enclosing polygon of
+        :class:`RectangularMesh`, which is the union of the cells: they
+        are computed on the projection of this mesh instead of the projection
+        of each sub-mesh, with differences of a few meters.
+
+        :param mesh:
+            :class:`Mesh` of the points (sites) to calculate distances to.
+        :param rupture_shapes:
+            A list of pairs (rows, columns) with the number of points of
+            the sub-meshes along the two dimensions, each one at least 2.
+        :returns:
+            A list with a pair of arrays (rrup, rjb) for each shape; each
+            array has shape (R, C, N), where N is the number of points of
+            ``mesh`` and R and C are the number of positions of the sub-meshes
+            along the rows and the columns: the element [i, j, k] refers to
+            the sub-mesh ``self[i:i + rows, j:j + columns]`` and to the
+            point k.
+        """
+        num_rows, num_cols = self.lons.shape
+        lons = mesh.lons.reshape(-1)
+        lats = mesh.lats.reshape(-1)
+        if mesh.depths is None:
+            depths = numpy.zeros_like(lons)
+        else:
+            depths = mesh.depths.reshape(-1)
+        self_depths = (numpy.zeros_like(self.lons) if self.depths is None
+                       else self.depths)
+        proj = geo_utils.get_orthographic_projection(
+            *geo_utils.get_spherical_bounding_box(self.lons, self.lats))
+        cells_xx, cells_yy = proj(self.lons, self.lats)
+        results = [(numpy.empty((num_rows - rows + 1, num_cols - cols + 1,
+                                 len(lons))), numpy.empty(
+                    (num_rows - rows + 1, num_cols - cols + 1, len(lons))))
+                   for rows, cols in rupture_shapes]
+        step = max(self.CHUNK_SIZE // (num_rows * num_cols * 4), 1)
+        for start in range(0, len(lons), step):
+            sl = slice(start, start + step)
+            hdists = geodetic.geodetic_distance(
+                self.lons[..., None], self.lats[..., None],
+                lons[sl], lats[sl])
+            dists = numpy.sqrt(
+                hdists ** 2 + (self_depths[..., None] - depths[sl]) ** 2)
+            # the enclosing polygon in RectangularMesh is dilated by
+            # DIST_TOLERANCE
+            xx, yy = proj(lons[sl], lats[sl])
+            cell_dists = numpy.maximum(_point_to_cells_distance(
+                xx, yy, cells_xx, cells_yy) - self.DIST_TOLERANCE, 0)
+            for (rows, cols), (rrup, rjb) in zip(rupture_shapes, results):
+                rrup[:, :, sl] = _sliding_min(
+                    _sliding_min(dists, rows, 0), cols, 1)
+                node_dists = _sliding_min(
+                    _sliding_min(hdists, rows, 0), cols, 1)
+                # same threshold as in Mesh.get_joyner_boore_distance
+                rjb[:, :, sl] = numpy.where(
+                    node_dists < 40, _sliding_min(_sliding_min(
+                        cell_dists, rows - 1, 0), cols - 1, 1), node_dists)
+        return results
+
     def _get_proj_enclosing_polygon(self):
         """
         See :meth:`Mesh._get_proj_enclosing_polygon`.
@@ -762,3 +965,59 @@ class RectangularMesh(Mesh):
         # compute and return weighted mean
         return numpy.sum(widths * mean_cell_lengths) / \
             numpy.sum(mean_cell_lengths)
+
+
+def _sliding_min(array, size, axis):
+    """
+    :returns:
+        The minima of ``array`` over sliding windows of ``size`` elements
+        along ``axis``; the result has ``size - 1`` elements less than
+        ``array`` along that axis.
+    """
+    array = array.swapaxes(0, axis)
+    result = array
+    width = 1
+    # minima over windows of 1, 2, 4, ... elements
+    while 2 * width <= size:
+        result = numpy.minimum(result[:-width], result[width:])
+        width *= 2
+    if width < size:
+        # combine two overlapping windows
+        result = numpy.minimum(result[:len(array) - size + 1],
+                               result[size - width:])
+    return result.swapaxes(0, axis)
+
+
+def _point_to_cells_distance(xx, yy, cells_xx, cells_yy):
+    """
+    :param xx, yy:
+        Arrays of shape (N, ) with the coordinates of the points
+    :param cells_xx, cells_yy:
+        Arrays of shape (R, C) with the coordinates of the vertices of the
+        cells of a rectangular mesh
+    :returns:
+        An array of shape (R - 1, C - 1, N) with the distances between the
+        cells and the points, zero for the points inside the cells
+    """
+    # the vertices of the cells, in order around each cell
+    head, tail = slice(None, -1), slice(1, None)
+    idx = [(head, head), (head, tail), (tail, tail), (tail, head)]
+    vx = [cells_xx[i][..., None] for i in idx]
+    vy = [cells_yy[i][..., None] for i in idx]
+    dists = None
+    inside = False
+    for i in range(4):
+        px, py, qx, qy = vx[i - 1], vy[i - 1], vx[i], vy[i]
+        ex, ey = qx - px, qy - py
+        length2 = ex ** 2 + ey ** 2
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            t = ((xx - px) * ex + (yy - py) * ey) / length2
+        t = numpy.where(length2 > 0, t, 0).clip(0, 1)
+        dist = numpy.sqrt((xx - px - t * ex) ** 2 + (yy - py - t * ey) ** 2)
+        dists = dist if dists is None else numpy.minimum(dists, dist)
+        # even-odd rule for the points inside the cells
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            crossing = (py > yy) != (qy > yy)
+            inside ^= crossing & (xx < px + (yy - py) * ex / ey)
+    dists[inside] = 0
+    return dists
@@ -18,6 +18,10 @@ Module :mod:`openquake.hazardlib.geo.polygon` defines :class:`Polygon`.
 """
 import numpy
 import shapely.geometry
+try:  # shapely >= 2.0
+    from shapely import contains_xy
+except ImportError:
+    from shapely.vectorized import contains as contains_xy
 
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo import geodetic
@@ -43,7 +47,8 @@ class Polygon(object):
         If ``points`` contains less than three unique points or if polygon
         perimeter intersects itself.
     """
-    __slots__ = 'lons lats _bbox _projection _polygon2d'.split()
+    __slots__ = ('lons lats _bbox _projection _polygon2d '
+                 '_mesh_spacing _mesh_coords').split()
 
     def __init__(self, points):
         points = utils.clean_points(points)
@@ -61,6 +66,8 @@ class Polygon(object):
         self._bbox = None
         self._projection = None
         self._polygon2d = None
+        self._mesh_spacing = None
+        self._mesh_coords = None
 
     @property
     def wkt(self):
@@ -110,6 +117,8 @@ class Polygon(object):
                                                          polygon.lats)
         polygon._polygon2d = polygon2d
         polygon._projection = proj
+        polygon._mesh_spacing = None
+        polygon._mesh_coords = None
         return polygon
 
     def _init_polygon2d(self):
@@ -182,45 +191,57 @@ class Polygon(object):
         Get a mesh of uniformly spaced points inside the polygon area
         with distance of ``mesh_spacing`` km between.
 
+        The coordinates of the points are cached, so that discretizing
+        the polygon again with the same spacing is cheap.
+
         :returns:
             An instance of :class:`~openquake.hazardlib.geo.mesh.Mesh` that
             holds the points data. Mesh is created with no depth information
             (all the points are on the Earth surface).
         """
+        if self._mesh_spacing != mesh_spacing:
+            self._mesh_coords = self._discretize(mesh_spacing)
+            self._mesh_spacing = mesh_spacing
+        lons, lats = self._mesh_coords
+        return Mesh(lons.copy(), lats.copy(), depths=None)
+
+    def _discretize(self, mesh_spacing):
+        """
+        :returns:
+            An array of shape (2, N) with the longitudes and the latitudes
+            of the points of the mesh, see :meth:`discretize`.
+        """
         self._init_polygon2d()
 
         west, east, north, south = self._bbox
 
-        lons = []
-        lats = []
-
         # we cover the bounding box (in spherical coordinates) from highest
         # to lowest latitude and from left to right by longitude. we step
-        # by mesh spacing distance (linear measure). we check each point
-        # if it is inside the polygon and yield the point object, if so.
-        # this way we produce an uniformly-spaced mesh regardless of the
-        # latitude.
-        latitude = north
-        while latitude > south:
-            longitude = west
-            while utils.get_longitudinal_extent(longitude, east) > 0:
-                # we use Cartesian space just for checking if a point
-                # is inside of the polygon.
-                x, y = self._projection(longitude, latitude)
-                if self._polygon2d.contains(shapely.geometry.Point(x, y)):
-                    lons.append(longitude)
-                    lats.append(latitude)
-
-                # move by mesh spacing along parallel...
-                longitude, _, = geodetic.point_at(longitude, latitude,
-                                                  90, mesh_spacing)
-            # ... and by the same distance along meridian in outer one
-            _, latitude = geodetic.point_at(west, latitude, 180, mesh_spacing)
-
-        lons = numpy.array(lons)
-        lats = numpy.array(lats)
-
-        return Mesh(lons, lats, depths=None)
+        # by mesh spacing distance (linear measure) along the meridian
+        # between the rows and along the great circle heading east inside
+        # each row. this way we produce an uniformly-spaced mesh regardless
+        # of the latitude.
+        lat_step = numpy.degrees(mesh_spacing / geodetic.EARTH_RADIUS)
+        lats = north - lat_step * numpy.arange(
+            int((north - south) / lat_step) + 1)
+        lats = lats[lats > south]
+        # the longitude step of a row depends only on its latitude
+        lon_steps, _ = geodetic.point_at(0., lats, 90, mesh_spacing)
+        num_cols = (utils.get_longitudinal_extent(west, east) //
+                    lon_steps).astype(int) + 1
+        rows = numpy.arange(len(lats)).repeat(num_cols)
+        cols = numpy.arange(len(rows)) - (numpy.cumsum(num_cols) -
+                                          num_cols).repeat(num_cols)
+        lons = west + cols * lon_steps[rows]
+        lons[lons >= 180] -= 360  # crossing the international date line
+        lats = lats[rows]
+
+        # we use Cartesian space just for checking if the points
+        # are inside of the polygon.
+        inside = utils.get_longitudinal_extent(lons, east) > 0
+        xx, yy = self._projection(lons[inside], lats[inside])
+        inside[inside] = contains_xy(self._polygon2d, xx, yy)
+        return numpy.array([lons[inside], lats[inside]])
 
 
 def get_resampled_coordinates(lons, lats):
@@ -16,7 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 Module :mod:`openquake.hazardlib.geo.surface.planar` contains
-:class:`PlanarSurface`.
+:class:`PlanarSurface` and :class:`PlanarSurfaceArray`.
 """
 import numpy
 
@@ -291,8 +291,15 @@ class PlanarSurface(BaseQuadrilateralSurface):
             and surface's plane in km, "x" and "y" coordinates of points'
             projections to the plane (in a surface's coordinate space).
         """
-        points = geo_utils.spherical_to_cartesian(lons, lats, depths)
+        return self._project_points(
+            geo_utils.spherical_to_cartesian(lons, lats, depths))
 
+    def _project_points(self, points):
+        """
+        Same as :meth:`_project`, but for points already converted in
+        Cartesian space, for instance by
+        :meth:`~openquake.hazardlib.geo.mesh.Mesh.get_xyz`.
+        """
         # uses method from http://www.9math.com/book/projection-point-plane
         dists = (self.normal * points).sum(axis=-1) + self.d
         t0 = - dists
@@ -333,7 +340,7 @@ class PlanarSurface(BaseQuadrilateralSurface):
         # the surface (translating coordinates of the projections to a local
         # 2d space) and at the same time calculate the distance to that
         # plane.
-        dists, xx, yy = self._project(mesh.lons, mesh.lats, mesh.depths)
+        dists, xx, yy = self._project_points(mesh.get_xyz())
         # the actual resulting distance is a square root of squares
         # of a distance from a point to a plane that contains the surface
         # and a distance from a projection of that point on that plane
@@ -414,7 +421,7 @@ class PlanarSurface(BaseQuadrilateralSurface):
         This is an optimized version specific to planar surface that doesn't
         make use of the mesh.
         """
-        dists, xx, yy = self._project(mesh.lons, mesh.lats, mesh.depths)
+        dists, xx, yy = self._project_points(mesh.get_xyz())
         mxx = xx.clip(0, self.length)
         myy = yy.clip(0, self.width)
         dists.fill(0)
@@ -594,3 +601,133 @@ class PlanarSurface(BaseQuadrilateralSurface):
         depth = (self.corner_depths[0] + self.corner_depths[3]) / 2.
 
         return Point(lon, lat, depth)
+
+
+@with_slots
+class PlanarSurfaceArray(object):
+    """
+    A collection of :class:`PlanarSurface` objects stored as arrays, for
+    instance the surfaces of all the ruptures of a point source, computing
+    the distances between all the surfaces and a mesh of sites at once.
+
+    The attributes have the same names of the attributes of
+    :class:`PlanarSurface`, with an additional first dimension of size R,
+    the number of surfaces: for instance ``normal`` has shape (R, 3) and
+    ``corner_lons`` has shape (R, 4).
+
+    The distance methods return arrays of shape (R, ) + the shape of the
+    mesh, where the row ``i`` contains the same values as the corresponding
+    method of the surface ``i``. Only the distances that
+    :class:`PlanarSurface` computes without its mesh are supported.
+
+    :param surfaces:
+        A non-empty sequence of :class:`PlanarSurface` instances.
+    """
+    #: Maximum number of elements of the intermediate arrays; the surfaces
+    #: are processed in blocks accordingly.
+    CHUNK_SIZE = 10 ** 6
+
+    __slots__ = ('strike dip width length '
+                 'corner_lons corner_lats corner_depths '
+                 'normal d uv1 uv2 zero_zero').split()
+
+    def __init__(self, surfaces):
+        if not len(surfaces):
+            raise ValueError('at least one surface is required')
+        for slot in self.__slots__:
+            setattr(self, slot, numpy.array(
+                [getattr(surface, slot) for surface in surfaces], float))
+
+    def __len__(self):
+        """
+        Return the number of surfaces.
+        """
+        return len(self.strike)
+
+    def _get_blocks(self, size):
+        """
+        Yield slices over the surfaces, each one selecting a number of
+        surfaces such that the blocks of intermediate arrays of ``size``
+        elements per surface do not exceed :attr:`CHUNK_SIZE` elements.
+        """
+        step = max(self.CHUNK_SIZE // max(size, 1), 1)
+        for start in range(0, len(self), step):
+            yield slice(start, start + step)
+
+    def get_top_edge_depth(self):
+        """
+        :returns: an array with the depths of the top edges
+        """
+        return self.corner_depths[:, 0]
+
+    def get_min_distance(self, mesh):
+        """
+        Same as :meth:`PlanarSurface.get_min_distance`, for all the
+        surfaces.
+        """
+        xyz = mesh.get_xyz().reshape(-1, 3)
+        result = numpy.empty((len(self), len(xyz)))
+        for sl in self._get_blocks(len(xyz) * 4):
+            # same as PlanarSurface._project_points, using dot products
+            # instead of arrays of vectors of shape (R, N, 3)
+            dists = (numpy.dot(self.normal[sl], xyz.T) +
+                     self.d[sl].reshape(-1, 1))
+            xx, yy = [
+                numpy.dot(uv[sl], xyz.T)
+                - dists * (uv[sl] * self.normal[sl]).sum(axis=-1)[:, None]
+                - (uv[sl] * self.zero_zero[sl]).sum(axis=-1)[:, None]
+                for uv in (self.uv1, self.uv2)]
+            length = self.length[sl].reshape(-1, 1)
+            width = self.width[sl].reshape(-1, 1)
+            # see PlanarSurface.get_min_distance
+            mxx = numpy.where(xx < 0, xx, numpy.where(xx > length,
+                                                      xx - length, 0))
+            myy = numpy.where(yy < 0, yy, numpy.where(yy > width,
+                                                      yy - width, 0))
+            result[sl] = numpy.sqrt(dists ** 2 + mxx ** 2 + myy ** 2)
+        return result.reshape((len(self), ) + mesh.shape)
+
+    def get_joyner_boore_distance(self, mesh):
+        """
+        Same as :meth:`PlanarSurface.get_joyner_boore_distance`, for all the
+        surfaces.
+        """
+        lons = mesh.lons.reshape(-1)
+        lats = mesh.lats.reshape(-1)
+        result = numpy.empty((len(self), len(lons)))
+        for sl in self._get_blocks(len(lons) * 8):
+            # the four arcs of PlanarSurface.get_joyner_boore_distance,
+            # along the first axis
+            arcs_lons = self.corner_lons[sl, [0, 2, 0, 1]].T[..., None]
+            arcs_lats = self.corner_lats[sl, [0, 2, 0, 1]].T[..., None]
+            strike = self.strike[sl]
+            downdip_azimuth = (strike + 90) % 360
+            arcs_azimuths = numpy.array(
+                [strike, strike, downdip_azimuth, downdip_azimuth])[..., None]
+            dists_to_arcs = geodetic.distance_to_arc(
+                arcs_lons, arcs_lats, arcs_azimuths, lons, lats)
+            dists_to_corners = geodetic.geodetic_distance(
+                self.corner_lons[sl].T[..., None],
+                self.corner_lats[sl].T[..., None], lons, lats).min(axis=0)
+            ds1, ds2, ds3, ds4 = numpy.sign(dists_to_arcs)
+            dists_to_arcs = numpy.abs(dists_to_arcs)
+            result[sl] = numpy.select(
+                condlist=[(ds1 == ds2) & (ds3 == ds4), ds1 == ds2, ds3 == ds4],
+                choicelist=[dists_to_corners,
+                            numpy.minimum(dists_to_arcs[0], dists_to_arcs[1]),
+                            numpy.minimum(dists_to_arcs[2], dists_to_arcs[3])],
+                default=0)
+        return result.reshape((len(self), ) + mesh.shape)
+
+    def get_rx_distance(self, mesh):
+        """
+        Same as :meth:`PlanarSurface.get_rx_distance`, for all the surfaces.
+        """
+        lons = mesh.lons.reshape(-1)
+        lats = mesh.lats.reshape(-1)
+        result = numpy.empty((len(self), len(lons)))
+        for sl in self._get_blocks(len(lons)):
+            result[sl] = geodetic.distance_to_arc(
+                self.corner_lons[sl, :1], self.corner_lats[sl, :1],
+                self.strike[sl, None], lons, lats)
+        return result.reshape((len(self), ) + mesh.shape)
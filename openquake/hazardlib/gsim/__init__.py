@@ -21,10 +21,14 @@ implementations of ground shaking intensity models. See
 import os
 import inspect
 import importlib
+import collections
 from collections import OrderedDict
+from openquake.baselib.general import run_in_process
 from openquake.hazardlib.gsim.base import (
     GMPE, IPE, GroundShakingIntensityModel)
 
+INDEX_FILE = os.path.join(os.path.dirname(__file__), 'gsim_index.py')
+
 
 def get_available_gsims():
     '''
@@ -43,3 +47,117 @@ def get_available_gsims():
                         GroundShakingIntensityModel, GMPE, IPE):
                     gsims[cls.__name__] = cls
     return OrderedDict((k, gsims[k]) for k in sorted(gsims))
+
+
+def get_gsim_index():
+    """
+    Import all the GSIM modules and return an ordered dictionary
+    GSIM class name -> name of the module defining the class. This is
+    the content of the prebuilt index used by :class:`GsimRegistry`.
+    """
+    return OrderedDict((name, cls.__module__)
+                       for name, cls in get_available_gsims().items())
+
+
+def write_gsim_index(fname=INDEX_FILE):
+    """
+    Regenerate the module containing the prebuilt GSIM index. It must be
+    called every time a GSIM class is added, renamed or moved.
+
+    :param fname: the path of the generated module
+    """
+    lines = ['# This file has been generated by '
+             'openquake.hazardlib.gsim.write_gsim_index',
+             '# DO NOT EDIT: regenerate it when adding or renaming a GSIM',
+             '"""',
+             'Prebuilt index GSIM class name -> module name, used by',
+             ':class:`openquake.hazardlib.gsim.GsimRegistry`.',
+             '"""',
+             'GSIM_MODULES = {']
+    for name, modname in get_gsim_index().items():
+        line = '    %r: %r,' % (name, modname)
+        if len(line) > 79:  # respect PEP8
+            line = '    %r:\n        %r,' % (name, modname)
+        lines.append(line)
+    lines.append('}')
+    with open(fname, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class GsimRegistry(collections.Mapping):
+    """
+    A lazily populated dictionary GSIM class name -> GSIM class. The keys
+    come from a prebuilt index (see :func:`write_gsim_index`), so that
+    looking up a GSIM imports only the module defining it, not all the
+    modules in the package:
+
+    >>> registry = GsimRegistry()
+    >>> registry['BooreAtkinson2008'].__name__
+    'BooreAtkinson2008'
+
+    :param index:
+        a dictionary GSIM class name -> module name; if not given, the
+        prebuilt index in :mod:`openquake.hazardlib.gsim.gsim_index`
+        is used
+    """
+    def __init__(self, index=None):
+        if index is None:
+            from openquake.hazardlib.gsim.gsim_index import GSIM_MODULES
+            index = GSIM_MODULES
+        self.index = index
+        self._classes = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._classes[name]
+        except KeyError:
+            pass
+        try:
+            modname = self.index[name]
+        except KeyError:
+            raise KeyError('Unknown GSIM: %s' % name)
+        self._classes[name] = cls = getattr(
+            importlib.import_module(modname), name)
+        return cls
+
+    def __iter__(self):
+        return iter(sorted(self.index))
+
+    def __len__(self):
+        return len(self.index)
+
+
+registry = GsimRegistry()
+
+
+def get_gsim_class(name):
+    """
+    :param name: the name of a GSIM class, like 'BooreAtkinson2008'
+    :returns: the GSIM class, importing only the module defining it
+    :raises KeyError: if the GSIM is not in the index
+    """
+    return registry[name]
+
+
+def get_import_times(modnames=None):
+    """
+    Measure the time spent importing the GSIM modules. Each module is
+    imported in a separate process, after the GSIM base module, so that
+    the measure does not depend on the modules imported before.
+
+    :param modnames:
+        a list of module names (by default all the modules in the index)
+    :returns:
+        an ordered dictionary module name -> import time in seconds,
+        sorted by decreasing time
+    """
+    if modnames is None:
+        modnames = set(registry.index.values())
+    code = ('import time, importlib\n'
+            'import openquake.hazardlib.gsim.base\n'
+            't0 = time.time()\n'
+            'importlib.import_module(%r)\n'
+            'print(time.time() - t0)')
+    times = dict((modname, run_in_process(code, modname))
+                 for modname in modnames)
+    return OrderedDict(sorted(times.items(), key=lambda item: -item[1]))
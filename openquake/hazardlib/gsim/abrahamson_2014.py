@@ -85,15 +85,16 @@ class AbrahamsonEtAl2014(GMPE):
         """
         # get the necessary set of coefficients
         C = self.COEFFS[imt]
+        # the terms not depending on the site conditions are the same
+        # for rock and for the actual sites, so compute them only once
+        rock_mean = self._get_rock_term(C, imt, rup, dists)
         # compute median sa on rock (vs30=1180m/s). Used for site response
         # term calculation
-        sa1180 = np.exp(self._get_sa_at_1180(C, imt, sites, rup, dists))
+        sa1180 = np.exp(self._get_sa_at_1180(C, imt, sites, rup, dists,
+                                             rock_mean))
         # get the mean value
-        mean = (self._get_basic_term(C, rup, dists) +
-                self._get_faulting_style_term(C, rup) +
+        mean = (rock_mean +
                 self._get_site_response_term(C, imt, sites.vs30, sa1180) +
-                self._get_hanging_wall_term(C, dists, rup) +
-                self._get_top_of_rupture_depth_term(C, imt, rup) +
                 self._get_soil_depth_term(C, sites.z1pt0, sites.vs30)
                 )
         mean += self._get_regional_term(C, imt, sites.vs30, dists.rrup)
@@ -102,11 +103,25 @@ class AbrahamsonEtAl2014(GMPE):
                                     dists)
         return mean, stddevs
 
-    def _get_sa_at_1180(self, C, imt, sites, rup, dists):
+    def _get_rock_term(self, C, imt, rup, dists):
+        """
+        Compute and return the sum of the terms not depending on the site
+        conditions, i.e. the basic, faulting style, hanging wall and top of
+        rupture depth terms
+        """
+        return (self._get_basic_term(C, rup, dists) +
+                self._get_faulting_style_term(C, rup) +
+                self._get_hanging_wall_term(C, dists, rup) +
+                self._get_top_of_rupture_depth_term(C, imt, rup))
+
+    def _get_sa_at_1180(self, C, imt, sites, rup, dists, rock_mean=None):
         """
         Compute and return mean imt value for rock conditions
-        (vs30 = 1100 m/s)
+        (vs30 = 1100 m/s). The terms independent from the site conditions
+        can be passed as ``rock_mean`` if already computed.
         """
+        if rock_mean is None:
+            rock_mean = self._get_rock_term(C, imt, rup, dists)
         # reference vs30 = 1180 m/s
         vs30_1180 = np.ones_like(sites.vs30) * 1180
         # reference shaking intensity = 0
@@ -114,11 +129,8 @@ class AbrahamsonEtAl2014(GMPE):
         # fake Z1.0 - Since negative it will be replaced by the default Z1.0
         # for the corresponding region
         fake_z1pt0 = np.ones_like(sites.vs30) * -1
-        return (self._get_basic_term(C, rup, dists) +
-                self._get_faulting_style_term(C, rup) +
+        return (rock_mean +
                 self._get_site_response_term(C, imt, vs30_1180, ref_iml) +
-                self._get_hanging_wall_term(C, dists, rup) +
-                self._get_top_of_rupture_depth_term(C, imt, rup) +
                 self._get_soil_depth_term(C, fake_z1pt0, vs30_1180) +
                 self._get_regional_term(C, imt, vs30_1180, dists.rrup)
                 )
@@ -110,13 +110,15 @@ class AtkinsonBoore2006(BooreAtkinson2008):
         """
         C_HR, C_BC, C_SR, SC = self._extract_coeffs(imt)
 
-        rrup = self._clip_distances(rrup)
-
-        f0 = self._compute_f0_factor(rrup)
-        f1 = self._compute_f1_factor(rrup)
-        f2 = self._compute_f2_factor(rrup)
-
-        pga_bc = self._get_pga_bc(
+        # the distance factors and the PGA on BC boundary do not depend on
+        # the IMT (apart from the stress drop adjustment, which is part of
+        # the key), so they are shared inside a shared_terms block
+        rrup, f0, f1, f2 = self._get_shared(
+            'distance_factors', (rrup, ), self._get_distance_factors, rrup)
+
+        stress_adj = self._compute_stress_drop_adjustment(SC, mag, scale_fac)
+        pga_bc = self._get_shared(
+            ('pga_bc', mag, stress_adj), (vs30, rrup), self._get_pga_bc,
             f0, f1, f2, SC, mag, rrup, vs30, scale_fac
         )
 
@@ -139,6 +141,15 @@ class AtkinsonBoore2006(BooreAtkinson2008):
 
         return mean
 
+    def _get_distance_factors(self, rrup):
+        """
+        Compute and return the clipped distances and the factors f0, f1 and
+        f2, see equation (5), p. 2191
+        """
+        rrup = self._clip_distances(rrup)
+        return (rrup, self._compute_f0_factor(rrup),
+                self._compute_f1_factor(rrup), self._compute_f2_factor(rrup))
+
     def _get_pga_bc(self, f0, f1, f2, SC, mag, rrup, vs30, scale_fac):
         """
         Compute and return PGA on BC boundary
@@ -25,6 +25,7 @@ import math
 import warnings
 import functools
 import contextlib
+import threading
 
 import scipy.stats
 from scipy.special import ndtr
@@ -287,6 +288,73 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         compute interim steps).
         """
 
+    @property
+    def _shared_terms(self):
+        """
+        Dictionary of intermediate results shared across the calls to
+        :meth:`get_mean_and_stddevs` by the current thread, set only inside
+        a :meth:`shared_terms` block and None outside
+        """
+        entry = _get_thread_caches().get(id(self))
+        return None if entry is None else entry[0]
+
+    @contextlib.contextmanager
+    def shared_terms(self):
+        """
+        Context manager within which the intermediate results that do not
+        depend on the intensity measure type (typically the ground motion
+        on reference rock needed by a nonlinear site term) are computed
+        only once per set of contexts and reused by all the following calls
+        to :meth:`get_mean_and_stddevs`. The contexts must not be modified
+        inside the block. Nested blocks share the outermost cache. The
+        cache is local to the thread, so the same GSIM can be used by many
+        threads at once, each in its own block.
+
+        >>> from openquake.hazardlib.gsim.boore_2014 import BooreEtAl2014
+        >>> gsim = BooreEtAl2014()
+        >>> with gsim.shared_terms():
+        ...     gsim._shared_terms
+        {}
+        >>> print(gsim._shared_terms)
+        None
+        """
+        caches = _get_thread_caches()
+        key = id(self)
+        if key in caches:
+            yield
+            return
+        # the GSIM is stored too, so that its id cannot be reused
+        caches[key] = {}, self
+        try:
+            yield
+        finally:
+            del caches[key]
+
+    def _get_shared(self, key, objects, func, *args):
+        """
+        Return ``func(*args)``. Inside a :meth:`shared_terms` block the
+        value is computed only once for the given ``key`` and the given
+        ``objects`` (usually the contexts), which are compared by identity.
+
+        :param key:
+            A hashable identifying the intermediate result
+        :param objects:
+            A tuple of objects on which the intermediate result depends
+        :param func:
+            The callable computing the result
+        """
+        cache = self._shared_terms
+        if cache is None:
+            return func(*args)
+        key = (key, ) + tuple(id(obj) for obj in objects)
+        try:
+            return cache[key][0]
+        except KeyError:
+            value = func(*args)
+            # the objects are stored too, so that their ids cannot be reused
+            cache[key] = value, objects
+            return value
+
     def get_poes(self, sctx, rctx, dctx, imt, imls, truncation_level):
         """
         Calculate and return probabilities of exceedance (PoEs) of one or more
@@ -401,45 +469,8 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         # normal distributions
         iml = self.to_distribution_values(iml)
         standard_imls = (iml - mean) / stddev
-
-        distribution = scipy.stats.truncnorm(- truncation_level,
-                                             truncation_level)
-        epsilons = numpy.linspace(- truncation_level, truncation_level,
-                                  n_epsilons + 1)
-        # compute epsilon bins contributions
-        contribution_by_bands = (distribution.cdf(epsilons[1:]) -
-                                 distribution.cdf(epsilons[:-1]))
-
-        # take the minimum epsilon larger than standard_iml
-        iml_bin_indices = numpy.searchsorted(epsilons, standard_imls)
-
-        return numpy.array([
-            # take full disaggregated distribution for the case of
-            # ``iml <= mean - truncation_level * stddev``
-            contribution_by_bands
-            if idx == 0 else
-
-            # take zeros if ``iml >= mean + truncation_level * stddev``
-            numpy.zeros(n_epsilons)
-            if idx >= n_epsilons + 1 else
-
-            # for other cases (when ``iml`` falls somewhere in the
-            # histogram):
-            numpy.concatenate((
-                # take zeros for bins that are on the left hand side
-                # from the bin ``iml`` falls into,
-                numpy.zeros(idx - 1),
-                # ... area of the portion of the bin containing ``iml``
-                # (the portion is limited on the left hand side by
-                # ``iml`` and on the right hand side by the bin edge),
-                [distribution.sf(standard_imls[i])
-                 - contribution_by_bands[idx:].sum()],
-                # ... and all bins on the right go unchanged.
-                contribution_by_bands[idx:]
-            ))
-
-            for i, idx in enumerate(iml_bin_indices)
-        ])
+        return _disaggregate_standard_imls(
+            standard_imls, truncation_level, n_epsilons)
 
     @abc.abstractmethod
     def to_distribution_values(self, values):
@@ -464,7 +495,8 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         so there is no need to override it in actual GSIM implementations.
         """
 
-    def make_distances_context(self, site_collection, rupture):
+    def make_distances_context(self, site_collection, rupture,
+                               distance_engine=None):
         """
         Create distances context object for given site collection and rupture.
 
@@ -478,6 +510,12 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
             :class:
             `~openquake.hazardlib.source.rupture.BaseProbabilisticRupture`).
 
+        :param distance_engine:
+            Optional instance of
+            :class:`~openquake.hazardlib.geo.distance_engine.DistanceEngine`
+            computing the distances ``rrup`` and ``rjb``; by default they
+            are computed by the methods of the rupture surface.
+
         :returns:
             Source to site distances as instance of :class:
             `DistancesContext()`. Only those  values that are required by GSIM
@@ -488,12 +526,18 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         """
         dctx = DistancesContext()
         for param in self.REQUIRES_DISTANCES:
-            if param == 'rrup':
+            if param == 'rrup' and distance_engine is not None:
+                dist = distance_engine.get_min_distance(
+                    rupture.surface, site_collection)
+            elif param == 'rrup':
                 dist = rupture.surface.get_min_distance(site_collection.mesh)
             elif param == 'rx':
                 dist = rupture.surface.get_rx_distance(site_collection.mesh)
             elif param == 'ry0':
                 dist = rupture.surface.get_ry0_distance(site_collection.mesh)
+            elif param == 'rjb' and distance_engine is not None:
+                dist = distance_engine.get_joyner_boore_distance(
+                    rupture.surface, site_collection)
             elif param == 'rjb':
                 dist = rupture.surface.get_joyner_boore_distance(
                     site_collection.mesh
@@ -584,7 +628,7 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
             setattr(rctx, param, value)
         return rctx
 
-    def make_contexts(self, site_collection, rupture):
+    def make_contexts(self, site_collection, rupture, distance_engine=None):
         """
         Create context objects for given site collection and rupture.
 
@@ -597,6 +641,9 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
             subclass of
             :class:`~openquake.hazardlib.source.rupture.BaseProbabilisticRupture`).
 
+        :param distance_engine:
+            Optional distance engine, see :meth:`make_distances_context`.
+
         :returns:
             Tuple of three items: sites context, rupture context and
             distances context, that is, instances of
@@ -611,7 +658,8 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         """
         return (self.make_sites_context(site_collection),
                 self.make_rupture_context(rupture),
-                self.make_distances_context(site_collection, rupture))
+                self.make_distances_context(site_collection, rupture,
+                                            distance_engine))
 
     def _check_imt(self, imt):
         """
@@ -654,6 +702,40 @@ class GroundShakingIntensityModel(with_metaclass(MetaGSIM)):
         return repr("%s(%s)" % (self.__class__.__name__, kwargs))
 
 
+_thread_local = threading.local()
+
+
+def _get_thread_caches():
+    """
+    :returns:
+        the dictionary id(gsim) -> (cache, gsim) of the GSIMs inside a
+        :meth:`GroundShakingIntensityModel.shared_terms` block in the
+        current thread
+    """
+    try:
+        return _thread_local.shared_terms
+    except AttributeError:
+        caches = _thread_local.shared_terms = {}
+        return caches
+
+
+@contextlib.contextmanager
+def _no_shared_terms():
+    yield
+
+
+def shared_terms(gsim):
+    """
+    :param gsim: a GSIM instance or any object with the GSIM interface
+    :returns:
+        the context manager :meth:`GroundShakingIntensityModel.shared_terms`
+        of ``gsim``, or a do-nothing context manager if the object does not
+        support shared terms
+    """
+    method = getattr(gsim, 'shared_terms', None)
+    return _no_shared_terms() if method is None else method()
+
+
 def _truncnorm_sf(truncation_level, values):
     """
     Survival function for truncated normal distribution.
@@ -855,10 +937,14 @@ class CoeffsTable(object):
 
     Names of other columns are used as coefficients dicts keys. The values
     in the first column should correspond to real intensity measure types,
-    see :mod:`openquake.hazardlib.imt`:
+    see :mod:`openquake.hazardlib.imt`. The rows of the table are parsed
+    only when the table is used for the first time, so that importing a
+    GSIM module is cheap; errors in the rows are raised at that moment:
 
-    >>> CoeffsTable(table='''imt  z
-    ...                      pgx  2''')
+    >>> from openquake.hazardlib import imt
+    >>> ct = CoeffsTable(table='''imt  z
+    ...                           pgx  2''')
+    >>> ct[imt.PGA()]
     Traceback (most recent call last):
         ...
     ValueError: unknown IMT 'PGX'
@@ -878,12 +964,12 @@ class CoeffsTable(object):
     are not referenced by name, because they require parametrization:
 
     >>> CoeffsTable(table='''imt  x
-    ...                      sa   15''')
+    ...                      sa   15''')[imt.PGA()]
     Traceback (most recent call last):
         ...
     ValueError: specify period as float value to declare SA IMT
     >>> CoeffsTable(table='''imt  x
-    ...                      0.1  20''')
+    ...                      0.1  20''')[imt.PGA()]
     Traceback (most recent call last):
         ...
     TypeError: attribute "sa_damping" is required for tables defining SA
@@ -902,7 +988,6 @@ class CoeffsTable(object):
     Table objects could be indexed by IMT objects (this returns a dictionary
     of coefficients):
 
-    >>> from openquake.hazardlib import imt
     >>> ct[imt.PGA()] == dict(a=1, b=2.4, c=-5, d=0.01)
     True
     >>> ct[imt.PGD()] == dict(a=7.6, b=12, c=0, d=44.1)
@@ -946,16 +1031,40 @@ class CoeffsTable(object):
     def __init__(self, **kwargs):
         if not 'table' in kwargs:
             raise TypeError('CoeffsTable requires "table" kwarg')
-        table = kwargs.pop('table').strip().splitlines()
-        sa_damping = kwargs.pop('sa_damping', None)
+        self._table = kwargs.pop('table')
+        self.sa_damping = kwargs.pop('sa_damping', None)
         if kwargs:
             raise TypeError('CoeffsTable got unexpected kwargs: %r' % kwargs)
-        header = table.pop(0).split()
-        if not header[0].upper() == "IMT":
+        header = self._table.lstrip().split(None, 1)
+        if not header or not header[0].upper() == "IMT":
             raise ValueError('first column in a table must be IMT')
-        coeff_names = header[1:]
-        self.sa_coeffs = {}
-        self.non_sa_coeffs = {}
+        self._sa_coeffs = self._non_sa_coeffs = None
+
+    @property
+    def sa_coeffs(self):
+        """
+        Dictionary SA IMT -> coefficients, parsed at the first access
+        """
+        if self._sa_coeffs is None:
+            self._parse()
+        return self._sa_coeffs
+
+    @property
+    def non_sa_coeffs(self):
+        """
+        Dictionary non-SA IMT -> coefficients, parsed at the first access
+        """
+        if self._non_sa_coeffs is None:
+            self._parse()
+        return self._non_sa_coeffs
+
+    def _parse(self):
+        # parse the table string; the dictionaries are set only if
+        # the whole table is valid
+        table = self._table.strip().splitlines()
+        coeff_names = table.pop(0).split()[1:]
+        sa_coeffs = {}
+        non_sa_coeffs = {}
         for row in table:
             row = row.split()
             imt_name = row[0].upper()
@@ -969,13 +1078,15 @@ class CoeffsTable(object):
                 if not hasattr(imt_module, imt_name):
                     raise ValueError('unknown IMT %r' % imt_name)
                 imt = getattr(imt_module, imt_name)()
-                self.non_sa_coeffs[imt] = imt_coeffs
+                non_sa_coeffs[imt] = imt_coeffs
             else:
-                if sa_damping is None:
+                if self.sa_damping is None:
                     raise TypeError('attribute "sa_damping" is required '
                                     'for tables defining SA')
-                imt = imt_module.SA(sa_period, sa_damping)
-                self.sa_coeffs[imt] = imt_coeffs
+                imt = imt_module.SA(sa_period, self.sa_damping)
+                sa_coeffs[imt] = imt_coeffs
+        self._sa_coeffs = sa_coeffs
+        self._non_sa_coeffs = non_sa_coeffs
 
     def __getitem__(self, imt):
         """
@@ -1021,3 +1132,51 @@ class CoeffsTable(object):
             (co, (min_above[co] - max_below[co]) * ratio + max_below[co])
             for co in max_below
         )
+
+
+def _disaggregate_standard_imls(standard_imls, truncation_level, n_epsilons):
+    """
+    Disaggregate the PoEs of standardized intensity measure levels in
+    ``n_epsilons`` bands of the truncated normal distribution, see
+    :meth:`GroundShakingIntensityModel.disaggregate_poe`.
+
+    :param standard_imls:
+        1d array of intensity measure levels in units of standard deviations
+        from the mean.
+    :param truncation_level:
+        Positive float number, the truncation in units of sigma.
+    :param n_epsilons:
+        Integer number of bands.
+    :returns:
+        2d array of shape (len(standard_imls), n_epsilons).
+    """
+    standard_imls = numpy.asarray(standard_imls, float).reshape(-1)
+    distribution = scipy.stats.truncnorm(- truncation_level,
+                                         truncation_level)
+    epsilons = numpy.linspace(- truncation_level, truncation_level,
+                              n_epsilons + 1)
+    # compute epsilon bins contributions
+    contribution_by_bands = (distribution.cdf(epsilons[1:]) -
+                             distribution.cdf(epsilons[:-1]))
+    # contribution of the bands from the i-th to the last one
+    tail = numpy.append(numpy.cumsum(contribution_by_bands[::-1])[::-1], 0)
+
+    # take the minimum epsilon larger than standard_iml
+    iml_bin_indices = numpy.searchsorted(epsilons, standard_imls)
+
+    # take the full disaggregated distribution on the bins on the right
+    # hand side of the bin ``iml`` falls into, that is everything
+    # if ``iml <= mean - truncation_level * stddev`` and nothing if
+    # ``iml >= mean + truncation_level * stddev``
+    bands = numpy.arange(n_epsilons)
+    poes = numpy.where(bands >= iml_bin_indices[:, None],
+                       contribution_by_bands, 0.)
+    # for the bin containing ``iml`` take the area of the portion of the
+    # bin limited on the left hand side by ``iml`` and on the right hand
+    # side by the bin edge
+    [inside] = numpy.where((iml_bin_indices > 0) &
+                           (iml_bin_indices <= n_epsilons))
+    idx = iml_bin_indices[inside]
+    poes[inside, idx - 1] = (distribution.sf(standard_imls[inside]) -
+                             tail[idx])
+    return poes
@@ -95,7 +95,8 @@ class BooreEtAl2014(GMPE):
             imt_per = 0.0
         else:
             imt_per = imt.period
-        pga_rock = self._get_pga_on_rock(C_PGA, rup, dists)
+        pga_rock = self._get_shared('pga_rock', (rup, dists),
+                                    self._get_pga_on_rock, C_PGA, rup, dists)
         mean = (self._get_magnitude_scaling_term(C, rup) +
                 self._get_path_scaling(C, dists, rup.mag) +
                 self._get_site_scaling(C, pga_rock, sites, imt_per, dists.rjb))
@@ -84,7 +84,8 @@ class BooreAtkinson2008(GMPE):
 
         # compute PGA on rock conditions - needed to compute non-linear
         # site amplification term
-        pga4nl = self._get_pga_on_rock(rup, dists, C)
+        pga4nl = self._get_shared('pga4nl', (rup, dists),
+                                  self._get_pga_on_rock, rup, dists, C)
 
         # equation 1, pag 106, without sigma term, that is only the first 3
         # terms. The third term (site amplification) is computed as given in
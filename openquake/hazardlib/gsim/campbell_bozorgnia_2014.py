@@ -98,15 +98,20 @@ class CampbellBozorgnia2014(GMPE):
         C = self.COEFFS[imt]
         C_PGA = self.COEFFS[PGA()]
 
-        # Get mean and standard deviation of PGA on rock (Vs30 1100 m/s^2)
-        pga1100 = np.exp(self.get_mean_values(C_PGA, sites, rup, dists, None))
+        # Get mean and standard deviation of PGA on rock (Vs30 1100 m/s^2);
+        # it does not depend on the IMT, so it is shared across the calls
+        # inside a shared_terms block
+        ctxs = (sites, rup, dists)
+        pga1100 = self._get_shared('pga1100', ctxs, self._get_pga_on_rock,
+                                   C_PGA, sites, rup, dists)
         # Get mean and standard deviations for IMT
         mean = self.get_mean_values(C, sites, rup, dists, pga1100)
         if isinstance(imt, SA) and (imt.period <= 0.25):
             # According to Campbell & Bozorgnia (2013) [NGA West 2 Report]
             # If Sa (T) < PGA for T < 0.25 then set mean Sa(T) to mean PGA
             # Get PGA on soil
-            pga = self.get_mean_values(C_PGA, sites, rup, dists, pga1100)
+            pga = self._get_shared('pga', ctxs, self.get_mean_values,
+                                   C_PGA, sites, rup, dists, pga1100)
             idx = mean <= pga
             mean[idx] = pga[idx]
         # Get standard deviations
@@ -118,6 +123,13 @@ class CampbellBozorgnia2014(GMPE):
                                     stddev_types)
         return mean, stddevs
 
+    def _get_pga_on_rock(self, C_PGA, sites, rup, dists):
+        """
+        Returns the median PGA on rock (Vs30 1100 m/s), needed by the
+        nonlinear site response term
+        """
+        return np.exp(self.get_mean_values(C_PGA, sites, rup, dists, None))
+
     def get_mean_values(self, C, sites, rup, dists, a1100):
         """
         Returns the mean values for a specific IMT
@@ -0,0 +1,346 @@
+# This file has been generated by openquake.hazardlib.gsim.write_gsim_index
+# DO NOT EDIT: regenerate it when adding or renaming a GSIM
+"""
+Prebuilt index GSIM class name -> module name, used by
+:class:`openquake.hazardlib.gsim.GsimRegistry`.
+"""
+GSIM_MODULES = {
+    'AbrahamsonEtAl2014': 'openquake.hazardlib.gsim.abrahamson_2014',
+    'AbrahamsonEtAl2014NSHMPLower': 'openquake.hazardlib.gsim.nshmp_2014',
+    'AbrahamsonEtAl2014NSHMPUpper': 'openquake.hazardlib.gsim.nshmp_2014',
+    'AbrahamsonEtAl2014RegCHN': 'openquake.hazardlib.gsim.abrahamson_2014',
+    'AbrahamsonEtAl2014RegJPN': 'openquake.hazardlib.gsim.abrahamson_2014',
+    'AbrahamsonEtAl2014RegTWN': 'openquake.hazardlib.gsim.abrahamson_2014',
+    'AbrahamsonEtAl2015SInter': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonEtAl2015SInterHigh': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonEtAl2015SInterLow': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonEtAl2015SSlab': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonEtAl2015SSlabHigh': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonEtAl2015SSlabLow': 'openquake.hazardlib.gsim.abrahamson_2015',
+    'AbrahamsonSilva1997': 'openquake.hazardlib.gsim.abrahamson_silva_1997',
+    'AbrahamsonSilva2008': 'openquake.hazardlib.gsim.abrahamson_silva_2008',
+    'AkkarBommer2010': 'openquake.hazardlib.gsim.akkar_bommer_2010',
+    'AkkarBommer2010SWISS01': 'openquake.hazardlib.gsim.akkar_bommer_2010',
+    'AkkarBommer2010SWISS04': 'openquake.hazardlib.gsim.akkar_bommer_2010',
+    'AkkarBommer2010SWISS08': 'openquake.hazardlib.gsim.akkar_bommer_2010',
+    'AkkarCagnan2010': 'openquake.hazardlib.gsim.akkar_cagnan_2010',
+    'AkkarEtAl2013': 'openquake.hazardlib.gsim.akkar_2013',
+    'AkkarEtAlRepi2014': 'openquake.hazardlib.gsim.akkar_2014',
+    'AkkarEtAlRhyp2014': 'openquake.hazardlib.gsim.akkar_2014',
+    'AkkarEtAlRjb2014': 'openquake.hazardlib.gsim.akkar_2014',
+    'Allen2012': 'openquake.hazardlib.gsim.allen_2012',
+    'Atkinson2015': 'openquake.hazardlib.gsim.atkinson_2015',
+    'AtkinsonBoore1995GSCBest': 'openquake.hazardlib.gsim.atkinson_boore_1995',
+    'AtkinsonBoore1995GSCLowerLimit':
+        'openquake.hazardlib.gsim.atkinson_boore_1995',
+    'AtkinsonBoore1995GSCUpperLimit':
+        'openquake.hazardlib.gsim.atkinson_boore_1995',
+    'AtkinsonBoore2003SInter': 'openquake.hazardlib.gsim.atkinson_boore_2003',
+    'AtkinsonBoore2003SInterNSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2003',
+    'AtkinsonBoore2003SSlab': 'openquake.hazardlib.gsim.atkinson_boore_2003',
+    'AtkinsonBoore2003SSlabCascadiaNSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2003',
+    'AtkinsonBoore2003SSlabNSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2003',
+    'AtkinsonBoore2006': 'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006MblgAB1987bar140NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006MblgAB1987bar200NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006MblgJ1996bar140NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006MblgJ1996bar200NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006Modified2011':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006Mwbar140NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonBoore2006Mwbar200NSHMP2008':
+        'openquake.hazardlib.gsim.atkinson_boore_2006',
+    'AtkinsonMacias2009': 'openquake.hazardlib.gsim.atkinson_macias_2009',
+    'BergeThierryEtAl2003SIGMA': 'openquake.hazardlib.gsim.berge_thierry_2003',
+    'BindiEtAl2011': 'openquake.hazardlib.gsim.bindi_2011',
+    'BindiEtAl2014Rhyp': 'openquake.hazardlib.gsim.bindi_2014',
+    'BindiEtAl2014RhypEC8': 'openquake.hazardlib.gsim.bindi_2014',
+    'BindiEtAl2014RhypEC8NoSOF': 'openquake.hazardlib.gsim.bindi_2014',
+    'BindiEtAl2014Rjb': 'openquake.hazardlib.gsim.bindi_2014',
+    'BindiEtAl2014RjbEC8': 'openquake.hazardlib.gsim.bindi_2014',
+    'BindiEtAl2014RjbEC8NoSOF': 'openquake.hazardlib.gsim.bindi_2014',
+    'BooreAtkinson2008': 'openquake.hazardlib.gsim.boore_atkinson_2008',
+    'BooreAtkinson2011': 'openquake.hazardlib.gsim.boore_atkinson_2011',
+    'BooreEtAl1993GSCBest': 'openquake.hazardlib.gsim.boore_1993',
+    'BooreEtAl1993GSCLowerLimit': 'openquake.hazardlib.gsim.boore_1993',
+    'BooreEtAl1993GSCUpperLimit': 'openquake.hazardlib.gsim.boore_1993',
+    'BooreEtAl1997ArbitraryHorizontal': 'openquake.hazardlib.gsim.boore_1997',
+    'BooreEtAl1997ArbitraryHorizontalUnspecified':
+        'openquake.hazardlib.gsim.boore_1997',
+    'BooreEtAl1997GeometricMean': 'openquake.hazardlib.gsim.boore_1997',
+    'BooreEtAl1997GeometricMeanUnspecified':
+        'openquake.hazardlib.gsim.boore_1997',
+    'BooreEtAl2014': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014CaliforniaBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014CaliforniaBasinNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQ': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQCaliforniaBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQCaliforniaBasinNoSOF':
+        'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQJapanBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQJapanBasinNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014HighQNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014JapanBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014JapanBasinNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQ': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQCaliforniaBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQCaliforniaBasinNoSOF':
+        'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQJapanBasin': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQJapanBasinNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014LowQNoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'BooreEtAl2014NSHMPLower': 'openquake.hazardlib.gsim.nshmp_2014',
+    'BooreEtAl2014NSHMPUpper': 'openquake.hazardlib.gsim.nshmp_2014',
+    'BooreEtAl2014NoSOF': 'openquake.hazardlib.gsim.boore_2014',
+    'Bradley2013': 'openquake.hazardlib.gsim.bradley_2013',
+    'Bradley2013Volc': 'openquake.hazardlib.gsim.bradley_2013',
+    'Campbell2003': 'openquake.hazardlib.gsim.campbell_2003',
+    'Campbell2003MblgAB1987NSHMP2008':
+        'openquake.hazardlib.gsim.campbell_2003',
+    'Campbell2003MblgJ1996NSHMP2008': 'openquake.hazardlib.gsim.campbell_2003',
+    'Campbell2003MwNSHMP2008': 'openquake.hazardlib.gsim.campbell_2003',
+    'Campbell2003SHARE': 'openquake.hazardlib.gsim.campbell_2003',
+    'CampbellBozorgnia2003NSHMP2007':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2003',
+    'CampbellBozorgnia2008':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2008',
+    'CampbellBozorgnia2008Arbitrary':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2008',
+    'CampbellBozorgnia2014':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014HighQ':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014HighQJapanSite':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014JapanSite':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014LowQ':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014LowQJapanSite':
+        'openquake.hazardlib.gsim.campbell_bozorgnia_2014',
+    'CampbellBozorgnia2014NSHMPLower': 'openquake.hazardlib.gsim.nshmp_2014',
+    'CampbellBozorgnia2014NSHMPUpper': 'openquake.hazardlib.gsim.nshmp_2014',
+    'CauzziEtAl2014': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziEtAl2014Eurocode8': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziEtAl2014Eurocode8NoSOF': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziEtAl2014FixedVs30': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziEtAl2014FixedVs30NoSOF': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziEtAl2014NoSOF': 'openquake.hazardlib.gsim.cauzzi_2014',
+    'CauzziFaccioli2008': 'openquake.hazardlib.gsim.cauzzi_faccioli_2008',
+    'CauzziFaccioli2008SWISS01':
+        'openquake.hazardlib.gsim.cauzzi_faccioli_2008_swiss',
+    'CauzziFaccioli2008SWISS04':
+        'openquake.hazardlib.gsim.cauzzi_faccioli_2008_swiss',
+    'CauzziFaccioli2008SWISS08':
+        'openquake.hazardlib.gsim.cauzzi_faccioli_2008_swiss',
+    'ChiouYoungs2008': 'openquake.hazardlib.gsim.chiou_youngs_2008',
+    'ChiouYoungs2008SWISS01':
+        'openquake.hazardlib.gsim.chiou_youngs_2008_swiss',
+    'ChiouYoungs2008SWISS04':
+        'openquake.hazardlib.gsim.chiou_youngs_2008_swiss',
+    'ChiouYoungs2008SWISS06':
+        'openquake.hazardlib.gsim.chiou_youngs_2008_swiss',
+    'ChiouYoungs2014': 'openquake.hazardlib.gsim.chiou_youngs_2014',
+    'ChiouYoungs2014NSHMPLower': 'openquake.hazardlib.gsim.nshmp_2014',
+    'ChiouYoungs2014NSHMPUpper': 'openquake.hazardlib.gsim.nshmp_2014',
+    'ChiouYoungs2014NearFaultEffect':
+        'openquake.hazardlib.gsim.chiou_youngs_2014',
+    'ChiouYoungs2014PEER': 'openquake.hazardlib.gsim.chiou_youngs_2014',
+    'ClimentEtAl1994': 'openquake.hazardlib.gsim.climent_1994',
+    'ConvertitoEtAl2012Geysers': 'openquake.hazardlib.gsim.convertito_2012',
+    'DostEtAl2004': 'openquake.hazardlib.gsim.dost_2004',
+    'DostEtAl2004BommerAdaptation': 'openquake.hazardlib.gsim.dost_2004',
+    'DouglasEtAl2013StochasticSD001Q1800K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q1800K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q1800K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q1800K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q200K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q200K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q200K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q200K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q600K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q600K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q600K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD001Q600K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q1800K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q1800K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q1800K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q1800K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q200K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q200K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q200K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q200K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q600K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q600K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q600K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD010Q600K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q1800K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q1800K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q1800K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q1800K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q200K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q200K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q200K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q200K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q600K005':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q600K020':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q600K040':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'DouglasEtAl2013StochasticSD100Q600K060':
+        'openquake.hazardlib.gsim.douglas_stochastic_2013',
+    'EdwardsFah2013Alpine10Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine120Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine20Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine30Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine50Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine60Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine75Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Alpine90Bars': 'openquake.hazardlib.gsim.edwards_fah_2013a',
+    'EdwardsFah2013Foreland10Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland120Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland20Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland30Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland50Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland60Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland75Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'EdwardsFah2013Foreland90Bars':
+        'openquake.hazardlib.gsim.edwards_fah_2013f',
+    'FaccioliEtAl2010': 'openquake.hazardlib.gsim.faccioli_2010',
+    'FrankelEtAl1996MblgAB1987NSHMP2008':
+        'openquake.hazardlib.gsim.frankel_1996',
+    'FrankelEtAl1996MblgJ1996NSHMP2008':
+        'openquake.hazardlib.gsim.frankel_1996',
+    'FrankelEtAl1996MwNSHMP2008': 'openquake.hazardlib.gsim.frankel_1996',
+    'FukushimaTanaka1990': 'openquake.hazardlib.gsim.fukushima_tanaka_1990',
+    'FukushimaTanakaSite1990':
+        'openquake.hazardlib.gsim.fukushima_tanaka_1990',
+    'GMPETable': 'openquake.hazardlib.gsim.gsim_table',
+    'GarciaEtAl2005SSlab': 'openquake.hazardlib.gsim.garcia_2005',
+    'GarciaEtAl2005SSlabVert': 'openquake.hazardlib.gsim.garcia_2005',
+    'Geomatrix1993SSlabNSHMP2008': 'openquake.hazardlib.gsim.geomatrix_1993',
+    'GhofraniAtkinson2014': 'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'GhofraniAtkinson2014Cascadia':
+        'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'GhofraniAtkinson2014CascadiaLower':
+        'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'GhofraniAtkinson2014CascadiaUpper':
+        'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'GhofraniAtkinson2014Lower':
+        'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'GhofraniAtkinson2014Upper':
+        'openquake.hazardlib.gsim.ghofrani_atkinson_2014',
+    'Idriss2014': 'openquake.hazardlib.gsim.idriss_2014',
+    'Idriss2014NSHMPLower': 'openquake.hazardlib.gsim.nshmp_2014',
+    'Idriss2014NSHMPUpper': 'openquake.hazardlib.gsim.nshmp_2014',
+    'Lin2009': 'openquake.hazardlib.gsim.lin_2009',
+    'Lin2009AdjustedSigma': 'openquake.hazardlib.gsim.lin_2009',
+    'LinLee2008SInter': 'openquake.hazardlib.gsim.lin_lee_2008',
+    'LinLee2008SSlab': 'openquake.hazardlib.gsim.lin_lee_2008',
+    'McVerry2006Asc': 'openquake.hazardlib.gsim.mcverry_2006',
+    'McVerry2006SInter': 'openquake.hazardlib.gsim.mcverry_2006',
+    'McVerry2006SSlab': 'openquake.hazardlib.gsim.mcverry_2006',
+    'McVerry2006Volc': 'openquake.hazardlib.gsim.mcverry_2006',
+    'MegawatiPan2010': 'openquake.hazardlib.gsim.megawati_pan_2010',
+    'PezeshkEtAl2011': 'openquake.hazardlib.gsim.pezeshk_2011',
+    'RietbrockEtAl2013MagDependent': 'openquake.hazardlib.gsim.rietbrock_2013',
+    'RietbrockEtAl2013SelfSimilar': 'openquake.hazardlib.gsim.rietbrock_2013',
+    'SadighEtAl1997': 'openquake.hazardlib.gsim.sadigh_1997',
+    'SiMidorikawa1999Asc': 'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SInter': 'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SInterNorthEastCorrection':
+        'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SInterSouthWestCorrection':
+        'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SSlab': 'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SSlabNorthEastCorrection':
+        'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SiMidorikawa1999SSlabSouthWestCorrection':
+        'openquake.hazardlib.gsim.si_midorikawa_1999',
+    'SilvaEtAl2002MblgAB1987NSHMP2008': 'openquake.hazardlib.gsim.silva_2002',
+    'SilvaEtAl2002MblgJ1996NSHMP2008': 'openquake.hazardlib.gsim.silva_2002',
+    'SilvaEtAl2002MwNSHMP2008': 'openquake.hazardlib.gsim.silva_2002',
+    'SomervilleEtAl2001NSHMP2008': 'openquake.hazardlib.gsim.somerville_2001',
+    'SomervilleEtAl2009NonCratonic':
+        'openquake.hazardlib.gsim.somerville_2009',
+    'SomervilleEtAl2009YilgarnCraton':
+        'openquake.hazardlib.gsim.somerville_2009',
+    'TavakoliPezeshk2005': 'openquake.hazardlib.gsim.tavakoli_pezeshk_2005',
+    'TavakoliPezeshk2005MblgAB1987NSHMP2008':
+        'openquake.hazardlib.gsim.tavakoli_pezeshk_2005',
+    'TavakoliPezeshk2005MblgJ1996NSHMP2008':
+        'openquake.hazardlib.gsim.tavakoli_pezeshk_2005',
+    'TavakoliPezeshk2005MwNSHMP2008':
+        'openquake.hazardlib.gsim.tavakoli_pezeshk_2005',
+    'ToroEtAl1997MblgNSHMP2008': 'openquake.hazardlib.gsim.toro_1997',
+    'ToroEtAl1997MwNSHMP2008': 'openquake.hazardlib.gsim.toro_1997',
+    'ToroEtAl2002': 'openquake.hazardlib.gsim.toro_2002',
+    'ToroEtAl2002SHARE': 'openquake.hazardlib.gsim.toro_2002',
+    'TusaLanger2015RepiBA08DE': 'openquake.hazardlib.gsim.tusa_langer_2015',
+    'TusaLanger2015RepiBA08SE': 'openquake.hazardlib.gsim.tusa_langer_2015',
+    'TusaLanger2015RepiSP87DE': 'openquake.hazardlib.gsim.tusa_langer_2015',
+    'TusaLanger2015RepiSP87SE': 'openquake.hazardlib.gsim.tusa_langer_2015',
+    'TusaLanger2015Rhypo': 'openquake.hazardlib.gsim.tusa_langer_2015',
+    'YoungsEtAl1997GSCSSlabBest': 'openquake.hazardlib.gsim.youngs_1997',
+    'YoungsEtAl1997GSCSSlabLowerLimit': 'openquake.hazardlib.gsim.youngs_1997',
+    'YoungsEtAl1997GSCSSlabUpperLimit': 'openquake.hazardlib.gsim.youngs_1997',
+    'YoungsEtAl1997SInter': 'openquake.hazardlib.gsim.youngs_1997',
+    'YoungsEtAl1997SInterNSHMP2008': 'openquake.hazardlib.gsim.youngs_1997',
+    'YoungsEtAl1997SSlab': 'openquake.hazardlib.gsim.youngs_1997',
+    'ZhaoEtAl2006Asc': 'openquake.hazardlib.gsim.zhao_2006',
+    'ZhaoEtAl2006AscSWISS03': 'openquake.hazardlib.gsim.zhao_2006_swiss',
+    'ZhaoEtAl2006AscSWISS05': 'openquake.hazardlib.gsim.zhao_2006_swiss',
+    'ZhaoEtAl2006AscSWISS08': 'openquake.hazardlib.gsim.zhao_2006_swiss',
+    'ZhaoEtAl2006SInter': 'openquake.hazardlib.gsim.zhao_2006',
+    'ZhaoEtAl2006SInterNSHMP2008': 'openquake.hazardlib.gsim.zhao_2006',
+    'ZhaoEtAl2006SSlab': 'openquake.hazardlib.gsim.zhao_2006',
+}
@@ -23,11 +23,11 @@ the corresponding amplification of the IMLs
 
 from __future__ import division
 
+import os
 from copy import deepcopy
 
 import h5py
 
-from scipy.interpolate import interp1d
 import numpy
 
 from openquake.hazardlib import const
@@ -50,6 +50,78 @@ def hdf_arrays_to_dict(hdfgroup):
     return {key: hdfgroup[key][:] for key in hdfgroup}
 
 
+def hdf_dataset_to_memmap(dataset):
+    """
+    Return a read-only memory map of an hdf5 data set, so that the data
+    are read from disk only when needed and the pages are shared between
+    processes. Data sets which cannot be mapped (chunked or compressed data
+    sets, files not using the default driver) are read in memory.
+
+    :param dataset:
+        Instance of :class: h5py.Dataset
+    :returns:
+        A :class:`numpy.memmap` or a :class:`numpy.ndarray`
+    """
+    offset = dataset.id.get_offset()
+    if (offset is None or dataset.chunks or not dataset.size or
+            dataset.file.driver != 'sec2'):
+        return dataset[()]
+    return numpy.memmap(dataset.file.filename, dtype=dataset.dtype,
+                        mode='r', offset=offset, shape=dataset.shape)
+
+
+def hdf_arrays_to_memmaps(hdfgroup):
+    """
+    Convert an hdf5 group containing only data sets into a dictionary of
+    memory mapped arrays (see :func:`hdf_dataset_to_memmap`)
+
+    :param hdfgroup:
+        Instance of :class: h5py.Group
+    :returns:
+        Dictionary containing each of the datasets within the group arranged
+        by name
+    """
+    return {key: hdf_dataset_to_memmap(hdfgroup[key]) for key in hdfgroup}
+
+
+def _interp_weights(x, xp, clip=False):
+    """
+    Find the indices of the nodes bracketing the values ``x`` in the
+    increasing array ``xp`` and the weights for linear interpolation,
+    with the same conventions of :class:`scipy.interpolate.interp1d`.
+
+    :param x: scalar or array of values
+    :param xp: increasing array of interpolation nodes
+    :param clip:
+        if True, values outside the range of ``xp`` are moved to the nearest
+        node, otherwise a ValueError is raised
+    :returns: a triple (lower indices, upper indices, weights)
+    """
+    x = numpy.asarray(x, dtype=float)
+    xp = numpy.asarray(xp, dtype=float)
+    if clip:
+        x = numpy.clip(x, xp[0], xp[-1])
+    elif (x < xp[0]).any() or (x > xp[-1]).any():
+        raise ValueError("A value in x_new is outside the interpolation "
+                         "range.")
+    high = numpy.clip(numpy.searchsorted(xp, x), 1, len(xp) - 1)
+    low = high - 1
+    return low, high, (x - xp[low]) / (xp[high] - xp[low])
+
+
+def _interp(x, xp, fp, axis=0, clip=False):
+    """
+    Vectorized linear interpolation of the array ``fp``, sampled at the
+    nodes ``xp`` along the given axis. It is equivalent to
+    ``interp1d(xp, fp, axis=axis)(x)`` without building the interpolator.
+    """
+    low, high, weights = _interp_weights(x, xp, clip)
+    fp = numpy.asarray(fp, dtype=float)
+    weights = weights.reshape(weights.shape + (1,) * (fp.ndim - axis - 1))
+    f_low = numpy.take(fp, low, axis=axis)
+    return f_low + (numpy.take(fp, high, axis=axis) - f_low) * weights
+
+
 class AmplificationTable(object):
     """
     Class to apply amplification from the GMPE tables.
@@ -148,6 +220,13 @@ class AmplificationTable(object):
                             [:, :, :, self.argidx[iloc]] =\
                             amp_model["/".join([stddev_type, imt])][:]
         self.shape = (n_d, n_p, n_m, n_levels)
+        # the mean amplification is always interpolated in log space
+        self.log_mean = {imt: numpy.log10(table)
+                         for imt, table in self.mean.items()}
+        if self.periods is not None:
+            self.log_periods = numpy.log10(self.periods)
+        else:
+            self.log_periods = None
 
     def get_set(self):
         """
@@ -179,28 +258,19 @@ class AmplificationTable(object):
             * sigma_amps - List of modification factors applied to the
                          standard deviations of ground motion
         """
-        dist_level_table = self.get_mean_table(imt, rctx)
+        # only the first distance row of the tables is used
+        log_mean_table = numpy.log10(self.get_mean_table(imt, rctx)[0])
         sigma_tables = self.get_sigma_tables(imt, rctx, stddev_types)
-        mean_interpolator = interp1d(self.values,
-                                     numpy.log10(dist_level_table),
-                                     axis=1)
-        sigma_interpolators = [interp1d(self.values, sigma_table, axis=1)
-                               for sigma_table in sigma_tables]
         if self.element == "Rupture":
-            mean_amp = 10.0 ** mean_interpolator(
-                getattr(rctx, self.parameter))[0] * numpy.ones_like(dists)
-            sigma_amps = []
-            for sig_interpolator in sigma_interpolators:
-                sigma_amps.append(sig_interpolator(
-                    getattr(rctx, self.parameter))[0] * numpy.ones_like(dists))
+            value = getattr(rctx, self.parameter)
         else:
-            mean_amp = 10.0 ** mean_interpolator(
-                getattr(sctx, self.parameter))[0, :]
-            sigma_amps = []
-            for sig_interpolator in sigma_interpolators:
-                sigma_amps.append(sig_interpolator(
-                    getattr(sctx, self.parameter))[0, :] *
-                    numpy.ones_like(dists))
+            value = getattr(sctx, self.parameter)
+        ones = numpy.ones_like(dists)
+        mean_amp = 10.0 ** _interp(value, self.values, log_mean_table)
+        if self.element == "Rupture":
+            mean_amp = mean_amp * ones
+        sigma_amps = [_interp(value, self.values, sigma_table[0]) * ones
+                      for sigma_table in sigma_tables]
         return mean_amp, sigma_amps
 
     def get_mean_table(self, imt, rctx):
@@ -214,21 +284,17 @@ class AmplificationTable(object):
         """
         # Levels by Distances
         if isinstance(imt, (imt_module.PGA, imt_module.PGV)):
-            interpolator = interp1d(self.magnitudes,
-                                    numpy.log10(self.mean[str(imt)]), axis=2)
             output_table = 10.0 ** (
-                interpolator(rctx.mag).reshape(self.shape[0], self.shape[3])
-                )
+                _interp(rctx.mag, self.magnitudes, self.log_mean[str(imt)],
+                        axis=2).reshape(self.shape[0], self.shape[3]))
         else:
             # For spectral accelerations - need two step process
             # Interpolate period - log-log space
-            interpolator = interp1d(numpy.log10(self.periods),
-                                    numpy.log10(self.mean["SA"]),
-                                    axis=1)
-            period_table = interpolator(numpy.log10(imt.period))
+            period_table = _interp(numpy.log10(imt.period), self.log_periods,
+                                   self.log_mean["SA"], axis=1)
             # Interpolate magnitude - linear-log space
-            mag_interpolator = interp1d(self.magnitudes, period_table, axis=1)
-            output_table = 10.0 ** mag_interpolator(rctx.mag)
+            output_table = 10.0 ** _interp(rctx.mag, self.magnitudes,
+                                           period_table, axis=1)
         return output_table
 
     def get_sigma_tables(self, imt, rctx, stddev_types):
@@ -245,27 +311,129 @@ class AmplificationTable(object):
         for stddev_type in stddev_types:
             # For PGA and PGV only needs to apply magnitude interpolation
             if isinstance(imt, (imt_module.PGA, imt_module.PGV)):
-                interpolator = interp1d(self.magnitudes,
-                                        self.sigma[stddev_type][str(imt)],
-                                        axis=2)
                 output_tables.append(
-                    interpolator(rctx.mag).reshape(self.shape[0],
-                                                   self.shape[3]))
+                    _interp(rctx.mag, self.magnitudes,
+                            self.sigma[stddev_type][str(imt)],
+                            axis=2).reshape(self.shape[0], self.shape[3]))
 
             else:
                 # For spectral accelerations - need two step process
                 # Interpolate period
-                interpolator = interp1d(numpy.log10(self.periods),
-                                        self.sigma[stddev_type]["SA"],
-                                        axis=1)
-                period_table = interpolator(numpy.log10(imt.period))
-                mag_interpolator = interp1d(self.magnitudes,
-                                            period_table,
-                                            axis=1)
-                output_tables.append(mag_interpolator(rctx.mag))
+                period_table = _interp(numpy.log10(imt.period),
+                                       self.log_periods,
+                                       self.sigma[stddev_type]["SA"], axis=1)
+                output_tables.append(
+                    _interp(rctx.mag, self.magnitudes, period_table, axis=1))
         return output_tables
 
 
+class GMPETableData(object):
+    """
+    Content of a GMPE table file. The instances are cached and shared by all
+    the :class:`GMPETable` instances reading the same file (see
+    :meth:`GMPETableData.get`). The IMLs and standard deviation tables are
+    memory mapped; the tables for a given IMT, interpolated in period and
+    converted into log space, are computed at first use and cached.
+
+    :param str fname:
+        Path to the hdf5 file containing the GMPE table
+    """
+    # cache path -> (modification time, instance)
+    _cache = {}
+
+    @classmethod
+    def get(cls, fname):
+        """
+        :param str fname: path to the hdf5 file containing the GMPE table
+        :returns:
+            the (cached) :class:`GMPETableData` instance for the file; if
+            the file has been modified, the stale instance is replaced
+        """
+        fname = os.path.abspath(fname)
+        mtime = os.path.getmtime(fname)
+        try:
+            cached_mtime, data = cls._cache[fname]
+        except KeyError:
+            cached_mtime = None
+        if cached_mtime != mtime:
+            data = cls(fname)
+            cls._cache[fname] = mtime, data
+        return data
+
+    def __init__(self, fname):
+        with h5py.File(fname, "r") as fle:
+            self.distance_type = fle["Distances"].attrs["metric"].decode(
+                'utf8')
+            # Load in magnitude
+            self.m_w = fle["Mw"][:]
+            # Load in distances
+            self.distances = fle["Distances"][:]
+            # Load intensity measure types and levels
+            self.imls = hdf_arrays_to_memmaps(fle["IMLs"])
+            if "SA" in self.imls and "T" not in self.imls:
+                raise ValueError("Spectral Acceleration must be accompanied "
+                                 "by periods")
+            # Load in total standard deviation and the other ones, if any
+            self.stddevs = {
+                const.StdDev.TOTAL: hdf_arrays_to_memmaps(fle["Total"])}
+            for stddev_type in [const.StdDev.INTER_EVENT,
+                                const.StdDev.INTRA_EVENT]:
+                if stddev_type in fle:
+                    self.stddevs[stddev_type] = hdf_arrays_to_memmaps(
+                        fle[stddev_type])
+            if "Amplification" in fle:
+                self.amplification = AmplificationTable(
+                    fle["Amplification"], self.m_w, self.distances)
+            else:
+                self.amplification = None
+        self.log_tables = {}  # (val_type, imt string) -> log10 table
+
+    def get_log_table(self, imt, val_type):
+        """
+        Returns the table of the logarithms (base 10) of the ground motions
+        or standard deviations for the given intensity measure type, as an
+        array of shape (number of distances, number of magnitudes). For
+        spectral accelerations the table is interpolated in log-log space
+        between the closest periods.
+
+        :param imt:
+            Intensity measure type as an instance of the :class:
+            openquake.hazardlib.imt
+        :param val_type:
+            String indicating the type of data {"IMLs", "Total", "Inter" etc}
+        """
+        key = (val_type, str(imt))
+        try:
+            return self.log_tables[key]
+        except KeyError:
+            pass
+        if val_type == "IMLs":
+            tables = self.imls
+        else:
+            tables = self.stddevs[val_type]
+        if isinstance(imt, (imt_module.PGA, imt_module.PGV)):
+            # Get scalar imt
+            log_table = numpy.log10(tables[str(imt)][:, 0, :]).astype(float)
+        else:
+            periods = tables["T"][:]
+            low_period = round(periods[0], 7)
+            high_period = round(periods[-1], 7)
+
+            if imt.period < low_period or imt.period > high_period:
+                raise ValueError("Spectral period %.3f outside of valid range "
+                                 "(%.3f to %.3f)" % (imt.period, periods[0],
+                                                     periods[-1]))
+            # Apply log-log interpolation for spectral period; only the two
+            # closest periods are read from the table
+            low, high, weight = _interp_weights(
+                numpy.log10(imt.period), numpy.log10(periods), clip=True)
+            log_low = numpy.log10(tables["SA"][:, low, :]).astype(float)
+            log_high = numpy.log10(tables["SA"][:, high, :]).astype(float)
+            log_table = log_low + (log_high - log_low) * weight
+        self.log_tables[key] = log_table
+        return log_table
+
+
 class GMPETable(GMPE):
     """
     Implements ground motion prediction equations in the form of a table from
@@ -287,6 +455,10 @@ class GMPETable(GMPE):
 
     iii) The IML values are then interpolated to the correct distance via
          linear-D|linear-IML interpolation
+
+    The tables are read once per file and shared by all the instances (see
+    :class:`GMPETableData`), so that instantiating the same GMPE table
+    many times, or unpickling it, is cheap.
     """
     DEFINED_FOR_TECTONIC_REGION_TYPE = ""
 
@@ -335,51 +507,37 @@ class GMPETable(GMPE):
         Executes the preprocessing steps at the instantiation stage to read in
         the tables from hdf5 and hold them in memory.
         """
-        fle = h5py.File(self.GMPE_TABLE, "r")
-        self.distance_type = fle["Distances"].attrs["metric"].decode('utf8')
+        self._data = data = GMPETableData.get(self.GMPE_TABLE)
+        self.distance_type = data.distance_type
         self.REQUIRES_DISTANCES.clear()
         self.REQUIRES_DISTANCES.add(self.distance_type)
-        # Load in magnitude
-        self.m_w = fle["Mw"][:]
-        # Load in distances
-        self.distances = fle["Distances"][:]
-        # Load intensity measure types and levels
-        self.imls = hdf_arrays_to_dict(fle["IMLs"])
+        self.m_w = data.m_w
+        self.distances = data.distances
+        self.imls = data.imls
         self._update_supported_imts()
-        if "SA" in self.imls.keys() and "T" not in self.imls:
-            raise ValueError("Spectral Acceleration must be accompanied by "
-                             "periods")
         # Get the standard deviations
-        self._setup_standard_deviations(fle)
-        if "Amplification" in fle:
-            self._setup_amplification(fle)
-        fle.close()
+        self._setup_standard_deviations(data)
+        if data.amplification:
+            self._setup_amplification(data)
 
-    def _setup_standard_deviations(self, fle):
+    def _setup_standard_deviations(self, data):
         """
-        Reads the standard deviation tables from hdf5 and stores them in
-        memory
-        :param fle:
-            HDF5 Tables as instance of :class: `h5py.File`
+        Stores the standard deviation tables and updates the supported
+        standard deviation types
+
+        :param data:
+            Instance of :class:`GMPETableData`
         """
-        # Load in total standard deviation
-        self.stddevs[const.StdDev.TOTAL] = hdf_arrays_to_dict(fle["Total"])
-        # If other standard deviations
-        for stddev_type in [const.StdDev.INTER_EVENT,
-                            const.StdDev.INTRA_EVENT]:
-            if stddev_type in fle:
-                self.stddevs[stddev_type] = hdf_arrays_to_dict(
-                    fle[stddev_type])
-                self.DEFINED_FOR_STANDARD_DEVIATION_TYPES.add(stddev_type)
+        for stddev_type in data.stddevs:
+            self.stddevs[stddev_type] = data.stddevs[stddev_type]
+            self.DEFINED_FOR_STANDARD_DEVIATION_TYPES.add(stddev_type)
 
-    def _setup_amplification(self, fle):
+    def _setup_amplification(self, data):
         """
-        If amplification data is specified then reads into memory and updates
+        If amplification data is specified then stores it and updates
         the required rupture and site parameters
         """
-        self.amplification = AmplificationTable(fle["Amplification"],
-                                                self.m_w,
-                                                self.distances)
+        self.amplification = data.amplification
         if self.amplification.element == "Sites":
             self.REQUIRES_SITES_PARAMETERS = set(())
             self.REQUIRES_SITES_PARAMETERS.add(self.amplification.parameter)
@@ -406,6 +564,21 @@ class GMPETable(GMPE):
                 imt_list.append(imt_val.__class__)
         self.DEFINED_FOR_INTENSITY_MEASURE_TYPES.update(imt_list)
 
+    def __getstate__(self):
+        # the tables are not pickled; they are read again (once per
+        # process) from the hdf5 file when unpickling
+        state = self.__dict__.copy()
+        for name in ('_data', 'imls', 'stddevs', 'm_w', 'distances',
+                     'amplification'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stddevs = {}
+        self.amplification = None
+        self._run_setup()
+
     def get_mean_and_stddevs(self, sctx, rctx, dctx, imt, stddev_types):
         """
         Returns the mean and standard deviations
@@ -443,21 +616,17 @@ class GMPETable(GMPE):
         :param distances:
             The distance vector for the given magnitude and IMT
         """
-        # For values outside of the interpolation range use -999. to ensure
-        # value is identifiable and outside of potential real values
-        interpolator_mean = interp1d(dists, data,
-                                     bounds_error=False,
-                                     fill_value=-999.)
-        mean = interpolator_mean(getattr(dctx, self.distance_type))
+        distances = getattr(dctx, self.distance_type)
+        # numpy.interp assigns the values at the extremes of the distance
+        # range to the distances outside of it; this covers the distances
+        # between the final distance and a margin of 0.001 km
+        mean = numpy.interp(distances, dists, data)
         # For those distances less than or equal to the shortest distance
         # extrapolate the shortest distance value
-        mean[getattr(dctx, self.distance_type) < (dists[0] + 1.0E-3)] = data[0]
+        mean[distances < (dists[0] + 1.0E-3)] = data[0]
         # For those distances significantly greater than the furthest distance
         # set to 1E-20.
-        mean[getattr(dctx, self.distance_type) > (dists[-1] + 1.0E-3)] = 1E-20
-        # If any distance is between the final distance and a margin of 0.001
-        # km then assign to smallest distance
-        mean[mean < -1.] = data[-1]
+        mean[distances > (dists[-1] + 1.0E-3)] = 1E-20
         return mean
 
     def _get_stddevs(self, dists, mag, dctx, imt, stddev_types):
@@ -480,12 +649,10 @@ class GMPETable(GMPE):
                 raise ValueError("Standard Deviation type %s not supported"
                                  % stddev_type)
             sigma = self._return_tables(mag, imt, stddev_type)
-            interpolator_std = interp1d(dists, sigma,
-                                        bounds_error=False)
-            stddev = interpolator_std(getattr(dctx, self.distance_type))
-            stddev[getattr(dctx, self.distance_type) < dists[0]] = sigma[0]
-            stddev[getattr(dctx, self.distance_type) > dists[-1]] = sigma[-1]
-            stddevs.append(stddev)
+            # the distances outside of the range get the values at the
+            # extremes of the range
+            stddevs.append(numpy.interp(getattr(dctx, self.distance_type),
+                                        dists, sigma))
         return stddevs
 
     def _return_tables(self, mag, imt, val_type):
@@ -496,35 +663,8 @@ class GMPETable(GMPE):
         :param val_type:
             String indicating the type of data {"IMLs", "Total", "Inter" etc}
         """
-        if isinstance(imt, (imt_module.PGA, imt_module.PGV)):
-            # Get scalar imt
-            if val_type == "IMLs":
-                iml_table = self.imls[str(imt)][:]
-            else:
-                iml_table = self.stddevs[val_type][str(imt)][:]
-            n_d, n_s, n_m = iml_table.shape
-            iml_table = iml_table.reshape([n_d, n_m])
-        else:
-            if val_type == "IMLs":
-                periods = self.imls["T"][:]
-                iml_table = self.imls["SA"][:]
-            else:
-                periods = self.stddevs[val_type]["T"][:]
-                iml_table = self.stddevs[val_type]["SA"][:]
-
-            low_period = round(periods[0], 7)
-            high_period = round(periods[-1], 7)
-
-            if imt.period < low_period or imt.period > high_period:
-                raise ValueError("Spectral period %.3f outside of valid range "
-                                 "(%.3f to %.3f)" % (imt.period, periods[0],
-                                                     periods[-1]))
-            # Apply log-log interpolation for spectral period
-            interpolator = interp1d(numpy.log10(periods),
-                                    numpy.log10(iml_table),
-                                    axis=1)
-            iml_table = 10. ** interpolator(numpy.log10(imt.period))
-        return self.apply_magnitude_interpolation(mag, iml_table)
+        log_table = self._data.get_log_table(imt, val_type)
+        return 10.0 ** self._interpolate_magnitude(mag, log_table)
 
     def apply_magnitude_interpolation(self, mag, iml_table):
         """
@@ -535,6 +675,19 @@ class GMPETable(GMPE):
         :param iml_table:
             Intensity measure level table
         """
+        return 10.0 ** self._interpolate_magnitude(mag,
+                                                   numpy.log10(iml_table))
+
+    def _interpolate_magnitude(self, mag, log_table):
+        """
+        Interpolates a table of logarithms to the required magnitude level
+
+        :param float mag:
+            Magnitude
+        :param log_table:
+            Table of the logarithms (base 10) of the intensity measure levels
+            or standard deviations, with shape (distances, magnitudes)
+        """
         # Get magnitude values
         if mag < self.m_w[0] or mag > self.m_w[-1]:
             raise ValueError("Magnitude %.2f outside of supported range "
@@ -543,5 +696,4 @@ class GMPETable(GMPE):
                                                  self.m_w[-1]))
         # It is assumed that log10 of the spectral acceleration scales
         # linearly (or approximately linearly) with magnitude
-        m_interpolator = interp1d(self.m_w, numpy.log10(iml_table), axis=1)
-        return 10.0 ** m_interpolator(mag)
+        return _interp(mag, self.m_w, log_table, axis=1)
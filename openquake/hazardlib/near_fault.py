@@ -478,3 +478,186 @@ def directp(node0, node1, node2, node3, hypocenter, reference, pp):
         go_next_patch = False
 
     return pd, e, go_next_patch
+
+
+def get_xyz_from_lonlat(lons, lats, depths, reference):
+    """
+    Vectorized version of :func:`get_xyz_from_ll`.
+
+    :param lons, lats, depths:
+        Arrays with the coordinates of the points to be projected
+    :param reference:
+        :class:`~openquake.hazardlib.geo.point.Point` object
+        representing the coordinates of the reference point.
+    :returns:
+        An array of shape (N, 3) with the x, y and z coordinates
+        of the points
+    """
+    lons = np.asarray(lons, float).flatten()
+    lats = np.asarray(lats, float).flatten()
+    azims = np.radians(geod.azimuth(reference.longitude, reference.latitude,
+                                    lons, lats))
+    dists = geod.geodetic_distance(reference.longitude, reference.latitude,
+                                   lons, lats)
+    xyz = np.empty((len(lons), 3))
+    xyz[:, 0] = dists * np.sin(azims)
+    xyz[:, 1] = dists * np.cos(azims)
+    xyz[:, 2] = reference.depth - np.asarray(depths, float).flatten()
+    return xyz
+
+
+def projection_pps(sites, normal, dist_to_plane):
+    """
+    Vectorized version of :func:`projection_pp`.
+
+    :param sites:
+        An array of shape (N, 3) with the coordinates of the sites,
+        see :func:`get_xyz_from_lonlat`
+    :param normal:
+        Normal to the plane including the fault patch,
+        describe by a normal vector[a, b, c]
+    :param dist_to_plane:
+        D in the plane equation,  ax + by + cz = d
+    :returns:
+        An array of shape (N, 3) with the projections of the sites
+        on the plane
+    """
+    normal = np.asarray(normal, float)
+    t = (dist_to_plane - np.dot(sites, normal)) / np.dot(normal, normal)
+    return sites + t[:, None] * normal
+
+
+def _normalize(vectors):
+    # unit vectors along the last axis
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return vectors / np.sqrt((vectors ** 2).sum(axis=-1))[..., None]
+
+
+def _intersections(seg_start, seg_end, starts, ends):
+    """
+    Vectorized version of :func:`_intersection`, returning only the
+    intersection points between the segment (``seg_start``, ``seg_end``)
+    and the segments (``starts``, ``ends``); the points are NaN if the
+    segments are parallel.
+    """
+    lines = np.concatenate([
+        np.broadcast_to(_normalize(seg_end - seg_start), starts.shape)[None],
+        _normalize(ends - starts)[None]])
+    origins = np.concatenate([
+        np.broadcast_to(seg_start, starts.shape)[None], starts[None]])
+    # for each line, the matrix n n^T - I
+    mats = lines[..., :, None] * lines[..., None, :] - np.eye(3)
+    s = mats.sum(axis=0)
+    c = (mats * origins[..., None, :]).sum(axis=-1).sum(axis=0)
+    singular = ~(np.abs(np.linalg.det(s)) > 1E-12)
+    s[singular] = np.eye(3)
+    c[singular] = np.nan
+    return np.linalg.solve(s, c[..., None])[..., 0]
+
+
+def directps(nodes, hypocenters, pps):
+    """
+    Vectorized version of :func:`directp`, giving the same direct points.
+    Instead of increasing the tolerance in a loop until a solution is found,
+    the tolerance needed by each candidate direct point is computed
+    directly and the candidate needing the lowest tolerance is chosen.
+
+    :param nodes:
+        An array of shape (4, 3) with the coordinates of the vertices of the
+        fault patch, see :func:`get_xyz_from_lonlat`
+    :param hypocenters:
+        An array of shape (N, 3) with the coordinates of the hypocentres
+    :param pps:
+        An array of shape (N, 3) with the projections of the sites onto the
+        plane containing the fault patch, see :func:`projection_pps`
+    :returns:
+        The direct points (an array of shape (N, 3)), the E-path lengths and
+        the flags indicating if the calculation goes on the next fault patch
+    """
+    nodes = np.asarray(nodes, float)
+    lower = nodes[:, :2].min(axis=0)
+    upper = nodes[:, :2].max(axis=0)
+    ppph = np.sqrt(((pps - hypocenters) ** 2).sum(axis=1))
+    vector2 = _normalize(pps - hypocenters)
+    candidates = []
+    dists = []
+    # tolerance needed by each candidate, inf if it is not a solution
+    tols = []
+    for seg_s, seg_e in zip(nodes, np.roll(nodes, -1, axis=0)):
+        p_intersect = _intersections(seg_s, seg_e, pps, hypocenters)
+        pdph = np.sqrt(((p_intersect - hypocenters) ** 2).sum(axis=1))
+        vector1 = _normalize(p_intersect - hypocenters)
+        vector3 = _normalize(seg_e - seg_s)
+        vector4 = _normalize(p_intersect - seg_s)
+        tol = np.max([
+            np.abs(vector1 - vector2).max(axis=1),
+            np.abs(vector3 - vector4).max(axis=1),
+            (lower - p_intersect[:, :2]).max(axis=1),
+            (p_intersect[:, :2] - upper).max(axis=1)], axis=0)
+        with np.errstate(invalid='ignore'):
+            tol[~(ppph >= pdph) | np.isnan(tol)] = np.inf
+        candidates.append(p_intersect)
+        dists.append(pdph)
+        tols.append(tol)
+    # when the pp is located within the fault patch, pd = pp
+    candidates.append(pps)
+    dists.append(ppph)
+    tols.append(np.maximum((lower - pps[:, :2]).max(axis=1),
+                           (pps[:, :2] - upper).max(axis=1)))
+    # the tolerance starts from 0.0001 and grows by 0.0001 at each loop;
+    # at the same tolerance, the segments are checked before the pp
+    loops = np.maximum(np.ceil(np.array(tols) / 0.0001), 1)
+    idx = loops.argmin(axis=0)
+    rows = np.arange(len(pps))
+    pd = np.array(candidates)[idx, rows]
+    e = np.array(dists)[idx, rows]
+    return pd, e, idx == 1
+
+
+def average_s_rads(sites, hypocenters, pps, normal, dist_to_plane, e,
+                   p0, p1, delta_slip):
+    """
+    Vectorized version of :func:`average_s_rad`.
+
+    :param sites, hypocenters, pps:
+        Arrays of shape (N, 3) with the coordinates of the sites,
+        hypocentres and projection points, see :func:`get_xyz_from_lonlat`
+    :param normal:
+        normal of the plane, describe by a normal vector[a, b, c]
+    :param dist_to_plane:
+        d is the constant term in the plane equation, e.g., ax + by + cz = d
+    :param e:
+        An array with the E-path lengths, in km
+    :param p0, p1:
+        The coordinates of the starting and ending points of the fault
+        segment
+    :param delta_slip:
+        slip direction away from the strike direction, in decimal degrees.
+    :return:
+        Three arrays with fs, rd and r_hyp, see :func:`average_s_rad`
+    """
+    zs = np.sqrt(((pps - sites) ** 2).sum(axis=1))
+    zs[np.dot(sites, normal) - dist_to_plane > 0] *= -1
+    l2 = np.sqrt(((pps - hypocenters) ** 2).sum(axis=1))
+    rd = ((l2 - e) ** 2 + zs ** 2) ** 0.5
+    r_hyp = (l2 ** 2 + zs ** 2) ** 0.5
+    u = np.asarray(p1, float) - np.asarray(p0, float)
+    v = pps - hypocenters
+    phi = np.arctan2(np.sqrt((np.cross(u, v) ** 2).sum(axis=1)),
+                     np.dot(v, u)) - np.deg2rad(delta_slip)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ix = np.cos(phi) * (2 * zs * (l2 / r_hyp - (l2 - e) / rd) -
+                            zs * np.log((l2 + r_hyp) / (l2 - e + rd)))
+        inn = np.cos(phi) * (-2 * zs ** 2 * (1 / r_hyp - 1 / rd)
+                             - (r_hyp - rd))
+        iphi = np.sin(phi) * (zs * np.log((l2 + r_hyp) / (l2 - e + rd)))
+        fs = (ix ** 2 + inn ** 2 + iphi ** 2) ** 0.5 / e
+    return fs, rd, r_hyp
+
+
+def isochone_ratios(e, rd, r_hyp):
+    """
+    Vectorized version of :func:`isochone_ratio`.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(e == 0., 0.8, 1. / ((1. / 0.8) - ((r_hyp - rd) / e)))
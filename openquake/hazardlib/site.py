@@ -19,7 +19,7 @@ Module :mod:`openquake.hazardlib.site` defines :class:`Site`.
 import numpy
 
 from openquake.baselib.python3compat import range
-from openquake.hazardlib.geo.mesh import Mesh
+from openquake.hazardlib.geo.mesh import SiteMesh
 from openquake.baselib.slots import with_slots
 
 
@@ -195,8 +195,21 @@ class SiteCollection(object):
 
     @property
     def mesh(self):
-        """Return a mesh with the given lons and lats"""
-        return Mesh(self.lons, self.lats, depths=None)
+        """
+        Return a :class:`~openquake.hazardlib.geo.mesh.SiteMesh` with the
+        given lons and lats; it is built once and then reused, so that
+        its Cartesian coordinates are computed only once
+        """
+        mesh = self.__dict__.get('_mesh')
+        if mesh is None:
+            mesh = self._mesh = SiteMesh(self.lons, self.lats)
+        return mesh
+
+    def __getstate__(self):
+        # the cached mesh is not pickled
+        state = self.__dict__.copy()
+        state.pop('_mesh', None)
+        return state
 
     @property
     def indices(self):
@@ -318,8 +331,11 @@ class FilteredSiteCollection(object):
 
     @property
     def mesh(self):
-        """Return a mesh with the given lons and lats"""
-        return Mesh(self.lons, self.lats, depths=None)
+        """
+        Return a :class:`~openquake.hazardlib.geo.mesh.SiteMesh` with the
+        given lons and lats, reusing the coordinates of the complete mesh
+        """
+        return self.complete.mesh.take(self.indices)
 
     def filter(self, mask):
         """
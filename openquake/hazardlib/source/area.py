@@ -17,7 +17,9 @@
 Module :mod:`openquake.hazardlib.source.area` defines :class:`AreaSource`.
 """
 from copy import deepcopy
+import numpy
 from openquake.hazardlib.geo import Point
+from openquake.hazardlib.source.base import get_occurrence_table
 from openquake.hazardlib.source.point import PointSource
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 from openquake.baselib.slots import with_slots
@@ -133,6 +135,61 @@ class AreaSource(PointSource):
                 )
                 yield rupture
 
+    def sample_ruptures(self, rng=None):
+        """
+        See :meth:
+        `openquake.hazardlib.source.base.BaseSeismicSource.sample_ruptures`.
+
+        The occurrences of all the ruptures are sampled with a single call
+        to the temporal occurrence model.
+        """
+        num_points = len(self.polygon.discretize(self.area_discretization))
+        rates = numpy.tile(self._get_occurrence_rates(1.0 / num_points),
+                           num_points)
+        return get_occurrence_table(
+            self.temporal_occurrence_model.sample_number_of_occurrences(
+                rates, rng))
+
+    def get_ruptures(self, indices):
+        """
+        Build only the ruptures with the given indices.
+
+        The reference ruptures at the first point of the polygon mesh are
+        built only when needed, and translated like in
+        :meth:`iter_ruptures`.
+
+        :param indices:
+            Increasing indices of ruptures in the order of
+            :meth:`iter_ruptures`, for instance the field ``rup_idx`` of
+            the table returned by :meth:`sample_ruptures`.
+        :returns:
+            A list of ruptures, one per index.
+        """
+        polygon_mesh = self.polygon.discretize(self.area_discretization)
+        rate_scaling_factor = 1.0 / len(polygon_mesh)
+        [epicenter0] = polygon_mesh[0:1]
+        num_ref = (len(self.get_annual_occurrence_rates()) *
+                   len(self.nodal_plane_distribution.data) *
+                   len(self.hypocenter_distribution.data))
+        ref_ruptures = {}
+        ruptures = []
+        for index in indices:
+            point_idx, ref_idx = divmod(int(index), num_ref)
+            if ref_idx not in ref_ruptures:
+                ref_ruptures[ref_idx] = self._make_rupture(
+                    epicenter0, rate_scaling_factor,
+                    *self._get_rupture_params(ref_idx))
+            ref = ref_ruptures[ref_idx]
+            epicenter = Point(polygon_mesh.lons[point_idx],
+                              polygon_mesh.lats[point_idx])
+            hypocenter = deepcopy(epicenter)
+            hypocenter.depth = ref.hypocenter.depth
+            ruptures.append(ParametricProbabilisticRupture(
+                ref.mag, ref.rake, self.tectonic_region_type, hypocenter,
+                ref.surface.translate(epicenter0, epicenter), type(self),
+                ref.occurrence_rate, self.temporal_occurrence_model))
+        return ruptures
+
     def count_ruptures(self):
         """
         See
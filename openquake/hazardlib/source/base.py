@@ -18,9 +18,31 @@ Module :mod:`openquake.hazardlib.source.base` defines a base class for
 seismic sources.
 """
 import abc
+import numpy
 from openquake.baselib.slots import with_slots
 from openquake.baselib.python3compat import with_metaclass
 
+#: dtype of the tables returned by
+#: :meth:`BaseSeismicSource.sample_ruptures`
+rupture_occ_dt = numpy.dtype([('rup_idx', numpy.uint32),
+                              ('n_occ', numpy.uint32)])
+
+
+def get_occurrence_table(num_occurrences):
+    """
+    :param num_occurrences:
+        a sequence with the number of occurrences of each rupture
+    :returns:
+        an array of dtype :data:`rupture_occ_dt` with the indices and the
+        occurrences of the ruptures occurring at least once
+    """
+    num_occurrences = numpy.asarray(num_occurrences)
+    [indices] = numpy.nonzero(num_occurrences)
+    table = numpy.zeros(len(indices), rupture_occ_dt)
+    table['rup_idx'] = indices
+    table['n_occ'] = num_occurrences[indices]
+    return table
+
 
 @with_slots
 class BaseSeismicSource(with_metaclass(abc.ABCMeta)):
@@ -66,6 +88,27 @@ class BaseSeismicSource(with_metaclass(abc.ABCMeta)):
         Return the number of ruptures that will be generated by the source.
         """
 
+    def sample_ruptures(self, rng=None):
+        """
+        Sample the number of occurrences of all the ruptures of the source.
+
+        This implementation calls the method ``sample_number_of_occurrences``
+        of each rupture; subclasses able to compute the occurrence rates
+        without building the ruptures override it with a vectorized
+        version drawing the same random numbers.
+
+        :param rng:
+            A :class:`numpy.random.RandomState` instance, or ``None``
+            to use the global numpy generator.
+        :returns:
+            An array of dtype :data:`rupture_occ_dt` with the indices (in
+            the order of :meth:`iter_ruptures`) and the number of
+            occurrences of the ruptures occurring at least once.
+        """
+        return get_occurrence_table(
+            [rupture.sample_number_of_occurrences(rng)
+             for rupture in self.iter_ruptures()])
+
     @abc.abstractmethod
     def get_min_max_mag(self):
         """
@@ -168,12 +211,37 @@ class ParametricSeismicSource(with_metaclass(abc.ABCMeta, BaseSeismicSource)):
     :raises ValueError:
         If either rupture aspect ratio or rupture mesh spacing is not positive
         (if not None).
+
+    Subclasses can cache the quantities derived from their geometry (like
+    the mesh of the whole fault) in slots with a name starting with an
+    underscore: those slots are reset to None by :meth:`reset_geometry`,
+    which is called automatically when one of the attributes listed in
+    :attr:`GEOMETRY_ATTRS` is set.
     """
 
     __slots__ = BaseSeismicSource.__slots__ + '''mfd rupture_mesh_spacing
     magnitude_scaling_relationship rupture_aspect_ratio
     temporal_occurrence_model'''.split()
 
+    #: names of the attributes defining the geometry of the source
+    GEOMETRY_ATTRS = ()
+
+    def __setattr__(self, name, value):
+        super(ParametricSeismicSource, self).__setattr__(name, value)
+        if name in self.GEOMETRY_ATTRS:
+            self.reset_geometry()
+
+    def reset_geometry(self):
+        """
+        Clear the cached geometry of the source. It is called automatically
+        when an attribute in :attr:`GEOMETRY_ATTRS` is set, but it must be
+        called explicitly after modifying one of them in place (for instance
+        after moving the points of a fault trace).
+        """
+        for slot in self.__slots__:
+            if slot.startswith('_'):
+                setattr(self, slot, None)
+
     def __init__(self, source_id, name, tectonic_region_type, mfd,
                  rupture_mesh_spacing, magnitude_scaling_relationship,
                  rupture_aspect_ratio, temporal_occurrence_model):
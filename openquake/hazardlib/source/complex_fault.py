@@ -48,7 +48,10 @@ class ComplexFaultSource(ParametricSeismicSource):
         fails or if rake value is invalid.
     """
 
-    __slots__ = ParametricSeismicSource.__slots__ + '''edges rake'''.split()
+    __slots__ = ParametricSeismicSource.__slots__ + '''edges rake
+    _whole_fault_mesh _cell_dimensions _surface_projection'''.split()
+
+    GEOMETRY_ATTRS = ('edges', 'rupture_mesh_spacing')
 
     def __init__(self, source_id, name, tectonic_region_type, mfd,
                  rupture_mesh_spacing, magnitude_scaling_relationship,
@@ -77,14 +80,39 @@ class ComplexFaultSource(ParametricSeismicSource):
         <openquake.hazardlib.source.base.BaseSeismicSource.get_rupture_enclosing_polygon>`
         for parameter and return value definition.
         """
-        polygon = ComplexFaultSurface.surface_projection_from_fault_data(
-            self.edges
-        )
+        if self._surface_projection is None:
+            self._surface_projection = (
+                ComplexFaultSurface.surface_projection_from_fault_data(
+                    self.edges))
+        polygon = self._surface_projection
         if dilation:
             return polygon.dilate(dilation)
         else:
             return polygon
 
+    def _get_whole_fault_mesh(self):
+        """
+        :returns:
+            The mesh of the whole fault surface; it is computed only once
+            and must not be modified.
+        """
+        if self._whole_fault_mesh is None:
+            self._whole_fault_mesh = ComplexFaultSurface.from_fault_data(
+                self.edges, self.rupture_mesh_spacing).get_mesh()
+        return self._whole_fault_mesh
+
+    def _get_cell_dimensions(self):
+        """
+        :returns:
+            The cell dimensions of the mesh of the whole fault surface, see
+            :meth:`~openquake.hazardlib.geo.mesh.RectangularMesh.get_cell_dimensions`;
+            they are computed only once and must not be modified.
+        """
+        if self._cell_dimensions is None:
+            self._cell_dimensions = (
+                self._get_whole_fault_mesh().get_cell_dimensions())
+        return self._cell_dimensions
+
     def iter_ruptures(self):
         """
         See :meth:
@@ -93,12 +121,9 @@ class ComplexFaultSource(ParametricSeismicSource):
         Uses :func:`_float_ruptures` for finding possible rupture locations
         on the whole fault surface.
         """
-        whole_fault_surface = ComplexFaultSurface.from_fault_data(
-            self.edges, self.rupture_mesh_spacing
-        )
-        whole_fault_mesh = whole_fault_surface.get_mesh()
+        whole_fault_mesh = self._get_whole_fault_mesh()
         cell_center, cell_length, cell_width, cell_area = (
-            whole_fault_mesh.get_cell_dimensions()
+            self._get_cell_dimensions()
         )
 
         for (mag, mag_occ_rate) in self.get_annual_occurrence_rates():
@@ -128,17 +153,65 @@ class ComplexFaultSource(ParametricSeismicSource):
                     occurrence_rate, self.temporal_occurrence_model
                 )
 
+    def get_rupture_distances(self, mesh):
+        """
+        Compute the rupture and Joyner-Boore distances between the points
+        of ``mesh`` and the surfaces of all the ruptures generated by
+        :meth:`iter_ruptures`, without building the surfaces.
+
+        The distances from the nodes of the whole fault mesh are computed
+        only once and the distances of each rupture are obtained as minima
+        over windows of nodes, see
+        :meth:`~openquake.hazardlib.geo.mesh.RectangularMesh.get_floating_distances`.
+
+        :param mesh:
+            :class:`~openquake.hazardlib.geo.mesh.Mesh` of the points (sites)
+            to calculate distances to.
+        :returns:
+            Two arrays of shape (num_ruptures, N), where N is the number
+            of points of ``mesh``, with the rupture and the Joyner-Boore
+            distances respectively; the rows are in the same order of the
+            ruptures generated by :meth:`iter_ruptures`.
+        """
+        whole_fault_mesh = self._get_whole_fault_mesh()
+        cell_center, cell_length, cell_width, cell_area = (
+            self._get_cell_dimensions()
+        )
+        mesh_rows, mesh_cols = whole_fault_mesh.shape
+        windows = []  # first row, first column and shape of each rupture
+        for (mag, mag_occ_rate) in self.get_annual_occurrence_rates():
+            rupture_area = self.magnitude_scaling_relationship.get_median_area(
+                mag, self.rake
+            )
+            rupture_length = numpy.sqrt(rupture_area
+                                        * self.rupture_aspect_ratio)
+            for rupture_slice in _float_ruptures(
+                    rupture_area, rupture_length, cell_area, cell_length):
+                if rupture_slice == slice(None):
+                    windows.append((0, 0, mesh_rows, mesh_cols))
+                else:
+                    rows, cols = rupture_slice
+                    windows.append((rows.start, cols.start,
+                                    rows.stop - rows.start,
+                                    cols.stop - cols.start))
+        shapes = sorted(set(window[2:] for window in windows))
+        results = dict(zip(shapes, whole_fault_mesh.get_floating_distances(
+            mesh, shapes)))
+        rrup = numpy.empty((len(windows), mesh.lons.size))
+        rjb = numpy.empty((len(windows), mesh.lons.size))
+        for i, (row, col, rows, cols) in enumerate(windows):
+            dists = results[rows, cols]
+            rrup[i] = dists[0][row, col]
+            rjb[i] = dists[1][row, col]
+        return rrup, rjb
+
     def count_ruptures(self):
         """
         See :meth:
         `openquake.hazardlib.source.base.BaseSeismicSource.count_ruptures`.
         """
-        whole_fault_surface = ComplexFaultSurface.from_fault_data(
-            self.edges, self.rupture_mesh_spacing
-        )
-        whole_fault_mesh = whole_fault_surface.get_mesh()
         cell_center, cell_length, cell_width, cell_area = (
-            whole_fault_mesh.get_cell_dimensions()
+            self._get_cell_dimensions()
         )
         counts = 0
         for (mag, mag_occ_rate) in self.get_annual_occurrence_rates():
@@ -172,6 +245,11 @@ def _float_ruptures(rupture_area, rupture_length, cell_area, cell_length):
         of possible locations of the requested rupture on the fault surface.
         Each slice can be used to get a portion of the whole fault surface mesh
         that would represent the location of the rupture.
+
+    The ruptures starting in the cells of a row are found at once: the
+    lengths and the areas of all the candidate ruptures are obtained from
+    the cumulative sums of the cell lengths along the rows and from the
+    summed-area table of the cell areas.
     """
     nrows, ncols = cell_length.shape
 
@@ -180,70 +258,102 @@ def _float_ruptures(rupture_area, rupture_length, cell_area, cell_length):
         # return the single slice that doesn't cut anything out.
         return [slice(None)]
 
-    rupture_slices = []
+    # lengths[row, col] is the length of the first ``col`` cells of the row
+    lengths = numpy.zeros((nrows, ncols + 1))
+    numpy.cumsum(cell_length, axis=1, out=lengths[:, 1:])
+    # areas[row, col] is the area of the cells above ``row``, left of ``col``
+    areas = numpy.zeros((nrows + 1, ncols + 1))
+    areas[1:, 1:] = numpy.cumsum(numpy.cumsum(cell_area, axis=0), axis=1)
 
-    dead_ends = set()
+    cols = numpy.arange(ncols)
+    rupture_slices = []
+    dead_ends = numpy.zeros(ncols, bool)
     for row in range(nrows):
-        for col in range(ncols):
-            if col in dead_ends:
-                continue
-            # find the lengths of all possible subsurfaces containing
-            # only the current row and from the current column till
-            # the last one.
-            lengths_acc = numpy.add.accumulate(cell_length[row, col:])
-            # find the "best match" number of columns, the one that gives
-            # the least difference between actual and requested rupture
-            # length (note that we only consider top row here, mainly
-            # for simplicity: it's not yet clear how many rows will we
-            # end up with).
-            rup_cols = numpy.argmin(numpy.abs(lengths_acc - rupture_length))
-            last_col = rup_cols + col + 1
-            if last_col == ncols and lengths_acc[rup_cols] < rupture_length:
-                # rupture doesn't fit along length (the requested rupture
-                # length is greater than the length of the part of current
-                # row that starts from the current column).
-                if col != 0:
-                    # if we are not in the first column, it means that we
-                    # hit the right border, so we need to go to the next
-                    # row.
-                    break
-
-            # now try to find the optimum (the one providing the closest
-            # to requested area) number of rows.
-            areas_acc = numpy.sum(cell_area[row:, col:last_col], axis=1)
-            areas_acc = numpy.add.accumulate(areas_acc, axis=0)
-            rup_rows = numpy.argmin(numpy.abs(areas_acc - rupture_area))
-            last_row = rup_rows + row + 1
-            if last_row == nrows and areas_acc[rup_rows] < rupture_area:
-                # rupture doesn't fit along width.
-                # we can try to extend it along length but only if we are
-                # at the first row
-                if row == 0:
-                    if last_col == ncols:
-                        # there is no place to extend, exiting
-                        return rupture_slices
-                    else:
-                        # try to extend along length
-                        areas_acc = numpy.sum(cell_area[:, col:], axis=0)
-                        areas_acc = numpy.add.accumulate(areas_acc, axis=0)
-                        rup_cols = numpy.argmin(numpy.abs(areas_acc
-                                                          - rupture_area))
-                        last_col = rup_cols + col + 1
-                        if last_col == ncols \
-                                and areas_acc[rup_cols] < rupture_area:
-                            # still doesn't fit, return
-                            return rupture_slices
-                else:
-                    # row is not the first and the required area exceeds
-                    # available area starting from target row and column.
-                    # mark the column as "dead end" so we don't create
-                    # one more rupture from the same column on all
-                    # subsequent rows.
-                    dead_ends.add(col)
-
-            # here we add 1 to last row and column numbers because we want
-            # to return slices for cutting the mesh of vertices, not the cell
-            # data (like cell_area or cell_length).
-            rupture_slices.append((slice(row, last_row + 1),
-                                   slice(col, last_col + 1)))
+        # find the lengths of all possible subsurfaces containing only
+        # the current row and from each column till the last one and the
+        # "best match" number of columns, the one that gives the least
+        # difference between actual and requested rupture length (note
+        # that we only consider top row here, mainly for simplicity: it's
+        # not yet clear how many rows will we end up with).
+        last_col, lengths_acc = _get_best_ends(lengths[row], cols,
+                                               rupture_length)
+        # ruptures that don't fit along length: if we are not in the first
+        # column, it means that we hit the right border, so we need to go
+        # to the next row
+        [border] = ((last_col == ncols) & (cols != 0) & ~dead_ends &
+                    (lengths_acc < rupture_length)).nonzero()
+        first_cols = cols[:border[0] if len(border) else ncols]
+        first_cols = first_cols[~dead_ends[first_cols]]
+        last_col = last_col[first_cols]
+
+        # now try to find the optimum (the one providing the closest
+        # to requested area) number of rows.
+        bottoms = areas[row + 1:]
+        areas_acc = (bottoms[:, last_col] - bottoms[:, first_cols]
+                     - areas[row, last_col] + areas[row, first_cols]).T
+        rup_rows = numpy.argmin(numpy.abs(areas_acc - rupture_area), axis=1)
+        last_row = rup_rows + row + 1
+        # ruptures that don't fit along width
+        narrow = ((last_row == nrows) & (
+            areas_acc[numpy.arange(len(first_cols)), rup_rows] <
+            rupture_area))
+        if row == 0 and narrow.any():
+            # we can try to extend them along length, since we are at the
+            # first row; we stop at the first rupture which can't be extended
+            [idx] = narrow.nonzero()
+            new_last_col, areas_acc = _get_best_ends(
+                areas[-1], first_cols[idx], rupture_area)
+            [failed] = ((last_col[idx] == ncols) | (
+                (new_last_col == ncols) & (areas_acc < rupture_area))
+            ).nonzero()
+            last_col[idx] = new_last_col
+            if len(failed):
+                stop = idx[failed[0]]
+                rupture_slices.extend(_get_slices(
+                    row, last_row[:stop], first_cols[:stop], last_col[:stop]))
+                return rupture_slices
+        elif row != 0:
+            # the required area exceeds available area starting from target
+            # row and column. mark the columns as "dead ends" so we don't
+            # create one more rupture from the same column on all
+            # subsequent rows.
+            dead_ends[first_cols[narrow]] = True
+        rupture_slices.extend(_get_slices(row, last_row, first_cols, last_col))
     return rupture_slices
+
+
+def _get_best_ends(sums, starts, target):
+    """
+    :param sums:
+        A non-decreasing array of cumulative sums, starting from zero
+    :param starts:
+        An array of indices of ``sums``
+    :returns:
+        Two arrays with, for each start, the index ``end`` greater than the
+        start which gives the least difference between ``sums[end] -
+        sums[start]`` and ``target`` (the first one, in case of ties) and
+        the corresponding differences of sums
+    """
+    ends = numpy.searchsorted(sums, sums[starts] + target)
+    # because of the rounding errors the best end could be close to the one
+    # found by the binary search, but not the same
+    candidates = numpy.clip(ends.reshape(-1, 1) + numpy.arange(-2, 2),
+                            starts.reshape(-1, 1) + 1, len(sums) - 1)
+    accs = sums[candidates] - sums[starts].reshape(-1, 1)
+    best = numpy.argmin(numpy.abs(accs - target), axis=1)
+    idx = numpy.arange(len(starts))
+    return candidates[idx, best], accs[idx, best]
+
+
+def _get_slices(row, last_rows, first_cols, last_cols):
+    """
+    :returns:
+        The list of slices of the ruptures starting from the given row and
+        columns and ending in the given cells.
+    """
+    # here we add 1 to last row and column numbers because we want
+    # to return slices for cutting the mesh of vertices, not the cell
+    # data (like cell_area or cell_length).
+    return [(slice(row, last_row + 1), slice(col, last_col + 1))
+            for last_row, col, last_col in zip(
+                last_rows.tolist(), first_cols.tolist(), last_cols.tolist())]
@@ -18,9 +18,12 @@ Module :mod:`openquake.hazardlib.source.point` defines :class:`PointSource`.
 """
 import math
 
+import numpy
+
 from openquake.hazardlib.geo import Point
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
-from openquake.hazardlib.source.base import ParametricSeismicSource
+from openquake.hazardlib.source.base import (
+    ParametricSeismicSource, get_occurrence_table)
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 from openquake.baselib.slots import with_slots
 
@@ -177,18 +180,81 @@ class PointSource(ParametricSeismicSource):
         for (mag, mag_occ_rate) in self.get_annual_occurrence_rates():
             for (np_prob, np) in self.nodal_plane_distribution.data:
                 for (hc_prob, hc_depth) in self.hypocenter_distribution.data:
-                    hypocenter = Point(latitude=location.latitude,
-                                       longitude=location.longitude,
-                                       depth=hc_depth)
-                    occurrence_rate = (mag_occ_rate
-                                       * float(np_prob) * float(hc_prob))
-                    occurrence_rate *= rate_scaling_factor
-                    surface = self._get_rupture_surface(mag, np, hypocenter)
-                    yield ParametricProbabilisticRupture(
-                        mag, np.rake, self.tectonic_region_type, hypocenter,
-                        surface, type(self),
-                        occurrence_rate, self.temporal_occurrence_model
-                    )
+                    yield self._make_rupture(
+                        location, rate_scaling_factor, mag, mag_occ_rate,
+                        np_prob, np, hc_prob, hc_depth)
+
+    def _make_rupture(self, location, rate_scaling_factor, mag, mag_occ_rate,
+                      np_prob, np, hc_prob, hc_depth):
+        # build a single rupture of :meth:`_iter_ruptures_at_location`
+        hypocenter = Point(latitude=location.latitude,
+                           longitude=location.longitude,
+                           depth=hc_depth)
+        occurrence_rate = mag_occ_rate * float(np_prob) * float(hc_prob)
+        occurrence_rate *= rate_scaling_factor
+        surface = self._get_rupture_surface(mag, np, hypocenter)
+        return ParametricProbabilisticRupture(
+            mag, np.rake, self.tectonic_region_type, hypocenter,
+            surface, type(self),
+            occurrence_rate, self.temporal_occurrence_model
+        )
+
+    def _get_occurrence_rates(self, rate_scaling_factor=1):
+        """
+        Return the occurrence rates of the ruptures generated at a single
+        location, in the order of :meth:`_iter_ruptures_at_location`, as a
+        1D array, without building the ruptures.
+        """
+        mag_rates = numpy.array(
+            [rate for _mag, rate in self.get_annual_occurrence_rates()])
+        np_probs = numpy.array(
+            [float(prob) for prob, _ in self.nodal_plane_distribution.data])
+        hc_probs = numpy.array(
+            [float(prob) for prob, _ in self.hypocenter_distribution.data])
+        rates = (mag_rates[:, None, None] * np_probs[None, :, None] *
+                 hc_probs[None, None, :])
+        rates *= rate_scaling_factor
+        return rates.ravel()
+
+    def _get_rupture_params(self, index):
+        """
+        Return the parameters of :meth:`_make_rupture` (after the location
+        and the scaling factor) for the rupture with the given index in the
+        order of :meth:`_iter_ruptures_at_location`
+        """
+        mags = self.get_annual_occurrence_rates()
+        nps = self.nodal_plane_distribution.data
+        hcs = self.hypocenter_distribution.data
+        mag_idx, np_idx, hc_idx = numpy.unravel_index(
+            index, (len(mags), len(nps), len(hcs)))
+        return mags[mag_idx] + nps[np_idx] + hcs[hc_idx]
+
+    def sample_ruptures(self, rng=None):
+        """
+        See :meth:
+        `openquake.hazardlib.source.base.BaseSeismicSource.sample_ruptures`.
+
+        The occurrences of all the ruptures are sampled with a single call
+        to the temporal occurrence model.
+        """
+        return get_occurrence_table(
+            self.temporal_occurrence_model.sample_number_of_occurrences(
+                self._get_occurrence_rates(), rng))
+
+    def get_ruptures(self, indices):
+        """
+        Build only the ruptures with the given indices.
+
+        :param indices:
+            Increasing indices of ruptures in the order of
+            :meth:`iter_ruptures`, for instance the field ``rup_idx`` of
+            the table returned by :meth:`sample_ruptures`.
+        :returns:
+            A list of ruptures, one per index.
+        """
+        return [self._make_rupture(self.location, 1,
+                                   *self._get_rupture_params(index))
+                for index in indices]
 
     def count_ruptures(self):
         """
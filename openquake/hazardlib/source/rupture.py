@@ -18,19 +18,23 @@
 Module :mod:`openquake.hazardlib.source.rupture` defines classes
 :class:`Rupture`, :class:`BaseProbabilisticRupture` and its subclasses
 :class:`NonParametricProbabilisticRupture` and
-:class:`ParametricProbabilisticRupture`
+:class:`ParametricProbabilisticRupture`, as well as their compact
+representation :class:`RuptureArray`
 """
 import abc
 import numpy
-import math
 from openquake.hazardlib.geo.nodalplane import NodalPlane
 from openquake.baselib.slots import with_slots
-from openquake.hazardlib.geo.mesh import RectangularMesh
+from openquake.hazardlib.geo.mesh import Mesh, RectangularMesh
 from openquake.hazardlib.geo.point import Point
+from openquake.hazardlib.geo.surface import (
+    PlanarSurface, SimpleFaultSurface, ComplexFaultSurface)
+from openquake.hazardlib.geo.surface.gridded import GriddedSurface
+from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.geo.geodetic import geodetic_distance
-from openquake.hazardlib.near_fault import (get_plane_equation, projection_pp,
-                                            directp, average_s_rad,
-                                            isochone_ratio)
+from openquake.hazardlib.near_fault import (
+    get_plane_equation, get_xyz_from_lonlat, projection_pps, directps,
+    average_s_rads, isochone_ratios)
 from openquake.baselib.python3compat import with_metaclass
 
 
@@ -121,7 +125,7 @@ class BaseProbabilisticRupture(with_metaclass(abc.ABCMeta, Rupture)):
         """
 
     @abc.abstractmethod
-    def sample_number_of_occurrences(self):
+    def sample_number_of_occurrences(self, rng=None):
         """
         Randomly sample number of occurrences from temporal occurrence model
         probability distribution.
@@ -131,6 +135,9 @@ class BaseProbabilisticRupture(with_metaclass(abc.ABCMeta, Rupture)):
             same results numpy random numbers generator needs to be seeded, see
             http://docs.scipy.org/doc/numpy/reference/generated/numpy.random.seed.html
 
+        :param rng:
+            A :class:`numpy.random.RandomState` instance, or ``None``
+            to use the global numpy generator.
         :returns:
             int, Number of rupture occurrences
         """
@@ -199,7 +206,7 @@ class NonParametricProbabilisticRupture(BaseProbabilisticRupture):
 
         return prob_no_exceed
 
-    def sample_number_of_occurrences(self):
+    def sample_number_of_occurrences(self, rng=None):
         """
         See :meth:`superclass method
         <.rupture.BaseProbabilisticRupture.sample_number_of_occurrences>`
@@ -210,7 +217,7 @@ class NonParametricProbabilisticRupture(BaseProbabilisticRupture):
         # compute cdf from pmf
         cdf = numpy.cumsum([float(p) for p, _ in self.pmf.data])
 
-        rn = numpy.random.random()
+        rn = (numpy.random if rng is None else rng).random_sample()
         [n_occ] = numpy.digitize([rn], cdf)
 
         return n_occ
@@ -232,7 +239,7 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         If occurrence rate is not positive.
     """
     __slots__ = Rupture.__slots__ + [
-        'occurrence_rate', 'temporal_occurrence_model']
+        'occurrence_rate', 'temporal_occurrence_model', '_dpp_patches']
 
     def __init__(self, mag, rake, tectonic_region_type, hypocenter, surface,
                  source_typology, occurrence_rate, temporal_occurrence_model,
@@ -245,6 +252,7 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         )
         self.temporal_occurrence_model = temporal_occurrence_model
         self.occurrence_rate = occurrence_rate
+        self._dpp_patches = None
 
     def get_probability_one_or_more_occurrences(self):
         """
@@ -270,7 +278,7 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         rate = self.occurrence_rate
         return tom.get_probability_one_occurrence(rate)
 
-    def sample_number_of_occurrences(self):
+    def sample_number_of_occurrences(self, rng=None):
         """
         Draw a random sample from the distribution and return a number
         of events to occur.
@@ -280,7 +288,7 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         of an assigned temporal occurrence model.
         """
         return self.temporal_occurrence_model.sample_number_of_occurrences(
-            self.occurrence_rate
+            self.occurrence_rate, rng
         )
 
     def get_probability_no_exceedance(self, poes):
@@ -296,6 +304,85 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         rate = self.occurrence_rate
         return tom.get_probability_no_exceedance(rate, poes)
 
+    def _get_dpp_patches(self):
+        """
+        Compute the geometry of the fault patches used in the directivity
+        calculations; it is computed only once per rupture.
+
+        :returns:
+            The origin of the Cartesian frame (the first point of the
+            resampled top edge), the index of the patch containing the
+            hypocentre and a list with, for each patch, the coordinates of
+            its four vertices (see
+            :func:`~openquake.hazardlib.near_fault.get_xyz_from_lonlat`),
+            the normal and the constant term of the plane equation and the
+            maximum length of its top and bottom sides.
+        """
+        if self._dpp_patches is None:
+            top_edge = self.surface.get_resampled_top_edge()
+            upper_depth = self.surface.mesh.depths[0][0]
+            lower_depth = self.surface.mesh.depths[-1][0]
+            dip = self.surface.get_dip()
+            origin = top_edge[0]
+            index_patch = self.surface.hypocentre_patch_index(
+                self.hypocenter, top_edge, upper_depth, lower_depth, dip)
+            patches = []
+            for index in range(1, len(top_edge)):
+                p0, p1, p2, p3 = self.surface.get_fault_patch_vertices(
+                    top_edge, upper_depth, lower_depth, dip,
+                    index_patch=index)
+                normal, dist_to_plane = get_plane_equation(p0, p1, p2, origin)
+                nodes = get_xyz_from_lonlat(
+                    [p.longitude for p in (p0, p1, p2, p3)],
+                    [p.latitude for p in (p0, p1, p2, p3)],
+                    [p.depth for p in (p0, p1, p2, p3)], origin)
+                # the lower bound of the E path value
+                f = max(geodetic_distance(p0.longitude, p0.latitude,
+                                          p1.longitude, p1.latitude),
+                        geodetic_distance(p2.longitude, p2.latitude,
+                                          p3.longitude, p3.latitude))
+                patches.append((nodes, normal, dist_to_plane, f))
+            self._dpp_patches = origin, index_patch, patches
+        return self._dpp_patches
+
+    def get_dppvalues(self, mesh):
+        """
+        Get the directivity prediction values, DPP, at the points of
+        a mesh as described in Spudich et al. (2013).
+
+        :param mesh:
+            :class:`~openquake.hazardlib.geo.mesh.Mesh` of the target sites
+        :returns:
+            An array with the directivity prediction values (DPP).
+        """
+        origin, index_patch, patches = self._get_dpp_patches()
+        depths = (numpy.zeros(mesh.lons.shape) if mesh.depths is None
+                  else mesh.depths)
+        sites = get_xyz_from_lonlat(mesh.lons, mesh.lats, depths, origin)
+        hypo = self.hypocenter
+        hypocenters = get_xyz_from_lonlat(
+            [hypo.longitude], [hypo.latitude], [hypo.depth], origin
+        ).repeat(len(sites), axis=0)
+        dpp = numpy.zeros(len(sites))
+        # the sites whose E path goes through the current patch
+        indices = numpy.arange(len(sites))
+        for nodes, normal, dist_to_plane, f in patches[index_patch - 1:]:
+            site_xyz = sites[indices]
+            pp = projection_pps(site_xyz, normal, dist_to_plane)
+            pd, e, go_next_patch = directps(nodes, hypocenters, pp)
+            fs, rd, r_hyp = average_s_rads(
+                site_xyz, hypocenters, pp, normal, dist_to_plane, e,
+                nodes[0], nodes[1], self.rupture_slip_direction)
+            cprime = isochone_ratios(e, rd, r_hyp)
+            dpp[indices] += (cprime * numpy.maximum(e, 0.1 * f) *
+                             numpy.maximum(fs, 0.2))
+            # the direct point is the hypocentre on the next patch
+            indices = indices[go_next_patch]
+            hypocenters = pd[go_next_patch]
+            if not len(indices):
+                break
+        return numpy.log(dpp)
+
     def get_dppvalue(self, site):
         """
         Get the directivity prediction value, DPP at
@@ -307,77 +394,9 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         :returns:
             A float number, directivity prediction value (DPP).
         """
-
-        origin = self.surface.get_resampled_top_edge()[0]
-        dpp_multi = []
-        index_patch = self.surface.hypocentre_patch_index(
-            self.hypocenter, self.surface.get_resampled_top_edge(),
-            self.surface.mesh.depths[0][0], self.surface.mesh.depths[-1][0],
-            self.surface.get_dip())
-        idx_nxtp = True
-        hypocenter = self.hypocenter
-
-        while idx_nxtp:
-
-            # E Plane Calculation
-            p0, p1, p2, p3 = self.surface.get_fault_patch_vertices(
-                self.surface.get_resampled_top_edge(),
-                self.surface.mesh.depths[0][0],
-                self.surface.mesh.depths[-1][0],
-                self.surface.get_dip(), index_patch=index_patch)
-
-            [normal, dist_to_plane] = get_plane_equation(
-                p0, p1, p2, origin)
-
-            pp = projection_pp(site, normal, dist_to_plane, origin)
-            pd, e, idx_nxtp = directp(
-                p0, p1, p2, p3, hypocenter, origin, pp)
-            pd_geo = origin.point_at(
-                (pd[0] ** 2 + pd[1] ** 2) ** 0.5, -pd[2],
-                numpy.degrees(math.atan2(pd[0], pd[1])))
-
-            # determine the lower bound of E path value
-            f1 = geodetic_distance(p0.longitude,
-                                   p0.latitude,
-                                   p1.longitude,
-                                   p1.latitude)
-            f2 = geodetic_distance(p2.longitude,
-                                   p2.latitude,
-                                   p3.longitude,
-                                   p3.latitude)
-
-            if f1 > f2:
-                f = f1
-            else:
-                f = f2
-
-            fs, rd, r_hyp = average_s_rad(site, hypocenter, origin,
-                                          pp, normal, dist_to_plane, e, p0,
-                                          p1, self.rupture_slip_direction)
-            cprime = isochone_ratio(e, rd, r_hyp)
-
-            dpp_exp = cprime * numpy.maximum(e, 0.1 * f) *\
-                numpy.maximum(fs, 0.2)
-            dpp_multi.append(dpp_exp)
-
-            # check if go through the next patch of the fault
-            index_patch = index_patch + 1
-
-            if (len(self.surface.get_resampled_top_edge())
-                <= 2) and (index_patch >=
-                           len(self.surface.get_resampled_top_edge())):
-
-                idx_nxtp = False
-            elif index_patch >= len(self.surface.get_resampled_top_edge()):
-                idx_nxtp = False
-            elif idx_nxtp:
-                hypocenter = pd_geo
-                idx_nxtp = True
-
-        # calculate DPP value of the site.
-        dpp = numpy.log(numpy.sum(dpp_multi))
-
-        return dpp
+        mesh = Mesh(numpy.array([site.longitude]),
+                    numpy.array([site.latitude]), numpy.array([site.depth]))
+        return self.get_dppvalues(mesh)[0]
 
     def get_cdppvalue(self, target, buf=1.0, delta=0.01, space=2.):
         """
@@ -386,6 +405,12 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
         used in Chiou and Young(2014) GMPE for near-fault directivity
         term prediction.
 
+        The DPP of each target site is centred by subtracting the mean DPP
+        of the points of a grid around the rupture having about the same
+        distance from the rupture. The DPP values of the grid points are
+        computed once for all the target sites, and the mean is computed
+        once for each distance band.
+
         :param target_site:
             A mesh object representing the location of the target sites.
         :param buf:
@@ -415,31 +440,240 @@ class ParametricProbabilisticRupture(BaseProbabilisticRupture):
 
         target_rup = self.surface.get_min_distance(target)
         mesh = RectangularMesh(lons=lons, lats=lats, depths=None)
-        mesh_rup = self.surface.get_min_distance(mesh)
-
-        target_lons = target.lons
-        target_lats = target.lats
-        cdpp = numpy.empty(len(target_lons))
-
-        for iloc, (target_lon, target_lat) in enumerate(zip(target_lons,
-                                                        target_lats)):
-
-            cdpp_sites_lats = mesh.lats[(mesh_rup <= target_rup[iloc] + space)
-                                        & (mesh_rup >= target_rup[iloc]
-                                           - space)]
-            cdpp_sites_lons = mesh.lons[(mesh_rup <= target_rup[iloc] + space)
-                                        & (mesh_rup >= target_rup[iloc]
-                                           - space)]
-
-            dpp_sum = []
-            dpp_target = self.get_dppvalue(Point(target_lon, target_lat))
-
-            for lon, lat in zip(cdpp_sites_lons, cdpp_sites_lats):
-                site = Point(lon, lat, 0.)
-                dpp_one = self.get_dppvalue(site)
-                dpp_sum.append(dpp_one)
-
-            mean_dpp = numpy.mean(dpp_sum)
-            cdpp[iloc] = dpp_target - mean_dpp
+        mesh_rup = self.surface.get_min_distance(mesh).flatten()
+
+        # grid points sorted by distance, so that the points within
+        # ``space`` km from the distance of a target are a slice
+        order = mesh_rup.argsort()
+        mesh_rup = mesh_rup[order]
+        starts = numpy.searchsorted(mesh_rup, target_rup - space, 'left')
+        stops = numpy.searchsorted(mesh_rup, target_rup + space, 'right')
+        keys, inverse = numpy.unique(starts * (len(mesh_rup) + 1) + stops,
+                                     return_inverse=True)
+        bands = numpy.array(divmod(keys, len(mesh_rup) + 1)).T
+        # compute the DPP only for the grid points in the bands
+        cover = numpy.zeros(len(mesh_rup) + 1, int)
+        numpy.add.at(cover, bands[:, 0], 1)
+        numpy.add.at(cover, bands[:, 1], -1)
+        needed = cover.cumsum()[:-1] > 0
+        mesh_dpp = numpy.zeros(len(mesh_rup))
+        mesh_dpp[needed] = self.get_dppvalues(Mesh(
+            mesh.lons.flatten()[order][needed],
+            mesh.lats.flatten()[order][needed], None))
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            mean_dpp = numpy.array([
+                mesh_dpp[start:stop].sum() / (stop - start)
+                for start, stop in bands])
+
+        target_dpp = self.get_dppvalues(Mesh(
+            numpy.asarray(target.lons, float).flatten(),
+            numpy.asarray(target.lats, float).flatten(), None))
+        return target_dpp - mean_dpp[inverse.reshape(-1)]
+
+
+#: surface classes supported by :class:`RuptureArray`, in the order of
+#: the codes stored in the field ``surface_type``
+SURFACE_CLASSES = (PlanarSurface, SimpleFaultSurface, ComplexFaultSurface,
+                   GriddedSurface)
+
+#: dtype of the coordinates of the corners and of the meshes of the
+#: surfaces stored in a :class:`RuptureArray`
+point3d_dt = numpy.dtype([('lon', numpy.float64), ('lat', numpy.float64),
+                          ('depth', numpy.float64)])
+
+#: dtype of the records of a :class:`RuptureArray`; ``occurrence_rate`` and
+#: ``time_span`` are zero for ruptures which are not probabilistic,
+#: ``slip_direction`` is NaN if the rupture slip direction is not set;
+#: the coordinates of the surface are the ``nrows * ncols`` points of the
+#: geometry array starting from ``start``
+rupture_dt = numpy.dtype([
+    ('mag', numpy.float64),
+    ('rake', numpy.float64),
+    ('occurrence_rate', numpy.float64),
+    ('time_span', numpy.float64),
+    ('hypo', point3d_dt),
+    ('slip_direction', numpy.float64),
+    ('trt_idx', numpy.uint16),
+    ('typology_idx', numpy.uint16),
+    ('surface_type', numpy.uint8),
+    ('mesh_spacing', numpy.float64),
+    ('strike', numpy.float64),
+    ('dip', numpy.float64),
+    ('start', numpy.uint32),
+    ('nrows', numpy.uint32),
+    ('ncols', numpy.uint32)])
+
+
+class RuptureArray(object):
+    """
+    Compact representation of a sequence of ruptures, much cheaper to
+    pickle and to store than the rupture objects, for instance to transfer
+    the ruptures of an event based calculation to the tasks computing
+    the ground motion fields. The ruptures are built again by indexing
+    the collection and can be passed to
+    :class:`~openquake.hazardlib.calc.gmf.GmfComputer`.
+
+    Only instances of :class:`Rupture` and
+    :class:`ParametricProbabilisticRupture` with a
+    :class:`~openquake.hazardlib.tom.PoissonTOM`, a surface in
+    :data:`SURFACE_CLASSES` and a source typology exported by
+    :mod:`openquake.hazardlib.source` are supported; the attribute
+    ``surface_nodes`` is not stored.
+
+    :param array:
+        Array of dtype :data:`rupture_dt`, one record per rupture
+    :param geom:
+        Array of dtype :data:`point3d_dt` with the coordinates of the
+        corners of the planar surfaces and of the meshes of the other
+        surfaces
+    :param trts:
+        List of the tectonic region types referenced by the field
+        ``trt_idx``
+    :param typologies:
+        List of the names of the source typologies referenced by the field
+        ``typology_idx``, i.e. of the source classes in
+        :mod:`openquake.hazardlib.source`; the classes are resolved when
+        the ruptures are built again
+    """
+    def __init__(self, array, geom, trts, typologies):
+        self.array = array
+        self.geom = geom
+        self.trts = trts
+        self.typologies = typologies
+
+    @classmethod
+    def from_ruptures(cls, ruptures):
+        """
+        Build a :class:`RuptureArray` from a sequence of ruptures.
 
-        return cdpp
+        :raises TypeError:
+            If a rupture, its surface or its source typology is not
+            supported.
+        """
+        ruptures = list(ruptures)
+        array = numpy.zeros(len(ruptures), rupture_dt)
+        trts, typologies, coords = [], [], []
+        start = 0
+        for rec, rup in zip(array, ruptures):
+            if isinstance(rup, ParametricProbabilisticRupture):
+                tom = rup.temporal_occurrence_model
+                if type(tom) is not PoissonTOM:
+                    raise TypeError('Unsupported temporal occurrence model '
+                                    '%s' % tom.__class__.__name__)
+                rec['occurrence_rate'] = rup.occurrence_rate
+                rec['time_span'] = tom.time_span
+            elif isinstance(rup, BaseProbabilisticRupture):
+                raise TypeError('Unsupported rupture %s' %
+                                rup.__class__.__name__)
+            rec['mag'] = rup.mag
+            rec['rake'] = rup.rake
+            hypo = rup.hypocenter
+            rec['hypo'] = (hypo.longitude, hypo.latitude, hypo.depth)
+            rec['slip_direction'] = (
+                numpy.nan if rup.rupture_slip_direction is None
+                else rup.rupture_slip_direction)
+            rec['trt_idx'] = _get_index(trts, rup.tectonic_region_type)
+            rec['typology_idx'] = _get_index(
+                typologies, _get_typology_name(rup.source_typology))
+            surface = rup.surface
+            if type(surface) not in SURFACE_CLASSES:
+                raise TypeError('Unsupported surface %s' %
+                                surface.__class__.__name__)
+            rec['surface_type'] = SURFACE_CLASSES.index(type(surface))
+            if isinstance(surface, PlanarSurface):
+                rec['mesh_spacing'] = surface.mesh_spacing
+                rec['strike'] = surface.strike
+                rec['dip'] = surface.dip
+                # top left, top right, bottom left, bottom right
+                lons, lats, depths = (surface.corner_lons,
+                                      surface.corner_lats,
+                                      surface.corner_depths)
+                nrows, ncols = 2, 2
+            else:
+                mesh = surface.mesh
+                nrows, ncols = (1, mesh.lons.size) if mesh.lons.ndim == 1 \
+                    else mesh.lons.shape
+                lons, lats = mesh.lons, mesh.lats
+                depths = (numpy.nan if mesh.depths is None
+                          else mesh.depths)
+            coo = numpy.zeros(nrows * ncols, point3d_dt)
+            coo['lon'] = lons.flat
+            coo['lat'] = lats.flat
+            coo['depth'] = numpy.ravel(depths)
+            coords.append(coo)
+            rec['start'] = start
+            rec['nrows'] = nrows
+            rec['ncols'] = ncols
+            start += nrows * ncols
+        geom = (numpy.concatenate(coords) if coords
+                else numpy.zeros(0, point3d_dt))
+        return cls(array, geom, trts, typologies)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        for i in range(len(self.array)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        """
+        Build the rupture with the given index.
+        """
+        rec = self.array[i]
+        hypo = rec['hypo']
+        hypocenter = Point(hypo['lon'], hypo['lat'], hypo['depth'])
+        coo = self.geom[rec['start']:
+                        rec['start'] + rec['nrows'] * rec['ncols']]
+        surface_class = SURFACE_CLASSES[rec['surface_type']]
+        if surface_class is PlanarSurface:
+            tl, tr, bl, br = [Point(*c) for c in coo.tolist()]
+            surface = PlanarSurface(rec['mesh_spacing'], rec['strike'],
+                                    rec['dip'], tl, tr, br, bl)
+        else:
+            if surface_class is GriddedSurface and rec['nrows'] == 1:
+                shape = (rec['ncols'], )
+                mesh_class = Mesh
+            else:
+                shape = (rec['nrows'], rec['ncols'])
+                mesh_class = RectangularMesh
+            lons, lats, depths = [numpy.array(coo[field]).reshape(shape)
+                                  for field in ('lon', 'lat', 'depth')]
+            if numpy.isnan(depths).all():
+                depths = None
+            surface = surface_class(mesh_class(lons, lats, depths))
+        slip = rec['slip_direction']
+        args = (rec['mag'], rec['rake'], self.trts[rec['trt_idx']],
+                hypocenter, surface,
+                _get_typology(self.typologies[rec['typology_idx']]))
+        if rec['time_span'] == 0:
+            return Rupture(*args, rupture_slip_direction=None
+                           if numpy.isnan(slip) else slip)
+        return ParametricProbabilisticRupture(
+            *args, occurrence_rate=rec['occurrence_rate'],
+            temporal_occurrence_model=PoissonTOM(rec['time_span']),
+            rupture_slip_direction=None if numpy.isnan(slip) else slip)
+
+
+def _get_typology_name(typology):
+    # name of a source class exported by openquake.hazardlib.source
+    from openquake.hazardlib import source  # here to avoid circular imports
+    name = getattr(typology, '__name__', None)
+    if name is None or getattr(source, name, None) is not typology:
+        raise TypeError('Unsupported source typology %r' % typology)
+    return name
+
+
+def _get_typology(name):
+    # source class from its name
+    from openquake.hazardlib import source  # here to avoid circular imports
+    return getattr(source, name)
+
+
+def _get_index(values, value):
+    # index of the value in the list, appending it if missing
+    try:
+        return values.index(value)
+    except ValueError:
+        values.append(value)
+        return len(values) - 1
@@ -19,6 +19,7 @@ Module :mod:`openquake.hazardlib.source.simple_fault` defines
 """
 from __future__ import division
 import math
+import numpy
 from openquake.baselib.python3compat import range
 from openquake.hazardlib.source.base import ParametricSeismicSource
 from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
@@ -83,7 +84,11 @@ class SimpleFaultSource(ParametricSeismicSource):
     """
     __slots__ = ParametricSeismicSource.__slots__ + '''upper_seismogenic_depth
     lower_seismogenic_depth fault_trace dip rake hypo_list
-    slip_list'''.split()
+    slip_list _whole_fault_mesh _surface_projection'''.split()
+
+    GEOMETRY_ATTRS = ('fault_trace', 'upper_seismogenic_depth',
+                      'lower_seismogenic_depth', 'dip',
+                      'rupture_mesh_spacing')
 
     def __init__(self, source_id, name, tectonic_region_type,
                  mfd, rupture_mesh_spacing,
@@ -136,15 +141,30 @@ class SimpleFaultSource(ParametricSeismicSource):
         <openquake.hazardlib.source.base.BaseSeismicSource.get_rupture_enclosing_polygon>`
         for parameter and return value definition.
         """
-        polygon = SimpleFaultSurface.surface_projection_from_fault_data(
-            self.fault_trace, self.upper_seismogenic_depth,
-            self.lower_seismogenic_depth, self.dip
-        )
+        if self._surface_projection is None:
+            self._surface_projection = (
+                SimpleFaultSurface.surface_projection_from_fault_data(
+                    self.fault_trace, self.upper_seismogenic_depth,
+                    self.lower_seismogenic_depth, self.dip))
+        polygon = self._surface_projection
         if dilation:
             return polygon.dilate(dilation)
         else:
             return polygon
 
+    def _get_whole_fault_mesh(self):
+        """
+        :returns:
+            The mesh of the whole fault surface; it is computed only once
+            and must not be modified.
+        """
+        if self._whole_fault_mesh is None:
+            self._whole_fault_mesh = SimpleFaultSurface.from_fault_data(
+                self.fault_trace, self.upper_seismogenic_depth,
+                self.lower_seismogenic_depth, self.dip,
+                self.rupture_mesh_spacing).get_mesh()
+        return self._whole_fault_mesh
+
     def iter_ruptures(self):
         """
         See :meth:
@@ -157,11 +177,7 @@ class SimpleFaultSource(ParametricSeismicSource):
         rate of each of those ruptures is the magnitude occurrence rate
         divided by the number of ruptures that can be placed in a fault.
         """
-        whole_fault_surface = SimpleFaultSurface.from_fault_data(
-            self.fault_trace, self.upper_seismogenic_depth,
-            self.lower_seismogenic_depth, self.dip, self.rupture_mesh_spacing
-        )
-        whole_fault_mesh = whole_fault_surface.get_mesh()
+        whole_fault_mesh = self._get_whole_fault_mesh()
         mesh_rows, mesh_cols = whole_fault_mesh.shape
         fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
         fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
@@ -211,17 +227,52 @@ class SimpleFaultSource(ParametricSeismicSource):
                                     rupture_slip_direction
                                 )
 
+    def get_rupture_distances(self, mesh):
+        """
+        Compute the rupture and Joyner-Boore distances between the points
+        of ``mesh`` and the surfaces of all the ruptures generated by
+        :meth:`iter_ruptures`, without building the surfaces.
+
+        The distances from the nodes of the whole fault mesh are computed
+        only once and the distances of each rupture are obtained as minima
+        over sliding windows, see
+        :meth:`~openquake.hazardlib.geo.mesh.RectangularMesh.get_floating_distances`.
+
+        :param mesh:
+            :class:`~openquake.hazardlib.geo.mesh.Mesh` of the points (sites)
+            to calculate distances to.
+        :returns:
+            Two arrays of shape (num_ruptures, N), where N is the number
+            of points of ``mesh``, with the rupture and the Joyner-Boore
+            distances respectively; the rows are in the same order of the
+            ruptures generated by :meth:`iter_ruptures`.
+        """
+        whole_fault_mesh = self._get_whole_fault_mesh()
+        mesh_rows, mesh_cols = whole_fault_mesh.shape
+        fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
+        fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
+        shapes = []
+        for mag, _ in self.get_annual_occurrence_rates():
+            rup_cols, rup_rows = self._get_rupture_dimensions(
+                fault_length, fault_width, mag)
+            shapes.append((rup_rows, rup_cols))
+        results = whole_fault_mesh.get_floating_distances(mesh, shapes)
+        # each surface is repeated for all the hypocenters and slips; if
+        # only one of the lists is given, no ruptures are generated
+        num_hypos, num_slips = len(self.hypo_list), len(self.slip_list)
+        repeat = num_hypos * num_slips if num_hypos or num_slips else 1
+        rrup, rjb = [numpy.concatenate([
+            dists[i].reshape(-1, mesh.lons.size) for dists in results
+        ]).repeat(repeat, axis=0) for i in range(2)]
+        return rrup, rjb
+
     # TODO: fix the count in the case of hypo_list and slip_list
     def count_ruptures(self):
         """
         See :meth:
         `openquake.hazardlib.source.base.BaseSeismicSource.count_ruptures`.
         """
-        whole_fault_surface = SimpleFaultSurface.from_fault_data(
-            self.fault_trace, self.upper_seismogenic_depth,
-            self.lower_seismogenic_depth, self.dip, self.rupture_mesh_spacing
-        )
-        whole_fault_mesh = whole_fault_surface.get_mesh()
+        whole_fault_mesh = self._get_whole_fault_mesh()
         mesh_rows, mesh_cols = whole_fault_mesh.shape
         fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
         fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
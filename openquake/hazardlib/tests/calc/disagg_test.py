@@ -21,9 +21,17 @@ import numpy
 
 from openquake.hazardlib.calc import disagg
 from openquake.hazardlib.calc import filters
+from openquake.hazardlib.calc.hazard_curve import calc_hazard_curves
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.geo import Point, Mesh
-from openquake.hazardlib.site import Site
+from openquake.hazardlib.site import Site, SiteCollection
+from openquake.hazardlib.source import PointSource
+from openquake.hazardlib.pmf import PMF
+from openquake.hazardlib.scalerel import WC1994
+from openquake.hazardlib.gsim.boore_atkinson_2008 import BooreAtkinson2008
+from openquake.hazardlib.geo import NodalPlane
+from openquake.hazardlib.mfd import TruncatedGRMFD
+from openquake.hazardlib.imt import PGA, SA
 
 
 class _BaseDisaggTestCase(unittest.TestCase):
@@ -307,6 +315,31 @@ class ArangeDataInBinsTestCase(unittest.TestCase):
 
         self.assertEqual(diss_matrix.sum(), 0)
 
+    def test_sparse(self):
+        mags = numpy.array([5, 5, 6.5], float)
+        dists = numpy.array([6, 6, 1], float)
+        lons = numpy.array([19, 19, 20.5], float)
+        lats = numpy.array([41.5, 41.5, 40], float)
+        trts = numpy.array([0, 0, 1], int)
+        trt_bins = ['trt1', 'trt2']
+        probs_no_exceed = numpy.array([[0.9, 1.], [0.8, 0.95], [1., 0.5]])
+        bins_data = (mags, dists, lons, lats, trts, trt_bins,
+                     probs_no_exceed)
+        bin_edges = (numpy.array([4, 6, 7], float),
+                     numpy.array([0, 4, 8], float),
+                     numpy.array([18, 20, 21], float),
+                     numpy.array([40, 41, 42], float),
+                     numpy.array([-2, 0, 2], float), trt_bins)
+
+        dense = disagg._arrange_data_in_bins(bins_data, bin_edges)
+        sparse = disagg._arrange_data_in_bins(bins_data, bin_edges,
+                                              sparse=True)
+        self.assertEqual(sparse.shape, dense.shape)
+        self.assertEqual(len(sparse), 3)
+        numpy.testing.assert_array_almost_equal(
+            sorted(sparse.values), [0.05, 0.28, 0.5])
+        numpy.testing.assert_array_almost_equal(sparse.todense(), dense)
+
 
 class DisaggregateTestCase(_BaseDisaggTestCase):
     def test(self):
@@ -450,6 +483,165 @@ class DisaggregateTestCase(_BaseDisaggTestCase):
                 self.assertEqual(expected_warning_msg, str(warning.message))
 
 
+class DisaggregationsTestCase(unittest.TestCase):
+    def make_source(self, source_id, trt, location):
+        return PointSource(
+            source_id=source_id, name=source_id, tectonic_region_type=trt,
+            mfd=TruncatedGRMFD(a_val=3.5, b_val=1.0, min_mag=5.0,
+                               max_mag=6.5, bin_width=0.5),
+            rupture_mesh_spacing=2.0,
+            magnitude_scaling_relationship=WC1994(),
+            rupture_aspect_ratio=1.0,
+            temporal_occurrence_model=PoissonTOM(50.),
+            upper_seismogenic_depth=0.0, lower_seismogenic_depth=10.0,
+            location=location,
+            nodal_plane_distribution=PMF([(1.0, NodalPlane(0, 90, 0))]),
+            hypocenter_distribution=PMF([(1.0, 5.0)]))
+
+    def setUp(self):
+        # the second source is out of the integration distance
+        # of the last site, so the sites have different TRT bins
+        self.sources = [
+            self.make_source('1', 'trt1', Point(0.2, 0.1)),
+            self.make_source('2', 'trt2', Point(-0.3, 0.0)),
+            self.make_source('3', 'trt1', Point(1.0, 0.3))]
+        self.gsims = {'trt1': BooreAtkinson2008(),
+                      'trt2': BooreAtkinson2008()}
+        self.sites = SiteCollection([
+            Site(Point(0.0, 0.0), 800.0, True, 500.0, 2.0),
+            Site(Point(0.3, 0.2), 400.0, True, 500.0, 2.0),
+            Site(Point(1.5, 0.5), 600.0, True, 500.0, 2.0)])
+        self.imtls = {PGA(): numpy.array([[0.1, 0.3], [0.2, 0.4],
+                                          [0.05, 0.1]]),
+                      SA(0.1, 5.0): numpy.array([0.2, 0.3, 0.1])}
+        self.filters = dict(
+            source_site_filter=filters.source_site_distance_filter(100),
+            rupture_site_filter=filters.rupture_site_distance_filter(100))
+
+    def test_same_as_disaggregation(self):
+        result = disagg.disaggregations(
+            self.sources, self.sites, self.imtls, self.gsims,
+            truncation_level=3, n_epsilons=3, mag_bin_width=0.5,
+            dist_bin_width=10, coord_bin_width=0.2, **self.filters)
+        self.assertEqual(len(result), 9)
+        aaae = numpy.testing.assert_array_almost_equal
+        for sid, site in enumerate(self.sites):
+            for imt, imls in self.imtls.items():
+                for lvl, iml in enumerate(imls.reshape(3, -1)[sid]):
+                    bin_edges, matrix = disagg.disaggregation(
+                        self.sources, site, imt, iml, self.gsims,
+                        truncation_level=3, n_epsilons=3,
+                        mag_bin_width=0.5, dist_bin_width=10,
+                        coord_bin_width=0.2, **self.filters)
+                    edges, mat = result[sid, imt, lvl]
+                    for expected, got in zip(bin_edges[:-1], edges[:-1]):
+                        aaae(got, expected)
+                    self.assertEqual(edges[-1], bin_edges[-1])
+                    aaae(mat, matrix)
+        self.assertEqual(result[0, PGA(), 0][0][-1], ['trt1', 'trt2'])
+        self.assertEqual(result[2, PGA(), 0][0][-1], ['trt1'])
+
+    def test_no_contributions(self):
+        far = SiteCollection([Site(Point(10, 10), 800.0, True, 500.0, 2.0)])
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            result = disagg.disaggregations(
+                self.sources, far, {PGA(): [0.1]}, self.gsims,
+                truncation_level=3, n_epsilons=3, mag_bin_width=0.5,
+                dist_bin_width=10, coord_bin_width=0.2, **self.filters)
+        self.assertEqual(result, {(0, PGA(), 0): (None, None)})
+        self.assertEqual(len(w), 1)
+
+
+    def test_hazard_curves_and_disagg(self):
+        imtls = {'PGA': [0.05, 0.1, 0.2, 0.4], 'SA(0.1)': [0.1, 0.2, 0.3]}
+        curves, disagg_data = disagg.calc_hazard_curves_and_disagg(
+            self.sources, self.sites, imtls, self.gsims, 3, **self.filters)
+        expected = calc_hazard_curves(
+            self.sources, self.sites, imtls, self.gsims, 3, **self.filters)
+        for imt in imtls:
+            numpy.testing.assert_array_almost_equal(curves[imt],
+                                                    expected[imt])
+
+        result = disagg_data.disaggregations(
+            self.imtls, n_epsilons=3, mag_bin_width=0.5, dist_bin_width=10,
+            coord_bin_width=0.2)
+        expected = disagg.disaggregations(
+            self.sources, self.sites, self.imtls, self.gsims,
+            truncation_level=3, n_epsilons=3, mag_bin_width=0.5,
+            dist_bin_width=10, coord_bin_width=0.2, **self.filters)
+        self.assertEqual(sorted(result), sorted(expected))
+        for key in expected:
+            edges, matrix = result[key]
+            exp_edges, exp_matrix = expected[key]
+            for got, exp in zip(edges[:-1], exp_edges[:-1]):
+                numpy.testing.assert_array_almost_equal(got, exp)
+            self.assertEqual(edges[-1], exp_edges[-1])
+            numpy.testing.assert_array_almost_equal(matrix, exp_matrix)
+
+
+    def test_probs_no_exceed_nonpoissonian(self):
+        class FakeRupture(object):
+            # a non-poissonian rupture with the same probabilities
+            def __init__(self, no_occurrence):
+                self.no_occurrence = no_occurrence
+
+            def get_probability_no_exceedance(self, poes):
+                return self.no_occurrence ** poes
+        _, data = disagg.calc_hazard_curves_and_disagg(
+            self.sources, self.sites, {'PGA': [0.1, 0.2]}, self.gsims, 3,
+            **self.filters)
+        imls = [0.1, 0.2, 0.05]
+        expected = data.get_probs_no_exceed('PGA', imls, 3)
+        rup_idxs = numpy.unique(data.pairs['rup'])[::3]
+        for rup_idx in rup_idxs:
+            data.ruptures[rup_idx] = FakeRupture(
+                data.no_occurrence[rup_idx])
+            data.no_occurrence[rup_idx] = numpy.nan
+        self.assertGreater(len(data.ruptures), 1)
+        numpy.testing.assert_array_equal(
+            data.get_probs_no_exceed('PGA', imls, 3), expected)
+
+
+    def test_parallel_disaggregation(self):
+        site = list(self.sites)[1]
+        sources = self.sources * 3
+        imt = PGA()
+        bin_edges, matrix = disagg.disaggregation(
+            sources, site, imt, 0.2, self.gsims, truncation_level=3,
+            n_epsilons=3, mag_bin_width=0.5, dist_bin_width=10,
+            coord_bin_width=0.2, **self.filters)
+        mag_bins, dist_bins, lon_bins, lat_bins, eps_bins, trt_bins = \
+            bin_edges
+        args = (sources, site, imt, 0.2, self.gsims, 3, 3, mag_bins,
+                dist_bins, lon_bins, lat_bins)
+        edges1, matrix1 = disagg.parallel_disaggregation(
+            *args, block_size=2, **self.filters)
+        edges2, matrix2 = disagg.parallel_disaggregation(
+            *args, block_size=2, processes=2, **self.filters)
+        self.assertEqual(edges1[-1], trt_bins)
+        self.assertEqual(edges2[-1], trt_bins)
+        # the ruptures are accumulated in the same order
+        numpy.testing.assert_array_equal(matrix2, matrix1)
+        numpy.testing.assert_array_equal(matrix1, matrix)
+
+        # the sparse output and the given TRT bins
+        edges, sparse = disagg.parallel_disaggregation(
+            *args, trt_bins=['trt2', 'trt1'], sparse=True, **self.filters)
+        self.assertEqual(edges[-1], ['trt2', 'trt1'])
+        expected = matrix[..., ::-1]
+        self.assertEqual(len(sparse.values), numpy.count_nonzero(expected))
+        numpy.testing.assert_array_equal(sparse.todense(), expected)
+
+    def test_parallel_disaggregation_unknown_trt(self):
+        with self.assertRaises(ValueError) as ctx:
+            disagg.parallel_disaggregation(
+                self.sources, list(self.sites)[0], PGA(), 0.2, self.gsims,
+                3, 3, [5, 6, 7], [0, 50, 100], [-1, 0, 1], [-1, 0, 1],
+                trt_bins=['trt1'], **self.filters)
+        self.assertIn('trt2', str(ctx.exception))
+
+
 class PMFExtractorsTestCase(unittest.TestCase):
     def setUp(self):
         super(PMFExtractorsTestCase, self).setUp()
@@ -580,3 +772,11 @@ class PMFExtractorsTestCase(unittest.TestCase):
                         [0.999998665328, 0.999969082487, 0.999980380612]],
                        [[0.999447922645, 0.999996344798, 0.999999678475],
                         [0.999981572755, 0.999464007617, 0.999983196102]]])
+
+    def test_sparse(self):
+        coords = numpy.array(self.matrix.nonzero())
+        sparse = disagg.SparseDisaggMatrix(
+            self.matrix.shape, coords, self.matrix[tuple(coords)])
+        numpy.testing.assert_array_equal(sparse.todense(), self.matrix)
+        for extract in disagg.pmf_map.values():
+            self.aae(extract(sparse), extract(self.matrix))
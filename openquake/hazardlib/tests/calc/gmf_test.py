@@ -15,15 +15,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 
+import mock
 import numpy
+import scipy.stats
 from numpy.testing import assert_allclose, assert_array_equal
 
 from openquake.hazardlib import const
-from openquake.hazardlib.imt import SA, PGV
+from openquake.hazardlib.imt import SA, PGV, from_string
 from openquake.hazardlib.site import Site, SiteCollection
 from openquake.hazardlib.geo import Point
 from openquake.hazardlib.calc.gmf import (
-    ground_motion_fields, CorrelationButNoInterIntraStdDevs)
+    ground_motion_fields, CorrelationButNoInterIntraStdDevs, GmfComputer,
+    sample_epsilons)
 from openquake.hazardlib.correlation import JB2009CorrelationModel
 
 
@@ -440,3 +443,118 @@ class GMFCalcCorrelatedTestCase(BaseGMFCalcTestCase):
         s1gmf, s2gmf = gmfs[self.imt1]
         numpy.testing.assert_array_equal(s2gmf, 0)
         numpy.testing.assert_array_almost_equal(s1gmf, 11.1852253)
+
+
+class GmfComputerTestCase(BaseGMFCalcTestCase):
+    def setUp(self):
+        super(GmfComputerTestCase, self).setUp()
+        self.imts = ['PGV', 'SA(10.0)']
+        self.gc = GmfComputer(self.rupture, self.sites, self.imts,
+                              [self.gsim], truncation_level=2)
+
+    def test_compute(self):
+        gmfs = self.gc.compute([41, 42])
+        gs = str(self.gsim)
+        for seed, gmfa in zip([41, 42], gmfs):
+            assert_array_equal(gmfa['idx'], self.sites.indices)
+            result = self.gc._compute(seed, self.gsim, 1)
+            for imt in self.imts:
+                assert_array_equal(gmfa[gs][imt], result[imt][:, 0])
+
+    def test_compute_all(self):
+        gmfs = self.gc.compute_all(self.gsim, 100, seed=41)
+        self.assertEqual(gmfs.shape, (7, 100, 2))
+        expected = ground_motion_fields(
+            self.rupture, self.sites, list(map(from_string, self.imts)),
+            self.gsim, truncation_level=2, realizations=100, seed=41)
+        for i, imt in enumerate(self.imts):
+            assert_array_equal(gmfs[:, :, i],
+                               expected[from_string(imt)])
+
+    def test_compute_all_in_place(self):
+        # the fields are written directly in the returned array
+        with mock.patch.object(self.gc, '_compute',
+                               wraps=self.gc._compute) as compute:
+            gmfs = self.gc.compute_all(self.gsim, 10, seed=41)
+        [(args, _)] = compute.call_args_list
+        self.assertIs(args[3], gmfs)
+        result = self.gc._compute(41, self.gsim, 10)
+        for i, imt in enumerate(self.imts):
+            assert_array_equal(gmfs[:, :, i], result[imt])
+
+
+class GmfComputerIntegrationDistanceTestCase(BaseGMFCalcTestCase):
+    def setUp(self):
+        super(GmfComputerIntegrationDistanceTestCase, self).setUp()
+        self.rupture = mock.Mock()
+        self.rupture.surface.get_joyner_boore_distance.return_value = \
+            numpy.array([10., 250., 20., 300., 500., 30., 200.])
+        self.gsim.expect_same_sitecol = False
+        self.imts = ['PGV', 'SA(10.0)']
+
+    def test_sparse(self):
+        gc = GmfComputer(self.rupture, self.sites, self.imts, [self.gsim],
+                         truncation_level=2, integration_distance=200)
+        assert_array_equal(gc.sites.indices, [0, 2, 5, 6])
+        [gmfa] = gc.compute([42])
+        assert_array_equal(gmfa['idx'], [0, 2, 5, 6])
+        gmfs = gc.compute_all(self.gsim, 10, seed=42)
+        self.assertEqual(gmfs.shape, (4, 10, 2))
+        # the values are the ones of the sites without filtering
+        self.gsim.expect_stddevs = False
+        closer = GmfComputer(self.rupture, self.sites, self.imts, [self.gsim],
+                             truncation_level=0, integration_distance=200)
+        self.gsim.expect_same_sitecol = True
+        full = GmfComputer(self.rupture, self.sites, self.imts, [self.gsim],
+                           truncation_level=0)
+        assert_array_equal(closer.compute_all(self.gsim, 3),
+                           full.compute_all(self.gsim, 3)[[0, 2, 5, 6]])
+
+    def test_no_sites(self):
+        gc = GmfComputer(self.rupture, self.sites, self.imts, [self.gsim],
+                         truncation_level=2, integration_distance=5)
+        self.assertIsNone(gc.sites)
+        [gmfa] = gc.compute([42])
+        self.assertEqual(len(gmfa), 0)
+        self.assertEqual(gc.compute_all(self.gsim, 10).shape, (0, 10, 2))
+
+
+class SampleEpsilonsTestCase(unittest.TestCase):
+    def test_truncated(self):
+        numpy.random.seed(42)
+        eps = sample_epsilons(2.5, (400, 250))
+        self.assertEqual(eps.shape, (400, 250))
+        self.assertLessEqual(numpy.abs(eps).max(), 2.5)
+        stat, _ = scipy.stats.kstest(
+            eps.flatten(), scipy.stats.truncnorm(-2.5, 2.5).cdf)
+        self.assertLess(stat, 0.005)
+
+    def test_untruncated(self):
+        # the same numbers of scipy.stats.norm
+        numpy.random.seed(42)
+        eps = sample_epsilons(None, 1000)
+        numpy.random.seed(42)
+        assert_array_equal(eps, scipy.stats.norm().rvs(size=1000))
+
+    def test_reproducible_with_buffer(self):
+        numpy.random.seed(3)
+        eps = sample_epsilons(3, (10, 2))
+        buf = numpy.zeros((10, 2))
+        numpy.random.seed(3)
+        self.assertIs(sample_epsilons(3, (10, 2), buf), buf)
+        assert_array_equal(buf, eps)
+
+
+class GmfRandomStateTestCase(BaseGMFCalcTestCase):
+    def test_local_generator(self):
+        numpy.random.seed(1)
+        state = numpy.random.get_state()[1].copy()
+        imts = ['PGV', 'SA(10.0)']
+        gc = GmfComputer(self.rupture, self.sites, imts, [self.gsim], 3)
+        gmf1 = gc.compute_all(self.gsim, 10, seed=42)
+        # the global generator is not touched and an integer seed is
+        # the same as a RandomState built from it
+        assert_array_equal(numpy.random.get_state()[1], state)
+        assert_array_equal(
+            gc.compute_all(self.gsim, 10, numpy.random.RandomState(42)),
+            gmf1)
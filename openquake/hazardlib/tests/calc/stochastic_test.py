@@ -13,9 +13,15 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
 import unittest
 
-from openquake.hazardlib.calc.stochastic import stochastic_event_set
+import mock
+import numpy
+
+from openquake.hazardlib.calc.stochastic import (
+    stochastic_event_set, make_rng)
+from openquake.hazardlib.source.base import BaseSeismicSource
 
 
 class StochasticEventSetTestCase(unittest.TestCase):
@@ -116,3 +122,98 @@ class StochasticEventSetTestCase(unittest.TestCase):
             'An error occurred with source id=2. Error: Something bad happened'
         )
         self.assertEqual(expected_error, str(ae.exception))
+
+
+class SeededStochasticEventSetTestCase(unittest.TestCase):
+    class FakeRupture(object):
+        def __init__(self, rate):
+            self.rate = rate
+
+        def sample_number_of_occurrences(self, rng=None):
+            return (numpy.random if rng is None else rng).poisson(self.rate)
+
+    class FakeSource(BaseSeismicSource):
+        def __init__(self, source_id, ruptures):
+            super(SeededStochasticEventSetTestCase.FakeSource,
+                  self).__init__(source_id, 'fake', 'Active Shallow Crust')
+            self.ruptures = ruptures
+
+        def iter_ruptures(self):
+            return iter(self.ruptures)
+
+        def count_ruptures(self):
+            return len(self.ruptures)
+
+        def get_min_max_mag(self):
+            raise NotImplementedError
+
+        def get_rupture_enclosing_polygon(self, dilation=0):
+            raise NotImplementedError
+
+    def setUp(self):
+        self.sources = [
+            self.FakeSource(
+                'src%d' % i, [self.FakeRupture(rate)
+                              for rate in numpy.linspace(.1, 2, 50)])
+            for i in range(6)]
+
+    def test_make_rng(self):
+        def sample(*args):
+            return make_rng(*args).random_sample(5).tolist()
+        self.assertEqual(sample(42, 'src', 1), sample(42, 'src', 1))
+        self.assertNotEqual(sample(42, 'src', 1), sample(43, 'src', 1))
+        self.assertNotEqual(sample(42, 'src', 1), sample(42, 'src', 2))
+        self.assertNotEqual(sample(42, 'src'), sample(42, 'src\0'))
+        self.assertNotEqual(sample(42, 1), sample(42, '1'))
+
+    def test_independent_of_blocks(self):
+        numpy.random.seed(1)
+        state = numpy.random.get_state()[1].copy()
+        ses = list(stochastic_event_set(self.sources, seed=42))
+        self.assertGreater(len(ses), 0)
+        # the global generator is not touched
+        numpy.testing.assert_array_equal(numpy.random.get_state()[1], state)
+        blocks = [list(stochastic_event_set(self.sources[i:i + 4], seed=42))
+                  for i in (0, 4)]
+        self.assertEqual(ses, blocks[0] + blocks[1])
+        self.assertNotEqual(
+            ses, list(stochastic_event_set(self.sources, seed=43)))
+
+    def test_threads(self):
+        expected = [list(stochastic_event_set([src], seed=42))
+                    for src in self.sources]
+        results = [None] * len(self.sources)
+
+        def run(i):
+            results[i] = list(stochastic_event_set([self.sources[i]],
+                                                   seed=42))
+        threads = [threading.Thread(target=run, args=(i, ))
+                   for i in range(len(self.sources))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, expected)
+
+    def test_independent_of_filtering(self):
+        def extract_half_ruptures(ruptures_sites):
+            for rupture, sites in ruptures_sites:
+                if rupture.rate > 1:
+                    yield rupture, sites
+        ses = list(stochastic_event_set(self.sources, seed=42))
+        filtered = list(stochastic_event_set(
+            self.sources, [1, 2, 3],
+            rupture_site_filter=extract_half_ruptures, seed=42))
+        self.assertEqual(filtered, [rup for rup in ses if rup.rate > 1])
+
+    def test_single_pass(self):
+        source = self.sources[0]
+        table = source.sample_ruptures(make_rng(42, source.source_id))
+        expected = []
+        for idx, num_occ in zip(table['rup_idx'], table['n_occ']):
+            expected.extend([source.ruptures[idx]] * num_occ)
+        with mock.patch.object(source, 'iter_ruptures',
+                               wraps=source.iter_ruptures) as iter_ruptures:
+            ses = list(stochastic_event_set([source], seed=42))
+        self.assertEqual(iter_ruptures.call_count, 1)
+        self.assertEqual(ses, expected)
@@ -13,14 +13,18 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import pickle
 import unittest
 
+import mock
 import numpy
 
 from openquake.hazardlib.imt import SA, PGA
-from openquake.hazardlib.correlation import JB2009CorrelationModel
+from openquake.hazardlib.correlation import (
+    JB2009CorrelationModel, VecchiaCorrelationModel)
 from openquake.hazardlib.site import Site, SiteCollection
 from openquake.hazardlib.geo import Point
+from openquake.hazardlib.geo.mesh import Mesh
 
 
 aaae = numpy.testing.assert_array_almost_equal
@@ -134,3 +138,159 @@ class JB2009ApplyCorrelationTestCase(unittest.TestCase):
         actual_corrcoef = cormo._get_correlation_matrix(self.SITECOL, PGA())
         numpy.testing.assert_almost_equal(inferred_corrcoef, actual_corrcoef,
                                           decimal=2)
+
+
+class JB2009CacheTestCase(unittest.TestCase):
+    SITECOL = SiteCollection([Site(Point(2, -40), 1, True, 1, 1),
+                              Site(Point(2, -40.1), 1, True, 1, 1),
+                              Site(Point(2, -39.9), 1, True, 1, 1)])
+
+    def test_distances_shared_between_imts(self):
+        cormo = JB2009CorrelationModel(vs30_clustering=False)
+        with mock.patch.object(Mesh, 'get_distance_matrix',
+                               side_effect=Mesh.get_distance_matrix,
+                               autospec=True) as get_distances:
+            lt1 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL, SA(0.1))
+            lt2 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL, SA(0.2))
+            lt3 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL, PGA())
+            lt4 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL, PGA())
+            # filtered collections with the same sites share the matrix
+            mask = numpy.array([True, False, True])
+            lt5 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL.filter(mask), SA(0.1))
+            lt6 = cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL.filter(mask), SA(0.1))
+        self.assertEqual(get_distances.call_count, 2)
+        self.assertIs(lt3, lt4)
+        self.assertIs(lt5, lt6)
+        self.assertFalse(numpy.allclose(lt1, lt2))
+        aaae(lt1, numpy.linalg.cholesky(
+            cormo._get_correlation_matrix(self.SITECOL, SA(0.1))))
+        aaae(lt5, numpy.linalg.cholesky(
+            cormo._get_correlation_matrix(self.SITECOL.filter(mask),
+                                          SA(0.1))))
+
+    def test_bounded(self):
+        cormo = JB2009CorrelationModel(vs30_clustering=False, cache_size=2)
+        for period in (0.1, 0.2, 0.3):
+            cormo.get_lower_triangle_correlation_matrix(
+                self.SITECOL, SA(period))
+        self.assertEqual(len(cormo._lower_triangles), 2)
+        self.assertEqual(len(cormo._distances), 1)
+
+        cormo = JB2009CorrelationModel(vs30_clustering=False, cache_size=0)
+        cormo.get_lower_triangle_correlation_matrix(self.SITECOL, PGA())
+        self.assertEqual(len(cormo._lower_triangles), 0)
+
+    def test_pickle(self):
+        cormo = JB2009CorrelationModel(vs30_clustering=True, cache_size=3)
+        cormo.get_lower_triangle_correlation_matrix(self.SITECOL, PGA())
+        cormo = pickle.loads(pickle.dumps(cormo))
+        self.assertEqual(cormo.cache_size, 3)
+        self.assertTrue(cormo.vs30_clustering)
+        self.assertEqual(len(cormo._lower_triangles), 0)
+
+
+class VecchiaCorrelationModelTestCase(unittest.TestCase):
+    def setUp(self):
+        rnd = numpy.random.RandomState(42)
+        lons = rnd.uniform(0, .5, 300)
+        lats = rnd.uniform(40, 40.5, 300)
+        self.sitecol = SiteCollection(
+            [Site(Point(lon, lat), 760, True, 1, 1)
+             for lon, lat in zip(lons, lats)])
+        self.exact = JB2009CorrelationModel(vs30_clustering=False)
+
+    def test_exact_with_all_neighbors(self):
+        sitecol = JB2009ApplyCorrelationTestCase.SITECOL
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=2)
+        residuals = numpy.random.RandomState(13).normal(size=(3, 5))
+        lt = self.exact.get_lower_triangle_correlation_matrix(sitecol, PGA())
+        # the factors differ, but the covariances must be the same
+        corr = cormo.apply_correlation(sitecol, PGA(), numpy.eye(3))
+        aaae(numpy.dot(corr, corr.T), numpy.dot(lt, lt.T))
+        self.assertEqual(
+            cormo.apply_correlation(sitecol, PGA(), residuals).shape, (3, 5))
+        error = cormo.get_approximation_error(sitecol, PGA())
+        self.assertLess(error['max'], 1E-6)
+
+    def test_approximation_error(self):
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=20)
+        error = cormo.get_approximation_error(self.sitecol, SA(0.5), 100)
+        self.assertLess(error['max'], 0.02)
+        self.assertLess(error['rms'], 0.002)
+        self.assertLessEqual(error['rms'], error['max'])
+        worse = VecchiaCorrelationModel(self.exact, num_neighbors=2)
+        self.assertGreater(
+            worse.get_approximation_error(self.sitecol, SA(0.5), 100)['rms'],
+            error['rms'])
+
+    def test_approximation_error_batches(self):
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=10)
+        expected = cormo.get_approximation_error(
+            self.sitecol, SA(0.5), 100, batch_size=100)
+        order, lu, stddevs, complete = cormo._get_factor(
+            self.sitecol, SA(0.5))
+        wrapped = mock.Mock(wraps=lu)
+        with mock.patch.object(cormo, '_get_factor', return_value=(
+                order, wrapped, stddevs, complete)):
+            error = cormo.get_approximation_error(
+                self.sitecol, SA(0.5), 100, batch_size=7)
+        # the right-hand sides have at most batch_size columns
+        shapes = [args[0].shape for args, _ in wrapped.solve.call_args_list]
+        self.assertEqual(len(shapes), 2 * 15)
+        self.assertEqual(max(shape[1] for shape in shapes), 7)
+        self.assertAlmostEqual(error['max'], expected['max'])
+        self.assertAlmostEqual(error['rms'], expected['rms'])
+
+    def test_apply_correlation(self):
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=10)
+        sitecol = self.sitecol.filter(numpy.arange(300) < 20)
+        residuals = numpy.random.RandomState(13).normal(size=(20, 50000))
+        corr = cormo.apply_correlation(sitecol, PGA(), residuals)
+        self.assertAlmostEqual(corr.std(), 1, delta=0.01)
+        numpy.testing.assert_allclose(
+            numpy.corrcoef(corr),
+            self.exact._get_correlation_matrix(sitecol, PGA()), atol=0.03)
+
+    def test_cache(self):
+        cormo = VecchiaCorrelationModel(self.exact, cache_size=1)
+        with mock.patch.object(cormo, '_get_neighbors',
+                               side_effect=cormo._get_neighbors) as get:
+            cormo.apply_correlation(self.sitecol, SA(0.1), numpy.zeros(300))
+            cormo.apply_correlation(self.sitecol, SA(0.2), numpy.zeros(300))
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(len(cormo._factors), 1)
+
+    def test_neighbors(self):
+        # the sites in the second half of the order are in a tight cluster,
+        # so that their nearest candidates follow them in the order
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=10)
+        order = numpy.random.RandomState(cormo.seed).permutation(400)
+        rnd = numpy.random.RandomState(7)
+        lons = rnd.uniform(0, 1, 400)
+        lats = rnd.uniform(40, 41, 400)
+        cluster = order[200:]
+        lons[cluster] = 2. + rnd.uniform(0, 1E-3, 200)
+        lats[cluster] = 40. + rnd.uniform(0, 1E-3, 200)
+        sitecol = SiteCollection(
+            [Site(Point(lon, lat), 760, True, 1, 1)
+             for lon, lat in zip(lons, lats)])
+        order, xyz, neighbors, valid = cormo._get_neighbors(sitecol)
+        positions = numpy.arange(400)
+        # every site is conditioned on min(num_neighbors, position) sites
+        # preceding it
+        numpy.testing.assert_array_equal(valid.sum(axis=1),
+                                         numpy.minimum(10, positions))
+        self.assertTrue((neighbors < positions.reshape(-1, 1))[valid].all())
+
+    def test_pickle(self):
+        cormo = VecchiaCorrelationModel(self.exact, num_neighbors=5)
+        cormo.apply_correlation(self.sitecol, PGA(), numpy.zeros(300))
+        cormo = pickle.loads(pickle.dumps(cormo))
+        self.assertEqual(cormo.num_neighbors, 5)
+        self.assertEqual(len(cormo._factors), 0)
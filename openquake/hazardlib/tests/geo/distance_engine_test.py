@@ -0,0 +1,109 @@
+# The Hazard Library
+# Copyright (C) 2016, GEM Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+
+from openquake.hazardlib.geo import Point, Line
+from openquake.hazardlib.geo.distance_engine import DistanceEngine
+from openquake.hazardlib.geo.surface import PlanarSurface, SimpleFaultSurface
+from openquake.hazardlib.gsim.boore_atkinson_2008 import BooreAtkinson2008
+from openquake.hazardlib.site import Site, SiteCollection
+from openquake.hazardlib.source import PointSource, Rupture
+
+
+def make_planar(top_left, strike, dip, length, width):
+    top_right = top_left.point_at(length, 0, strike)
+    hdist = width * numpy.cos(numpy.radians(dip))
+    vdist = width * numpy.sin(numpy.radians(dip))
+    bottom_left = top_left.point_at(hdist, vdist, strike + 90)
+    bottom_right = top_right.point_at(hdist, vdist, strike + 90)
+    return PlanarSurface(1., strike, dip, top_left, top_right,
+                         bottom_right, bottom_left)
+
+
+class DistanceEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        # a grid of sites within 300 km from the center
+        lons, lats = numpy.meshgrid(numpy.linspace(9, 15, 13),
+                                    numpy.linspace(43, 47, 9))
+        self.sites = SiteCollection([
+            Site(Point(lon, lat), 760., True, 100., 5.)
+            for lon, lat in zip(lons.flat, lats.flat)])
+        self.planar = make_planar(Point(11.5, 44.8, 2.), 50., 40., 60., 20.)
+        self.fault = SimpleFaultSurface.from_fault_data(
+            Line([Point(11., 45.5), Point(11.4, 45.7), Point(12., 45.8)]),
+            2., 15., 60., 2.)
+
+    def test_spherical(self):
+        engine = DistanceEngine()
+        mesh = self.sites.mesh
+        numpy.testing.assert_allclose(
+            engine.get_min_distance(self.planar, self.sites),
+            self.planar.get_min_distance(mesh))
+        numpy.testing.assert_allclose(
+            engine.get_joyner_boore_distance(self.planar, self.sites),
+            self.planar.get_joyner_boore_distance(mesh))
+        numpy.testing.assert_allclose(
+            engine.get_min_distance(self.fault, self.sites),
+            self.fault.get_min_distance(mesh))
+
+    def test_local(self):
+        engine = DistanceEngine('local')
+        expected = self.planar.get_joyner_boore_distance(self.sites.mesh)
+        rjb = engine.get_joyner_boore_distance(self.planar, self.sites)
+        # the sites are within 300 km from the origin: error below 0.11%
+        numpy.testing.assert_allclose(rjb, expected, rtol=2E-3, atol=.01)
+        self.assertTrue((rjb == 0).any())
+
+        # rupture distance of a mesh surface
+        expected = self.fault.get_min_distance(self.sites.mesh)
+        rrup = engine.get_min_distance(self.fault, self.sites)
+        numpy.testing.assert_allclose(rrup, expected, rtol=2E-3, atol=.05)
+
+    def test_local_filtered_sites(self):
+        engine = DistanceEngine('local')
+        filtered = self.sites.filter(numpy.arange(len(self.sites)) % 3 == 0)
+        rjb = engine.get_joyner_boore_distance(self.planar, filtered)
+        full = engine.get_joyner_boore_distance(self.planar, self.sites)
+        numpy.testing.assert_allclose(rjb, full[filtered.indices])
+        # the local coordinates are cached once for the complete collection
+        self.assertEqual(len(engine._cache), 1)
+
+    def test_vertical_surface(self):
+        # the projection of the surface is a segment
+        surface = make_planar(Point(12., 45.), 0., 90., 50., 10.)
+        engine = DistanceEngine('local')
+        numpy.testing.assert_allclose(
+            engine.get_joyner_boore_distance(surface, self.sites),
+            surface.get_joyner_boore_distance(self.sites.mesh),
+            rtol=2E-3, atol=.01)
+
+    def test_make_contexts(self):
+        engine = DistanceEngine('local')
+        rupture = Rupture(6., 0., 'Active Shallow Crust', Point(11.5, 44.8, 5),
+                          self.planar, PointSource)
+        gsim = BooreAtkinson2008()  # requires rjb only
+        _, _, dctx = gsim.make_contexts(self.sites, rupture, engine)
+        numpy.testing.assert_array_equal(
+            dctx.rjb, engine.get_joyner_boore_distance(self.planar,
+                                                       self.sites))
+        _, _, dctx = gsim.make_contexts(self.sites, rupture)
+        numpy.testing.assert_array_equal(
+            dctx.rjb, self.planar.get_joyner_boore_distance(self.sites.mesh))
+
+    def test_unknown_mode(self):
+        self.assertRaises(ValueError, DistanceEngine, 'flat')
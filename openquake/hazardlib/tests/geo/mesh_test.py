@@ -15,12 +15,16 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 import math
+import os
+import tempfile
 
 import numpy
 
 from openquake.hazardlib.geo.point import Point
 from openquake.hazardlib.geo.polygon import Polygon
 from openquake.hazardlib.geo.mesh import Mesh, RectangularMesh
+from openquake.hazardlib.geo.mesh import _sliding_min
+from openquake.hazardlib.geo import geodetic
 from openquake.hazardlib.geo import utils as geo_utils
 
 from openquake.hazardlib.tests import assert_angles_equal
@@ -252,6 +256,64 @@ class MeshGetDistanceMatrixTestCase(unittest.TestCase):
             for j in range(i, 4):
                 self.assertEqual(matrix[i, j], matrix[j, i])
 
+    def _random_mesh(self, num_points):
+        rng = numpy.random.RandomState(42)
+        return Mesh(rng.uniform(10, 12, num_points),
+                    rng.uniform(44, 46, num_points), None)
+
+    def test_blocks(self):
+        mesh = self._random_mesh(50)
+        expected = geodetic.geodetic_distance(
+            mesh.lons.reshape(-1, 1), mesh.lats.reshape(-1, 1),
+            mesh.lons, mesh.lats)
+        mesh.CHUNK_SIZE = 120  # blocks of two rows
+        numpy.testing.assert_allclose(mesh.get_distance_matrix(), expected)
+
+    def test_memmap(self):
+        mesh = self._random_mesh(30)
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            out = numpy.memmap(fname, float, 'w+', shape=(30, 30))
+            result = mesh.get_distance_matrix(out)
+            self.assertIs(result, out)
+            out.flush()
+            del out, result
+            stored = numpy.fromfile(fname).reshape(30, 30)
+            numpy.testing.assert_allclose(stored,
+                                          mesh.get_distance_matrix())
+        finally:
+            os.remove(fname)
+
+    def test_sparse(self):
+        mesh = self._random_mesh(200)
+        # two coincident points
+        mesh.lons[1], mesh.lats[1] = mesh.lons[0], mesh.lats[0]
+        dense = numpy.asarray(mesh.get_distance_matrix())
+        mesh.CHUNK_SIZE = 500  # several blocks
+        sparse = mesh.get_sparse_distance_matrix(50)
+        self.assertEqual(sparse.shape, (200, 200))
+        self.assertTrue(sparse.has_sorted_indices)
+        mask = numpy.zeros((200, 200), bool)
+        mask[sparse.nonzero()] = True  # only the non zero values
+        rows = numpy.arange(200).repeat(numpy.diff(sparse.indptr))
+        mask[rows, sparse.indices] = True  # the explicit zeros too
+        numpy.testing.assert_array_equal(mask, dense <= 50)
+        numpy.testing.assert_allclose(sparse.toarray(),
+                                      numpy.where(mask, dense, 0))
+
+
+class SlidingMinTestCase(unittest.TestCase):
+    def test(self):
+        array = numpy.random.RandomState(42).uniform(size=(11, 13))
+        for size in range(1, 12):
+            expected = numpy.array([array[i:i + size].min(axis=0)
+                                    for i in range(12 - size)])
+            numpy.testing.assert_array_equal(
+                _sliding_min(array, size, 0), expected)
+            numpy.testing.assert_array_equal(
+                _sliding_min(array.T, size, 1), expected.T)
+
 
 class MeshConvexHullTestCase(unittest.TestCase):
     def test_two_points(self):
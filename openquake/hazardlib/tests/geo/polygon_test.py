@@ -175,6 +175,19 @@ class PolygonDiscretizeTestCase(unittest.TestCase):
             geo.Point(dist * 4, -dist * 4),
         ])
 
+    def test_cache(self):
+        poly = geo.Polygon([geo.Point(10, 40), geo.Point(14, 41),
+                            geo.Point(13, 45), geo.Point(9, 44)])
+        mesh = poly.discretize(mesh_spacing=20)
+        coords = poly._mesh_coords
+        mesh.lons[:] = 0  # the cached coordinates are not affected
+        mesh2 = poly.discretize(mesh_spacing=20)
+        self.assertIs(poly._mesh_coords, coords)
+        numpy.testing.assert_array_equal(mesh2.lons, coords[0])
+        numpy.testing.assert_array_equal(mesh2.lats, coords[1])
+        self.assertGreater(len(poly.discretize(mesh_spacing=10)), len(mesh2))
+        self.assertIsNot(poly._mesh_coords, coords)
+
 
 class PolygonEdgesTestCase(unittest.TestCase):
     # Test that points very close to the edges of a polygon are actually
@@ -15,12 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 
+import mock
 import numpy
 
 from openquake.hazardlib.geo import Point
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo import utils as geo_utils
-from openquake.hazardlib.geo.surface.planar import PlanarSurface
+from openquake.hazardlib.geo.surface.planar import (
+    PlanarSurface, PlanarSurfaceArray)
 
 from openquake.hazardlib.tests.geo.surface import _planar_test_data as test_data
 from openquake.hazardlib.tests.geo.surface import _utils as utils
@@ -562,3 +564,53 @@ class PlanarSurfaceGetMiddlePointTestCase(unittest.TestCase):
         self.assertTrue(
             Point(0.0, 0.044966, 5.0) == surface.get_middle_point()
         )
+
+
+class PlanarSurfaceArrayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.surfaces = []
+        for i, (strike, dip) in enumerate([(0, 90), (30, 45), (145, 60),
+                                          (270, 20), (359, 80)]):
+            top_left = Point(10 + 0.1 * i, 45 - 0.05 * i, i)
+            top_right = top_left.point_at(10 + 5 * i, 0, strike)
+            hdist = 8 * numpy.cos(numpy.radians(dip))
+            vdist = 8 * numpy.sin(numpy.radians(dip))
+            bottom_left = top_left.point_at(hdist, vdist, strike + 90)
+            bottom_right = top_right.point_at(hdist, vdist, strike + 90)
+            self.surfaces.append(PlanarSurface(
+                1., strike, dip, top_left, top_right, bottom_right,
+                bottom_left))
+        lons, lats = numpy.meshgrid(numpy.linspace(9.5, 11, 7),
+                                    numpy.linspace(44.3, 45.5, 5))
+        self.mesh = Mesh(lons, lats, None)
+
+    def _check(self, method):
+        array = PlanarSurfaceArray(self.surfaces)
+        expected = [getattr(surface, method)(self.mesh)
+                    for surface in self.surfaces]
+        result = getattr(array, method)(self.mesh)
+        self.assertEqual(result.shape, (5, 5, 7))
+        numpy.testing.assert_allclose(result, expected, atol=1E-7)
+        # same results processing the surfaces in blocks
+        with mock.patch.object(PlanarSurfaceArray, 'CHUNK_SIZE', 1):
+            numpy.testing.assert_allclose(
+                getattr(array, method)(self.mesh), result)
+
+    def test_min_distance(self):
+        self._check('get_min_distance')
+
+    def test_joyner_boore_distance(self):
+        self._check('get_joyner_boore_distance')
+
+    def test_rx_distance(self):
+        self._check('get_rx_distance')
+
+    def test_top_edge_depth(self):
+        array = PlanarSurfaceArray(self.surfaces)
+        self.assertEqual(len(array), 5)
+        numpy.testing.assert_array_equal(array.get_top_edge_depth(),
+                                         [0, 1, 2, 3, 4])
+
+    def test_no_surfaces(self):
+        with self.assertRaises(ValueError):
+            PlanarSurfaceArray([])
@@ -13,6 +13,7 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
 import unittest
 import collections
 import mock
@@ -22,10 +23,12 @@ import numpy
 from openquake.hazardlib import const
 from openquake.hazardlib.gsim.base import (
     GMPE, IPE, SitesContext, RuptureContext, DistancesContext,
-    NonInstantiableError, NotVerifiedWarning, DeprecationWarning, deprecated)
+    NonInstantiableError, NotVerifiedWarning, DeprecationWarning, deprecated,
+    CoeffsTable)
+from openquake.hazardlib.gsim.boore_2014 import BooreEtAl2014
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo.point import Point
-from openquake.hazardlib.imt import PGA, PGV
+from openquake.hazardlib.imt import PGA, PGV, SA
 from openquake.hazardlib.site import Site, SiteCollection
 from openquake.hazardlib.source.rupture import Rupture
 
@@ -638,3 +641,99 @@ class DeprecatedTestCase(unittest.TestCase):
         with mock.patch('warnings.warn') as warn:
             dummy()
         self.assertIsNone(warn.call_args)
+
+
+class CoeffsTableTestCase(unittest.TestCase):
+    def test_lazy_parsing(self):
+        ct = CoeffsTable(sa_damping=5, table='''
+            imt   a    b
+            pga   1    2
+            0.1   3    4
+        ''')
+        self.assertIsNone(ct._sa_coeffs)
+        self.assertIsNone(ct._non_sa_coeffs)
+        self.assertEqual(ct[SA(0.1, 5)], dict(a=3, b=4))
+        self.assertEqual(ct.non_sa_coeffs, {PGA(): dict(a=1, b=2)})
+
+    def test_error_at_first_use(self):
+        ct = CoeffsTable(table='''
+            imt   a
+            pga   1
+            0.1   3
+        ''')
+        for _ in range(2):  # the error is raised again at every access
+            with self.assertRaises(TypeError):
+                ct[PGA()]
+
+
+class SharedTermsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.gsim = BooreEtAl2014()
+        self.sctx = SitesContext()
+        self.sctx.vs30 = numpy.array([200., 400., 800.])
+        self.rctx = RuptureContext()
+        self.rctx.mag = 6.
+        self.rctx.rake = 0.
+        self.dctx = DistancesContext()
+        self.dctx.rjb = numpy.array([1., 10., 100.])
+        self.imts = [PGA(), PGV(), SA(0.1), SA(1.0)]
+        self.stddev_types = [const.StdDev.TOTAL]
+
+    def _compute(self, dctx=None):
+        return [self.gsim.get_mean_and_stddevs(
+            self.sctx, self.rctx, dctx or self.dctx, imt, self.stddev_types)
+            for imt in self.imts]
+
+    def test_computed_once(self):
+        expected = self._compute()
+        with mock.patch.object(self.gsim, '_get_pga_on_rock',
+                               wraps=self.gsim._get_pga_on_rock) as pga_rock:
+            with self.gsim.shared_terms():
+                with self.gsim.shared_terms():  # nested blocks share terms
+                    computed = self._compute()
+                computed_again = self._compute()
+            self.assertEqual(pga_rock.call_count, 1)
+            self.assertIsNone(self.gsim._shared_terms)
+            self._compute()
+            self.assertEqual(pga_rock.call_count, 1 + len(self.imts))
+        for results in (computed, computed_again):
+            for (mean, [std]), (exp_mean, [exp_std]) in zip(results,
+                                                            expected):
+                numpy.testing.assert_equal(mean, exp_mean)
+                numpy.testing.assert_equal(std, exp_std)
+
+    def test_different_contexts(self):
+        dctx = DistancesContext()
+        dctx.rjb = self.dctx.rjb * 2
+        expected = self._compute(dctx)
+        with self.gsim.shared_terms():
+            self._compute()
+            computed = self._compute(dctx)
+        for (mean, _), (exp_mean, _) in zip(computed, expected):
+            numpy.testing.assert_equal(mean, exp_mean)
+
+    def test_threads(self):
+        # two threads in a shared_terms block on the same GSIM at once
+        entered = [threading.Event(), threading.Event()]
+        caches, errors = [None, None], []
+
+        def run(i):
+            try:
+                with self.gsim.shared_terms():
+                    entered[i].set()
+                    entered[1 - i].wait(10)
+                    caches[i] = self.gsim._shared_terms
+                    self._compute()
+                    self.assertEqual(len(self.gsim._shared_terms), 1)
+                self.assertIsNone(self.gsim._shared_terms)
+            except Exception as exc:
+                errors.append(exc)
+        threads = [threading.Thread(target=run, args=(i, ))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIsNot(caches[0], caches[1])
+        self.assertIsNone(self.gsim._shared_terms)
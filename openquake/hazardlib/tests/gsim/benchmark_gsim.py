@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# The Hazard Library
+# Copyright (C) 2015, GEM Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Measure the throughput of GMPE/IPE classes on the verification tables used
+by the test suite. The CSV files are converted once into a binary cache
+(numpy ``.npz`` format) and then all the rows sharing the same rupture are
+evaluated together, in a vectorized way. The result is a JSON report that
+can be compared with the report of a previous release to catch performance
+regressions.
+"""
+from __future__ import print_function
+from __future__ import division
+import os
+import csv
+import sys
+import json
+import time
+import inspect
+import hashlib
+import tempfile
+import importlib
+import collections
+
+import numpy
+
+from openquake.hazardlib import const
+from openquake.hazardlib.gsim.base import (SitesContext, RuptureContext,
+                                           DistancesContext)
+from openquake.hazardlib.imt import PGA, PGV, PGD, SA, CAV
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'gsim-benchmark')
+BOOLEAN_SITE_PARAMS = ('site_vs30measured', 'site_backarc')
+
+# a single vectorized call to ``get_mean_and_stddevs``
+Testcase = collections.namedtuple(
+    'Testcase', 'sctx rctx dctx stddev_types expected result_type')
+
+
+def convert_csv(datafile, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Convert a verification table into the ``.npz`` format, unless an
+    up-to-date conversion is already in the cache.
+
+    :param datafile:
+        Path to a test data file in csv format.
+    :param cache_dir:
+        Directory where the converted files are stored; the name of the
+        cached file contains a digest of the csv content, so that a changed
+        table is converted again.
+    :returns:
+        The path of the ``.npz`` file.
+    """
+    with open(datafile, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    name = os.path.splitext(os.path.basename(datafile))[0]
+    cached = os.path.join(cache_dir, '%s-%s.npz' % (name, digest[:12]))
+    if os.path.exists(cached):
+        return cached
+    try:
+        os.makedirs(cache_dir)
+    except OSError:  # already created, possibly by a concurrent process
+        if not os.path.isdir(cache_dir):
+            raise
+    with open(datafile) as f:
+        reader = csv.reader(f)
+        headers = [param_name.lower() for param_name in next(reader)]
+        rows = [row for row in reader if row]
+    rtype_col = headers.index('result_type')
+    values = numpy.zeros((len(rows), len(headers)))
+    for j, param in enumerate(headers):
+        if param in ('result_type', 'component_type'):
+            values[:, j] = numpy.nan
+        else:
+            values[:, j] = [float(row[j]) for row in rows]
+    result_types = numpy.array([row[rtype_col].upper() for row in rows])
+    # write to a temporary name first, so that concurrent benchmarks
+    # never see a partially written file
+    fd, tmp = tempfile.mkstemp(suffix='.npz', dir=cache_dir)
+    os.close(fd)
+    numpy.savez(tmp, headers=numpy.array(headers), values=values,
+                result_types=result_types)
+    os.rename(tmp, cached)
+    return cached
+
+
+def load_testcases(datafile, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Read a verification table (through the binary cache) and group all the
+    rows with the same rupture parameters, result type and damping into a
+    single :class:`Testcase`.
+
+    :param datafile:
+        Path to a test data file in csv format.
+    :param cache_dir:
+        See :func:`convert_csv`.
+    :returns:
+        A list of :class:`Testcase` instances, with the same semantics of
+        the tuples returned by
+        :func:`openquake.hazardlib.tests.gsim.check_gsim._parse_csv`, but
+        also the rows which are not consecutive are grouped.
+    """
+    with numpy.load(convert_csv(datafile, cache_dir)) as npz:
+        headers = [str(h) for h in npz['headers']]
+        values = npz['values']
+        result_types = npz['result_types']
+    rtypes, rtype_idx = numpy.unique(result_types, return_inverse=True)
+    key_cols = [j for j, param in enumerate(headers)
+                if param.startswith('rup_') or param == 'damping']
+    keys = numpy.column_stack([rtype_idx] + [values[:, j] for j in key_cols])
+    # sort the rows by the key columns (the first one is the primary key);
+    # lexsort is stable, so the rows of a group keep their order
+    order = numpy.lexsort(keys.T[::-1])
+    changed = (numpy.diff(keys[order], axis=0) != 0).any(axis=1)
+    splits = numpy.flatnonzero(changed) + 1
+    testcases = []
+    for rows_idx in numpy.split(order, splits):
+        result_type = str(rtypes[rtype_idx[rows_idx[0]]])
+        testcases.append(
+            _build_testcase(headers, values[rows_idx], result_type))
+    return testcases
+
+
+def _build_testcase(headers, rows, result_type):
+    """
+    Build a :class:`Testcase` from a 2D array of rows sharing the same
+    rupture parameters.
+    """
+    sctx = SitesContext()
+    rctx = RuptureContext()
+    dctx = DistancesContext()
+    expected = {}
+    if result_type.endswith('_STDDEV'):
+        stddev_types = [getattr(const.StdDev, result_type[:-len('_STDDEV')])]
+        result_type = 'STDDEV'
+    else:
+        assert result_type == 'MEAN', result_type
+        stddev_types = []
+    damping = None
+    if 'damping' in headers:
+        damping = rows[0, headers.index('damping')]
+    for j, param in enumerate(headers):
+        column = rows[:, j]
+        if param in ('result_type', 'damping', 'component_type'):
+            continue
+        elif param.startswith('site_'):
+            if param in BOOLEAN_SITE_PARAMS:
+                column = column != 0
+            setattr(sctx, param[len('site_'):], column)
+        elif param.startswith('dist_'):
+            setattr(dctx, param[len('dist_'):], column)
+        elif param.startswith('rup_'):
+            setattr(rctx, param[len('rup_'):], float(column[0]))
+        elif param == 'pga':
+            expected[PGA()] = column
+        elif param == 'pgv':
+            expected[PGV()] = column
+        elif param == 'pgd':
+            expected[PGD()] = column
+        elif param == 'cav':
+            expected[CAV()] = column
+        else:
+            assert damping is not None
+            expected[SA(float(param), damping)] = column
+    return Testcase(sctx, rctx, dctx, stddev_types, expected, result_type)
+
+
+def _slice_testcase(testcase, start, stop):
+    """
+    Return a copy of ``testcase`` restricted to the sites in [start, stop)
+    """
+    sctx = SitesContext()
+    dctx = DistancesContext()
+    for ctx, orig in ((sctx, testcase.sctx), (dctx, testcase.dctx)):
+        for slot in orig.__slots__:
+            if hasattr(orig, slot):
+                setattr(ctx, slot, getattr(orig, slot)[start:stop])
+    expected = dict((imt, values[start:stop])
+                    for imt, values in testcase.expected.items())
+    return testcase._replace(sctx=sctx, dctx=dctx, expected=expected)
+
+
+def benchmark_gsim(gsim_cls, datafile, cache_dir=DEFAULT_CACHE_DIR,
+                   rows_per_call=None, repeat=3):
+    """
+    Measure the throughput of a GSIM on a verification table.
+
+    :param gsim_cls:
+        A subclass of either :class:`~openquake.hazardlib.gsim.base.GMPE`
+        or :class:`~openquake.hazardlib.gsim.base.IPE` to benchmark.
+    :param datafile:
+        Path to a test data file in csv format.
+    :param cache_dir:
+        See :func:`convert_csv`.
+    :param rows_per_call:
+        Maximum number of sites passed in a single call to
+        ``get_mean_and_stddevs``; ``None`` means all the rows sharing the
+        same rupture, 1 means the non-vectorized (row by row) mode.
+    :param repeat:
+        How many times each call is repeated; the best time is kept.
+    :returns:
+        A list of dictionaries, one for each (IMT, result type) pair, with
+        keys ``gsim``, ``datafile``, ``imt``, ``result_type``,
+        ``evaluations`` (number of site-evaluations), ``calls``, ``seconds``
+        and ``rate`` (site-evaluations per second).
+    """
+    gsim = gsim_cls()
+    testcases = load_testcases(datafile, cache_dir)
+    if rows_per_call:
+        testcases = [_slice_testcase(tc, start, start + rows_per_call)
+                     for tc in testcases
+                     for start in range(0, len(tc.expected[next(iter(
+                         tc.expected))]), rows_per_call)]
+    stats = collections.OrderedDict()
+    for tc in testcases:
+        rtype = (tc.result_type if not tc.stddev_types
+                 else tc.stddev_types[0])
+        for imt in sorted(tc.expected, key=str):
+            best = None
+            for _ in range(repeat):
+                t0 = time.time()
+                gsim.get_mean_and_stddevs(tc.sctx, tc.rctx, tc.dctx, imt,
+                                          tc.stddev_types)
+                dt = time.time() - t0
+                best = dt if best is None else min(best, dt)
+            key = (str(imt), rtype)
+            evals, calls, seconds = stats.get(key, (0, 0, 0.))
+            stats[key] = (evals + len(tc.expected[imt]), calls + 1,
+                          seconds + best)
+    report = []
+    for (imt, rtype), (evals, calls, seconds) in stats.items():
+        report.append(dict(
+            gsim=gsim_cls.__name__, datafile=os.path.basename(datafile),
+            imt=imt, result_type=rtype, evaluations=evals, calls=calls,
+            seconds=seconds, rate=evals / seconds if seconds else None))
+    return report
+
+
+def discover_tables(package='openquake.hazardlib.tests.gsim'):
+    """
+    Find the (GSIM class, csv file) pairs exercised by the GSIM test suite,
+    by running the test methods with a recording ``check`` method.
+
+    :param package:
+        Name of the package containing the ``*_test.py`` modules.
+    :returns:
+        A sorted list of pairs (GSIM class, absolute path of the csv file).
+    """
+    # imported here since utils imports check_gsim, which uses this module
+    from openquake.hazardlib.tests.gsim.utils import BaseGSIMTestCase
+    pkg = importlib.import_module(package)
+    tables = set()
+    for fname in sorted(os.listdir(os.path.dirname(pkg.__file__))):
+        if not fname.endswith('_test.py'):
+            continue
+        mod = importlib.import_module(package + '.' + fname[:-3])
+        for cls in mod.__dict__.values():
+            if not (inspect.isclass(cls) and
+                    issubclass(cls, BaseGSIMTestCase) and cls.GSIM_CLASS):
+                continue
+            for name in dir(cls):
+                if not name.startswith('test'):
+                    continue
+                case = cls(name)
+                case.check = lambda filename, *args, **kw: tables.add(
+                    (case.GSIM_CLASS,
+                     os.path.join(case.BASE_DATA_PATH, filename)))
+                try:
+                    getattr(case, name)()
+                except Exception:
+                    # tests doing more than calling .check are not
+                    # relevant for the benchmark
+                    pass
+    return sorted(tables, key=lambda pair: (pair[0].__name__, pair[1]))
+
+
+def compare_reports(old, new, tolerance=0.2):
+    """
+    Compare two benchmark reports.
+
+    :param old: a list of records as returned by :func:`benchmark_gsim`
+    :param new: a list of records as returned by :func:`benchmark_gsim`
+    :param tolerance: relative slowdown accepted without complaining
+    :returns:
+        A list of triples (record key, old rate, new rate) for the entries
+        of the new report which are slower than the old ones by more than
+        the given tolerance.
+    """
+    def key(rec):
+        return rec['gsim'], rec['datafile'], rec['imt'], rec['result_type']
+    old_rate = dict((key(rec), rec['rate']) for rec in old)
+    regressions = []
+    for rec in new:
+        rate = old_rate.get(key(rec))
+        if rate and rec['rate'] and rec['rate'] < rate * (1. - tolerance):
+            regressions.append((key(rec), rate, rec['rate']))
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=' '.join(__doc__.split()))
+    parser.add_argument('-g', '--gsim', action='append', default=[],
+                        help='benchmark only the given GSIM class names '
+                        '(can be repeated); by default all the GSIMs '
+                        'with verification tables are benchmarked')
+    parser.add_argument('-o', '--output', default='gsim-benchmark.json',
+                        help='path of the JSON report')
+    parser.add_argument('-c', '--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='directory for the converted tables')
+    parser.add_argument('-n', '--rows-per-call', type=int, default=None,
+                        help='maximum number of sites per call; use 1 '
+                        'for the non-vectorized mode')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of repetitions of each call')
+    parser.add_argument('-b', '--baseline', type=argparse.FileType('r'),
+                        help='JSON report to compare with')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2,
+                        help='relative slowdown accepted when comparing '
+                        'with the baseline')
+    args = parser.parse_args()
+
+    report = []
+    for gsim_cls, datafile in discover_tables():
+        if args.gsim and gsim_cls.__name__ not in args.gsim:
+            continue
+        records = benchmark_gsim(gsim_cls, datafile, args.cache_dir,
+                                 args.rows_per_call, args.repeat)
+        evals = sum(rec['evaluations'] for rec in records)
+        seconds = sum(rec['seconds'] for rec in records)
+        print('%s %s: %d evaluations in %.3f s' % (
+            gsim_cls.__name__, os.path.basename(datafile), evals, seconds),
+            file=sys.stderr)
+        report.extend(records)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print('Saved %d records in %s' % (len(report), args.output),
+          file=sys.stderr)
+    if args.baseline:
+        regressions = compare_reports(
+            json.load(args.baseline), report, args.tolerance)
+        for key, old_rate, new_rate in regressions:
+            print('REGRESSION %s: %.1f -> %.1f evaluations/s' % (
+                ' '.join(map(str, key)), old_rate, new_rate),
+                file=sys.stderr)
+        if regressions:
+            sys.exit(1)
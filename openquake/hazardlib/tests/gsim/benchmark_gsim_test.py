@@ -0,0 +1,78 @@
+# The Hazard Library
+# Copyright (C) 2015, GEM Foundation
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from openquake.hazardlib.gsim.atkinson_boore_2006 import AtkinsonBoore2006
+from openquake.hazardlib.tests.gsim.utils import BaseGSIMTestCase
+from openquake.hazardlib.tests.gsim import benchmark_gsim
+
+MEAN_FILE = os.path.join(BaseGSIMTestCase.BASE_DATA_PATH, 'AB06/AB06_MEAN.csv')
+STD_FILE = os.path.join(BaseGSIMTestCase.BASE_DATA_PATH,
+                        'AB06/AB06_STD_TOTAL.csv')
+
+
+class BenchmarkGSIMTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_convert_once(self):
+        path = benchmark_gsim.convert_csv(MEAN_FILE, self.cache_dir)
+        mtime = os.path.getmtime(path)
+        self.assertEqual(
+            benchmark_gsim.convert_csv(MEAN_FILE, self.cache_dir), path)
+        self.assertEqual(os.path.getmtime(path), mtime)
+
+    def test_load_testcases(self):
+        gsim = AtkinsonBoore2006()
+        testcases = benchmark_gsim.load_testcases(MEAN_FILE, self.cache_dir)
+        with open(MEAN_FILE) as f:
+            num_rows = len(f.readlines()) - 1
+        self.assertEqual(sum(len(tc.sctx.vs30) for tc in testcases),
+                         num_rows)
+        for tc in testcases:
+            self.assertEqual(tc.result_type, 'MEAN')
+            for imt, expected in tc.expected.items():
+                mean, _ = gsim.get_mean_and_stddevs(
+                    tc.sctx, tc.rctx, tc.dctx, imt, tc.stddev_types)
+                numpy.testing.assert_allclose(numpy.exp(mean), expected,
+                                              rtol=1.5E-2)
+
+    def test_benchmark(self):
+        report = benchmark_gsim.benchmark_gsim(
+            AtkinsonBoore2006, STD_FILE, self.cache_dir, repeat=1)
+        self.assertEqual(set(rec['result_type'] for rec in report),
+                         set(['Total']))
+        vectorized = sum(rec['calls'] for rec in report)
+        report = benchmark_gsim.benchmark_gsim(
+            AtkinsonBoore2006, STD_FILE, self.cache_dir, rows_per_call=1,
+            repeat=1)
+        self.assertGreater(sum(rec['calls'] for rec in report), vectorized)
+
+    def test_compare_reports(self):
+        old = [dict(gsim='G', datafile='f.csv', imt='PGA',
+                    result_type='MEAN', rate=100.)]
+        new = [dict(old[0], rate=70.)]
+        self.assertEqual(benchmark_gsim.compare_reports(old, new, .2),
+                         [(('G', 'f.csv', 'PGA', 'MEAN'), 100., 70.)])
+        self.assertEqual(benchmark_gsim.compare_reports(old, new, .5), [])
@@ -33,6 +33,7 @@ from openquake.hazardlib.gsim.base import GroundShakingIntensityModel
 from openquake.hazardlib.gsim.base import (SitesContext, RuptureContext,
                                            DistancesContext)
 from openquake.hazardlib.imt import PGA, PGV, PGD, SA, CAV
+from openquake.hazardlib.tests.gsim.benchmark_gsim import load_testcases
 
 
 def check_gsim(gsim_cls, datafile, max_discrep_percentage, debug=False):
@@ -51,7 +52,9 @@ def check_gsim(gsim_cls, datafile, max_discrep_percentage, debug=False):
         If ``True`` the execution will stop immediately if there is an error
         and a message pointing to a line with a test that failed will show up.
         If ``False`` the GSIM is executed in a vectorized way (if possible)
-        and all the tests are executed even if there are errors.
+        and all the tests are executed even if there are errors; the
+        data file is read through the binary cache of
+        :func:`openquake.hazardlib.tests.gsim.benchmark_gsim.load_testcases`.
 
     :returns:
         A tuple of two elements: a number of errors and a string representing
@@ -64,7 +67,11 @@ def check_gsim(gsim_cls, datafile, max_discrep_percentage, debug=False):
     linenum = 1
     discrepancies = []
     started = time.time()
-    for testcase in _parse_csv(datafile, debug):
+    if debug:
+        testcases = _parse_csv(datafile, debug)
+    else:
+        testcases = load_testcases(datafile.name)
+    for testcase in testcases:
         linenum += 1
         (sctx, rctx, dctx, stddev_types, expected_results, result_type) \
             = testcase
@@ -1,7 +1,9 @@
 import mock
 import unittest
 from nose.tools import assert_equal
-from openquake.hazardlib.gsim import get_available_gsims
+from openquake.baselib.general import run_in_process
+from openquake.hazardlib.gsim import (
+    get_available_gsims, get_gsim_index, get_import_times, GsimRegistry)
 from openquake.hazardlib.gsim.base import GMPE
 
 
@@ -37,3 +39,41 @@ class AvailableGSIMTestCase(unittest.TestCase):
                 assert_equal(list(get_available_gsims().values()),
                              [FakeModule.AtkinsonBoore2006,
                               FakeModule.BooreAtkinson2008])
+
+
+class GsimRegistryTestCase(unittest.TestCase):
+
+    def test_index_is_up_to_date(self):
+        # if this fails, call openquake.hazardlib.gsim.write_gsim_index()
+        assert_equal(GsimRegistry().index, dict(get_gsim_index()))
+
+    def test_lookup_imports_one_module(self):
+        imported = run_in_process(
+            'import sys\n'
+            'from openquake.hazardlib.gsim import get_gsim_class\n'
+            'get_gsim_class("BooreAtkinson2008")\n'
+            'print(sorted(m for m in sys.modules\n'
+            '             if m.startswith("openquake.hazardlib.gsim.")))')
+        assert_equal(imported, ['openquake.hazardlib.gsim.base',
+                                'openquake.hazardlib.gsim.boore_atkinson_2008',
+                                'openquake.hazardlib.gsim.gsim_index'])
+
+    def test_lazy_registry(self):
+        registry = GsimRegistry(
+            {'AtkinsonBoore2006':
+             'openquake.hazardlib.gsim.atkinson_boore_2006'})
+        assert_equal(list(registry), ['AtkinsonBoore2006'])
+        with mock.patch('importlib.import_module', fake_import):
+            assert_equal(registry['AtkinsonBoore2006'],
+                         FakeModule.AtkinsonBoore2006)
+        # the class is cached
+        assert_equal(registry['AtkinsonBoore2006'],
+                     FakeModule.AtkinsonBoore2006)
+        with self.assertRaises(KeyError):
+            registry['BooreAtkinson2008']
+
+    def test_import_times(self):
+        modname = 'openquake.hazardlib.gsim.boore_atkinson_2008'
+        times = get_import_times([modname])
+        assert_equal(list(times), [modname])
+        self.assertGreater(times[modname], 0)
@@ -14,6 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import pickle
+import shutil
+import tempfile
 import unittest
 import collections
 import mock
@@ -25,7 +28,8 @@ from scipy.interpolate import interp1d
 from openquake.hazardlib import const
 from openquake.hazardlib.gsim.gsim_table import (
     SitesContext, RuptureContext, DistancesContext, GMPETable,
-    AmplificationTable, hdf_arrays_to_dict)
+    AmplificationTable, GMPETableData, hdf_arrays_to_dict,
+    hdf_arrays_to_memmaps)
 from openquake.hazardlib.tests.gsim.utils import BaseGSIMTestCase
 from openquake.hazardlib import imt as imt_module
 
@@ -607,6 +611,83 @@ class GSIMTableTestCaseMultiStdDev(unittest.TestCase):
                             expected_imt_set)
 
 
+class GSIMTableSharedDataTestCase(unittest.TestCase):
+    """
+    Tests that the tables are memory mapped and shared between instances
+    """
+    TABLE_FILE = os.path.join(BASE_DATA_PATH, "good_dummy_table.hdf5")
+
+    def _get_mean_and_stddevs(self, gsim):
+        rctx = RuptureContext()
+        rctx.mag = 6.5
+        dctx = DistancesContext()
+        dctx.rjb = np.array([0.5, 1.0, 5.0, 10.0, 100.0, 500.0])
+        sctx = SitesContext()
+        sctx.vs30 = 1000. * np.ones(6)
+        return gsim.get_mean_and_stddevs(sctx, rctx, dctx,
+                                         imt_module.SA(0.7),
+                                         [const.StdDev.TOTAL])
+
+    def test_memmaps(self):
+        with h5py.File(self.TABLE_FILE, "r") as fle:
+            arrays = hdf_arrays_to_memmaps(fle["IMLs"])
+            for key in fle["IMLs"]:
+                self.assertIsInstance(arrays[key], np.memmap)
+                np.testing.assert_array_equal(arrays[key],
+                                              fle["IMLs"][key][:])
+
+    def test_shared_tables(self):
+        gsim1 = GMPETable(gmpe_table=self.TABLE_FILE)
+        gsim2 = GMPETable(gmpe_table=self.TABLE_FILE)
+        self.assertIs(gsim1.imls, gsim2.imls)
+        self.assertIs(gsim1.amplification, gsim2.amplification)
+        mean1, [sigma1] = self._get_mean_and_stddevs(gsim1)
+        mean2, [sigma2] = self._get_mean_and_stddevs(gsim2)
+        np.testing.assert_array_equal(mean1, mean2)
+        np.testing.assert_array_equal(sigma1, sigma2)
+
+    def test_modified_file(self):
+        tmpdir = tempfile.mkdtemp()
+        fname = os.path.join(tmpdir, "table.hdf5")
+        try:
+            shutil.copy(self.TABLE_FILE, fname)
+            data = GMPETableData.get(fname)
+            self.assertIs(GMPETableData.get(fname), data)
+            # a rewritten file replaces the stale entry
+            mtime = os.path.getmtime(fname) + 10
+            os.utime(fname, (mtime, mtime))
+            data2 = GMPETableData.get(fname)
+            self.assertIsNot(data2, data)
+            self.assertEqual(GMPETableData._cache[os.path.abspath(fname)],
+                             (mtime, data2))
+        finally:
+            GMPETableData._cache.pop(os.path.abspath(fname), None)
+            shutil.rmtree(tmpdir)
+
+    def test_interpolation_as_interp1d(self):
+        gsim = GMPETable(gmpe_table=self.TABLE_FILE)
+        periods = gsim.imls["T"][:]
+        iml_table = 10. ** interp1d(np.log10(periods),
+                                    np.log10(gsim.imls["SA"][:]),
+                                    axis=1)(np.log10(0.7))
+        expected = 10. ** interp1d(gsim.m_w, np.log10(iml_table),
+                                   axis=1)(6.5)
+        np.testing.assert_array_almost_equal(
+            gsim._return_tables(6.5, imt_module.SA(0.7), "IMLs"), expected)
+
+    def test_pickle(self):
+        gsim = GMPETable(gmpe_table=self.TABLE_FILE)
+        # the tables are not pickled
+        for name in ("imls", "stddevs", "amplification"):
+            self.assertNotIn(name, gsim.__getstate__())
+        gsim2 = pickle.loads(pickle.dumps(gsim, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(gsim2.GMPE_TABLE, self.TABLE_FILE)
+        mean1, [sigma1] = self._get_mean_and_stddevs(gsim)
+        mean2, [sigma2] = self._get_mean_and_stddevs(gsim2)
+        np.testing.assert_array_equal(mean1, mean2)
+        np.testing.assert_array_equal(sigma1, sigma2)
+
+
 class GSIMTableTestCaseRupture(unittest.TestCase):
     """
     Tests the case when the amplification is based on a rupture parameter
@@ -28,6 +28,11 @@ from openquake.hazardlib.near_fault import vectors2angle
 from openquake.hazardlib.near_fault import average_s_rad
 from openquake.hazardlib.near_fault import isochone_ratio
 from openquake.hazardlib.near_fault import _intersection
+from openquake.hazardlib.near_fault import get_xyz_from_lonlat
+from openquake.hazardlib.near_fault import projection_pps
+from openquake.hazardlib.near_fault import directps
+from openquake.hazardlib.near_fault import average_s_rads
+from openquake.hazardlib.near_fault import isochone_ratios
 from openquake.hazardlib.geo.surface import SimpleFaultSurface
 
 
@@ -174,3 +179,42 @@ class DppParameterTest(unittest.TestCase):
         self.assertAlmostEqual(r_hyp, 50.99, delta=0.1)
         self.assertAlmostEqual(e, 10., delta=0.1)
         self.assertAlmostEqual(c_prime, 0.8688245, delta=0.1)
+
+    def test_vectorized(self):
+        # the vectorized functions give the same results for both sites
+        sites = [Point(10., 44.57, 0.), Point(10.639652, 45.333116, 0.)]
+        xyz = get_xyz_from_lonlat([10., 10.639652], [44.57, 45.333116],
+                                  [0., 0.], self.origin)
+        nodes = get_xyz_from_lonlat(
+            [p.longitude for p in (self.p0, self.p1, self.p2, self.p3)],
+            [p.latitude for p in (self.p0, self.p1, self.p2, self.p3)],
+            [p.depth for p in (self.p0, self.p1, self.p2, self.p3)],
+            self.origin)
+        hypocentres = get_xyz_from_lonlat(
+            [self.hypocentre.longitude] * 2, [self.hypocentre.latitude] * 2,
+            [self.hypocentre.depth] * 2, self.origin)
+        pps = projection_pps(xyz, self.normal, self.dist_to_plane)
+        pds, es, nxtps = directps(nodes, hypocentres, pps)
+        fss, rds, r_hyps = average_s_rads(
+            xyz, hypocentres, pps, self.normal, self.dist_to_plane, es,
+            nodes[0], nodes[1], self.delta_slip)
+        c_primes = isochone_ratios(es, rds, r_hyps)
+        for i, site in enumerate(sites):
+            np.testing.assert_allclose(xyz[i], get_xyz_from_ll(
+                site, self.origin), atol=1E-9)
+            pp = projection_pp(site, self.normal, self.dist_to_plane,
+                               self.origin)
+            np.testing.assert_allclose(pps[i], pp, atol=1E-9)
+            pd, e, idx_nxtp = directp(self.p0, self.p1, self.p2, self.p3,
+                                      self.hypocentre, self.origin, pp)
+            np.testing.assert_allclose(pds[i], pd.flatten(), atol=1E-9)
+            self.assertAlmostEqual(es[i], e[0])
+            self.assertEqual(nxtps[i], idx_nxtp)
+            fs, rd, r_hyp = average_s_rad(
+                site, self.hypocentre, self.origin, pp, self.normal,
+                self.dist_to_plane, e, self.p0, self.p1, self.delta_slip)
+            self.assertAlmostEqual(fss[i], fs[0])
+            self.assertAlmostEqual(rds[i], rd[0])
+            self.assertAlmostEqual(r_hyps[i], r_hyp[0])
+            self.assertAlmostEqual(c_primes[i],
+                                   isochone_ratio(e, rd, r_hyp)[0])
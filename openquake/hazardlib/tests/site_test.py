@@ -271,3 +271,27 @@ class SitePickleTestCase(unittest.TestCase):
         site2 = pickle.loads(pickle.dumps(site1))
 
         self.assertEqual(site1, site2)
+
+    def test_cached_mesh(self):
+        sites = SiteCollection([Site(Point(1, 2), 760.0, True, 100.0, 5.0),
+                                Site(Point(2, 3), 760.0, True, 100.0, 5.0)])
+        self.assertIs(sites.mesh, sites.mesh)
+        xyz = sites.mesh.get_xyz()
+        self.assertIs(sites.mesh.get_xyz(), xyz)
+        filtered = sites.filter(numpy.array([False, True]))
+        numpy.testing.assert_equal(filtered.mesh.get_xyz(), xyz[1:])
+        # the cached mesh is not pickled
+        self.assertNotIn('_mesh', pickle.loads(pickle.dumps(sites)).__dict__)
+
+    def test_cached_mesh_filter_first(self):
+        sites = SiteCollection([Site(Point(1, 2), 760.0, True, 100.0, 5.0),
+                                Site(Point(2, 3), 760.0, True, 100.0, 5.0)])
+        filtered = sites.filter(numpy.array([False, True]))
+        xyz = filtered.mesh.get_xyz()
+        # the coordinates are computed on the complete mesh
+        self.assertIsNotNone(sites.mesh._xyz)
+        numpy.testing.assert_equal(sites.mesh._xyz[1:], xyz)
+        # and reused by the other filtered collections
+        complete_xyz = sites.mesh._xyz
+        sites.filter(numpy.array([True, False])).mesh.get_xyz()
+        self.assertIs(sites.mesh._xyz, complete_xyz)
@@ -25,10 +25,12 @@ from openquake.hazardlib.geo import Point, Polygon, NodalPlane
 from openquake.hazardlib.pmf import PMF
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.source.area import AreaSource
+from openquake.hazardlib.source.base import BaseSeismicSource
 
 from openquake.hazardlib.tests.source.base_test import \
     SeismicSourceFilterSitesTestCase
 from openquake.hazardlib.tests import assert_pickleable
+from openquake.hazardlib.tests.source.point_test import assert_same_ruptures
 
 
 def make_area_source(polygon, discretization, **kwargs):
@@ -110,6 +112,30 @@ class AreaSourceIterRupturesTestCase(unittest.TestCase):
             self.assertEqual(rupture.occurrence_rate, 3.0 / 8.0)
 
 
+class AreaSourceSampleRupturesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.source = make_area_source(
+            Polygon([Point(-2, -2), Point(0, -2), Point(0, 0),
+                     Point(-2, 0)]), discretization=50,
+            rupture_mesh_spacing=5,
+            mfd=TruncatedGRMFD(a_val=5, b_val=1, min_mag=5, max_mag=7,
+                               bin_width=1))
+
+    def test_same_as_ruptures(self):
+        rng1 = numpy.random.RandomState(42)
+        rng2 = numpy.random.RandomState(42)
+        table = self.source.sample_ruptures(rng1)
+        self.assertGreater(len(table), 0)
+        numpy.testing.assert_array_equal(
+            table, BaseSeismicSource.sample_ruptures(self.source, rng2))
+
+    def test_get_ruptures(self):
+        ruptures = list(self.source.iter_ruptures())
+        indices = [0, 1, 3, 7, len(ruptures) - 1]
+        assert_same_ruptures(self.source.get_ruptures(indices),
+                             [ruptures[i] for i in indices])
+
+
 class AreaSourceRupEncPolyTestCase(unittest.TestCase):
     def test_no_dilation(self):
         source = make_area_source(Polygon([Point(-4, -4), Point(-5, -4),
@@ -15,12 +15,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 
+import mock
 import numpy
 
 from openquake.hazardlib.source.complex_fault import (ComplexFaultSource,
                                                       _float_ruptures)
-from openquake.hazardlib.geo import Line, Point
+from openquake.hazardlib.geo import Line, Point, Mesh
+from openquake.hazardlib.mfd import TruncatedGRMFD
 from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
+from openquake.hazardlib.geo.surface.complex_fault import ComplexFaultSurface
 from openquake.hazardlib.scalerel.peer import PeerMSR
 
 from openquake.hazardlib.tests.source import simple_fault_test
@@ -278,6 +281,73 @@ class ComplexFaultSourceRupEnclPolyTestCase(
         )
 
 
+class ComplexFaultRuptureDistancesTestCase(
+        simple_fault_test._BaseFaultSourceTestCase):
+    _make_source = ComplexFaultSourceIterRupturesTestCase.__dict__[
+        '_make_source']
+
+    def setUp(self):
+        # sites close to the fault and more than 40 km far
+        lons, lats = numpy.meshgrid(numpy.linspace(-0.05, 0.15, 6),
+                                    numpy.linspace(-0.05, 0.15, 6))
+        self.mesh = Mesh(numpy.concatenate([lons.flatten(), [0.6, -0.6]]),
+                         numpy.concatenate([lats.flatten(), [0.2, 0.]]))
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=3.0, max_mag=5.0,
+                             bin_width=1.0)
+        # the dip is steeper on the north side
+        edges = [[(0, 0, 0), (0, 0.1, 0)],
+                 [(0.05, 0, 10), (0.03, 0.1, 10)]]
+        self.source = self._make_source(mfd, 1.0, 1.0, edges)
+
+    def test(self):
+        rrup, rjb = self.source.get_rupture_distances(self.mesh)
+        ruptures = list(self.source.iter_ruptures())
+        self.assertEqual(rrup.shape, (len(ruptures), len(self.mesh)))
+        self.assertEqual(rjb.shape, (len(ruptures), len(self.mesh)))
+        for i, rupture in enumerate(ruptures):
+            surface_mesh = rupture.surface.get_mesh()
+            numpy.testing.assert_allclose(
+                rrup[i], rupture.surface.get_min_distance(self.mesh))
+            # the edges are straight, so the enclosing polygon of the
+            # surface is its convex hull
+            numpy.testing.assert_allclose(rjb[i], Mesh(
+                surface_mesh.lons.flatten(), surface_mesh.lats.flatten(),
+                surface_mesh.depths.flatten()
+            ).get_joyner_boore_distance(self.mesh), atol=0.01)
+        self.assertTrue((rjb == 0).any())
+
+
+class ComplexFaultGeometryCacheTestCase(
+        simple_fault_test._BaseFaultSourceTestCase):
+    _make_source = ComplexFaultSourceIterRupturesTestCase.__dict__[
+        '_make_source']
+
+    def setUp(self):
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=3.0, max_mag=5.0,
+                             bin_width=1.0)
+        edges = [[(0, 0, 0), (0, 0.1, 0)],
+                 [(0.05, 0, 10), (0.03, 0.1, 10)]]
+        self.source = self._make_source(mfd, 1.0, 1.0, edges)
+
+    def test_mesh_built_once(self):
+        with mock.patch.object(ComplexFaultSurface, 'from_fault_data',
+                               wraps=ComplexFaultSurface.from_fault_data) \
+                as from_fault_data:
+            num_ruptures = self.source.count_ruptures()
+            self.assertEqual(len(list(self.source.iter_ruptures())),
+                             num_ruptures)
+            self.source.count_ruptures()
+        self.assertEqual(from_fault_data.call_count, 1)
+        self.assertIs(self.source.get_rupture_enclosing_polygon(),
+                      self.source.get_rupture_enclosing_polygon())
+
+    def test_reset(self):
+        num_ruptures = self.source.count_ruptures()
+        self.source.rupture_mesh_spacing = 2.0
+        self.assertIsNone(self.source._cell_dimensions)
+        self.assertLess(self.source.count_ruptures(), num_ruptures)
+
+
 class FloatRupturesTestCase(unittest.TestCase):
     def test_reshaping_along_length(self):
         cell_area = numpy.array([[1, 1, 1],
@@ -20,6 +20,7 @@ from decimal import Decimal
 import numpy
 
 from openquake.hazardlib.const import TRT
+from openquake.hazardlib.source.base import BaseSeismicSource
 from openquake.hazardlib.source.point import PointSource
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 from openquake.hazardlib.mfd import TruncatedGRMFD, EvenlyDiscretizedMFD
@@ -666,3 +667,43 @@ class PointSourceRuptureFilterTestCase(unittest.TestCase):
                 rup, integration_distance=int_dist, sites=self.sitecol
             )
             self.assertIs(filtered, None)
+
+
+def assert_same_ruptures(ruptures1, ruptures2):
+    """
+    Check that two lists of parametric ruptures with planar surfaces are
+    the same
+    """
+    assert len(ruptures1) == len(ruptures2), (len(ruptures1), len(ruptures2))
+    for rup1, rup2 in zip(ruptures1, ruptures2):
+        assert (rup1.mag, rup1.rake, rup1.occurrence_rate) == (
+            rup2.mag, rup2.rake, rup2.occurrence_rate)
+        assert rup1.hypocenter == rup2.hypocenter
+        for attr in ('corner_lons', 'corner_lats', 'corner_depths'):
+            numpy.testing.assert_array_equal(
+                getattr(rup1.surface, attr), getattr(rup2.surface, attr))
+
+
+class PointSourceSampleRupturesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.source = make_point_source(
+            mfd=TruncatedGRMFD(a_val=2, b_val=1, min_mag=3, max_mag=6,
+                               bin_width=0.5),
+            nodal_plane_distribution=PMF([(0.3, NodalPlane(0, 30, 0)),
+                                          (0.7, NodalPlane(90, 60, 90))]),
+            hypocenter_distribution=PMF([(0.5, 2), (0.5, 4)]))
+
+    def test_same_as_ruptures(self):
+        rng1 = numpy.random.RandomState(42)
+        rng2 = numpy.random.RandomState(42)
+        table = self.source.sample_ruptures(rng1)
+        self.assertGreater(len(table), 0)
+        self.assertLess(len(table), self.source.count_ruptures())
+        numpy.testing.assert_array_equal(
+            table, BaseSeismicSource.sample_ruptures(self.source, rng2))
+
+    def test_get_ruptures(self):
+        indices = [0, 5, 6, 23]
+        ruptures = list(self.source.iter_ruptures())
+        assert_same_ruptures(self.source.get_ruptures(indices),
+                             [ruptures[i] for i in indices])
@@ -14,6 +14,7 @@ from __future__ import division
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import pickle
 import unittest
 from nose.plugins.attrib import attr
 
@@ -25,10 +26,12 @@ from openquake.hazardlib.geo import Point, Line
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.source.rupture import Rupture, \
-    ParametricProbabilisticRupture, NonParametricProbabilisticRupture
+    ParametricProbabilisticRupture, NonParametricProbabilisticRupture, \
+    RuptureArray
 from openquake.hazardlib.pmf import PMF
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
+from openquake.hazardlib.geo.surface.gridded import GriddedSurface
 
 
 def make_rupture(rupture_class, **kwargs):
@@ -182,6 +185,34 @@ class Cdppvalue(unittest.TestCase):
 
             self.assertAlmostEqual(dpp, ref_dpp, delta=0.1)
 
+    def test_get_dppvalues(self):
+        # multi-segment fault with an oblique slip
+        fault_trace = Line([Point(10., 45.2), Point(10.1, 45.4),
+                            Point(10.05, 45.6), Point(10.2, 45.8)])
+        surface = SimpleFaultSurface.from_fault_data(
+            fault_trace, 0., 15., dip=80., mesh_spacing=1.)
+        mesh = surface.mesh
+        rupture = self.make_rupture_fordpp(
+            ParametricProbabilisticRupture, occurrence_rate=0.01,
+            temporal_occurrence_model=PoissonTOM(50),
+            hypocenter=Point(mesh.lons[5, 27], mesh.lats[5, 27],
+                             mesh.depths[5, 27]),
+            surface=surface, rupture_slip_direction=-20.)
+        lons = numpy.array([9.5, 10.1, 10.3, 10.6, 10.05])
+        lats = numpy.array([45.1, 45.9, 45.5, 46.3, 44.7])
+        dpps = rupture.get_dppvalues(Mesh(lons, lats, None))
+        # values computed site by site with the previous implementation
+        numpy.testing.assert_allclose(
+            dpps, [0.81615381, 4.40860323, 1.59549415, 4.68563785,
+                   2.2430833])
+        # the patch geometry is cached
+        patches = rupture._dpp_patches
+        self.assertEqual(len(patches[2]), 3)
+        for i in range(len(lons)):
+            self.assertAlmostEqual(
+                rupture.get_dppvalue(Point(lons[i], lats[i])), dpps[i])
+        self.assertIs(rupture._dpp_patches, patches)
+
     @attr('slow')
     def test_get_cdppvalue(self):
         rupture = self.make_rupture_fordpp(
@@ -272,3 +303,93 @@ class NonParametricProbabilisticRuptureTestCase(unittest.TestCase):
         self.assertAlmostEqual(p_occs_0, 0.7, places=2)
         self.assertAlmostEqual(p_occs_1, 0.2, places=2)
         self.assertAlmostEqual(p_occs_2, 0.1, places=2)
+
+
+class RuptureArrayTestCase(unittest.TestCase):
+    def setUp(self):
+        # imported here to avoid circular imports between test modules
+        from openquake.hazardlib.tests.source.point_test import \
+            make_point_source
+        from openquake.hazardlib.source.point import PointSource
+        self.ruptures = list(make_point_source().iter_ruptures())
+        fault = SimpleFaultSurface.from_fault_data(
+            Line([Point(0, 0), Point(0.2, 0.1)]), 2., 12., 60., 2.)
+        self.ruptures.append(ParametricProbabilisticRupture(
+            6.5, 90., const.TRT.ACTIVE_SHALLOW_CRUST, Point(0.1, 0.05, 8),
+            fault, PointSource, 0.01, PoissonTOM(10.),
+            rupture_slip_direction=30.))
+        self.ruptures.append(Rupture(
+            6., 0., const.TRT.ACTIVE_SHALLOW_CRUST, Point(1, 1, 5),
+            GriddedSurface(Mesh(numpy.array([1., 1.1, 1.2]),
+                                numpy.array([1., 1., 1.1]),
+                                numpy.array([4., 5., 6.]))),
+            PointSource))
+        self.sites = Mesh(numpy.array([0., 0.5, 1.]),
+                          numpy.array([0., 0.2, 1.3]), None)
+
+    def assert_same(self, rup1, rup2):
+        self.assertEqual(type(rup1), type(rup2))
+        self.assertEqual(type(rup1.surface), type(rup2.surface))
+        for attr in ('mag', 'rake', 'tectonic_region_type', 'hypocenter',
+                     'source_typology', 'rupture_slip_direction'):
+            self.assertEqual(getattr(rup1, attr), getattr(rup2, attr))
+        if isinstance(rup1, ParametricProbabilisticRupture):
+            self.assertEqual(rup1.occurrence_rate, rup2.occurrence_rate)
+            self.assertEqual(rup1.temporal_occurrence_model,
+                             rup2.temporal_occurrence_model)
+        mesh1, mesh2 = [getattr(rup.surface, 'mesh', None) or
+                        rup.surface.get_mesh() for rup in (rup1, rup2)]
+        for attr in ('lons', 'lats', 'depths'):
+            numpy.testing.assert_array_equal(getattr(mesh1, attr),
+                                             getattr(mesh2, attr))
+        numpy.testing.assert_array_equal(
+            rup1.surface.get_min_distance(self.sites),
+            rup2.surface.get_min_distance(self.sites))
+
+    def test_round_trip(self):
+        array = RuptureArray.from_ruptures(self.ruptures)
+        self.assertEqual(len(array), len(self.ruptures))
+        self.assertEqual(len(array.trts), 2)
+        self.assertEqual(array.typologies, ['PointSource'])
+        array = pickle.loads(pickle.dumps(array, pickle.HIGHEST_PROTOCOL))
+        for rup1, rup2 in zip(self.ruptures, array):
+            self.assert_same(rup1, rup2)
+        self.assert_same(self.ruptures[-2], array[-2])
+
+    def test_smaller_pickle(self):
+        from openquake.hazardlib.geo import Polygon
+        from openquake.hazardlib.tests.source.area_test import \
+            make_area_source
+        ruptures = list(make_area_source(
+            Polygon([Point(0, 0), Point(0, 1), Point(1, 1), Point(1, 0)]),
+            discretization=20).iter_ruptures())
+        self.assertLess(
+            len(pickle.dumps(RuptureArray.from_ruptures(ruptures),
+                             pickle.HIGHEST_PROTOCOL)),
+            len(pickle.dumps(ruptures, pickle.HIGHEST_PROTOCOL)) / 2)
+
+    def test_gmf_computer(self):
+        from openquake.hazardlib.calc.gmf import GmfComputer
+        from openquake.hazardlib.gsim.boore_atkinson_2008 import \
+            BooreAtkinson2008
+        from openquake.hazardlib.site import Site, SiteCollection
+        gsim = BooreAtkinson2008()
+        sites = SiteCollection([
+            Site(Point(lon, lat), 760., True, 100., 5., id=i)
+            for i, (lon, lat) in enumerate(zip(self.sites.lons,
+                                               self.sites.lats))])
+        rupture = RuptureArray.from_ruptures(self.ruptures)[1]
+        gmfs = [GmfComputer(rup, sites, ['PGA'], [gsim], 3).compute_all(
+            gsim, 5, seed=42) for rup in (self.ruptures[1], rupture)]
+        numpy.testing.assert_array_equal(gmfs[0], gmfs[1])
+
+    def test_unsupported(self):
+        rupture = make_rupture(NonParametricProbabilisticRupture,
+                               pmf=PMF([(Decimal('0.8'), 0),
+                                        (Decimal('0.2'), 1)]))
+        self.assertRaises(TypeError, RuptureArray.from_ruptures, [rupture])
+
+    def test_unsupported_typology(self):
+        # the source typology must be a class of hazardlib.source
+        rupture = make_rupture(Rupture)
+        self.assertRaises(TypeError, RuptureArray.from_ruptures, [rupture])
@@ -15,18 +15,22 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
 
+import pickle
+
+import mock
 import numpy
 
 from openquake.baselib.python3compat import range
 from openquake.hazardlib.const import TRT
 from openquake.hazardlib.source.simple_fault import SimpleFaultSource
+from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 from openquake.hazardlib.mfd import TruncatedGRMFD, EvenlyDiscretizedMFD
 import openquake.hazardlib.mfd.evenly_discretized as mfdeven
 import openquake.hazardlib.scalerel.base as msr
 import openquake.hazardlib.tom as tom
 from openquake.hazardlib.scalerel import PeerMSR, WC1994
-from openquake.hazardlib.geo import Point, Line
+from openquake.hazardlib.geo import Point, Line, Mesh
 from openquake.hazardlib.tom import PoissonTOM
 
 
@@ -152,6 +156,98 @@ class SimpleFaultIterRupturesTestCase(_BaseFaultSourceTestCase):
         self.assertEqual(len(list(fault.iter_ruptures())), 1)
 
 
+class SimpleFaultRuptureDistancesTestCase(_BaseFaultSourceTestCase):
+    def setUp(self):
+        # sites close to the fault and more than 40 km far
+        lons, lats = numpy.meshgrid(numpy.linspace(-0.05, 0.1, 7),
+                                    numpy.linspace(-0.05, 0.15, 6))
+        self.mesh = Mesh(numpy.concatenate([lons.flatten(), [0.5, -0.6]]),
+                         numpy.concatenate([lats.flatten(), [0.2, 0.]]))
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=3.0, max_mag=5.0,
+                             bin_width=1.0)
+        self.source = self._make_source(
+            mfd=mfd, aspect_ratio=1.0,
+            fault_trace=Line([Point(0.0, 0.0), Point(0.0, 0.1)]))
+
+    def test(self):
+        rrup, rjb = self.source.get_rupture_distances(self.mesh)
+        ruptures = list(self.source.iter_ruptures())
+        self.assertEqual(rrup.shape, (len(ruptures), len(self.mesh)))
+        self.assertEqual(rjb.shape, (len(ruptures), len(self.mesh)))
+        for i, rupture in enumerate(ruptures):
+            surface_mesh = rupture.surface.get_mesh()
+            numpy.testing.assert_allclose(
+                rrup[i], rupture.surface.get_min_distance(self.mesh))
+            # the surfaces are planar, so the enclosing polygon of the
+            # surface is its convex hull
+            numpy.testing.assert_allclose(rjb[i], Mesh(
+                surface_mesh.lons.flatten(), surface_mesh.lats.flatten(),
+                surface_mesh.depths.flatten()
+            ).get_joyner_boore_distance(self.mesh), atol=0.01)
+        self.assertTrue((rjb == 0).any())
+
+    def test_hypo_list(self):
+        rrup, rjb = self.source.get_rupture_distances(self.mesh)
+        self.source.hypo_list = numpy.array([[0.25, 0.25, 0.4],
+                                             [0.75, 0.75, 0.6]])
+        self.source.slip_list = numpy.array([[90., 1.]])
+        rrup2, rjb2 = self.source.get_rupture_distances(self.mesh)
+        # each surface is repeated for the two hypocenters
+        self.assertEqual(len(rrup2), 2 * len(rrup))
+        numpy.testing.assert_array_equal(rrup2[::2], rrup)
+        numpy.testing.assert_array_equal(rrup2[1::2], rrup)
+        numpy.testing.assert_array_equal(rjb2[1::2], rjb)
+
+        # no ruptures if only the hypocenters are given
+        self.source.slip_list = numpy.zeros((0, 2))
+        self.assertEqual(list(self.source.iter_ruptures()), [])
+        rrup3, rjb3 = self.source.get_rupture_distances(self.mesh)
+        self.assertEqual(len(rrup3), 0)
+        self.assertEqual(len(rjb3), 0)
+
+
+class SimpleFaultGeometryCacheTestCase(_BaseFaultSourceTestCase):
+    def setUp(self):
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=3.0, max_mag=5.0,
+                             bin_width=1.0)
+        self.source = self._make_source(mfd=mfd, aspect_ratio=1.0)
+
+    def test_mesh_built_once(self):
+        with mock.patch.object(SimpleFaultSurface, 'from_fault_data',
+                               wraps=SimpleFaultSurface.from_fault_data) \
+                as from_fault_data:
+            num_ruptures = self.source.count_ruptures()
+            self.assertEqual(len(list(self.source.iter_ruptures())),
+                             num_ruptures)
+            self.source.count_ruptures()
+        self.assertEqual(from_fault_data.call_count, 1)
+        self.assertIs(self.source.get_rupture_enclosing_polygon(),
+                      self.source.get_rupture_enclosing_polygon())
+
+    def test_reset(self):
+        num_ruptures = self.source.count_ruptures()
+        polygon = self.source.get_rupture_enclosing_polygon()
+        # a steeper fault has fewer ruptures along the width
+        self.source.dip = 90
+        self.assertLess(self.source.count_ruptures(), num_ruptures)
+        self.assertLess(
+            numpy.ptp(self.source.get_rupture_enclosing_polygon().lons),
+            numpy.ptp(polygon.lons))
+        # modifications in place need an explicit reset
+        self.source.fault_trace.points.pop()
+        shorter = self.source.count_ruptures()
+        self.source.reset_geometry()
+        self.assertLess(self.source.count_ruptures(), shorter)
+
+    def test_pickle(self):
+        self.source.count_ruptures()
+        source = pickle.loads(pickle.dumps(self.source))
+        self.assertIsNone(source._whole_fault_mesh)
+        self.assertEqual(source, self.source)
+        self.assertEqual(source.count_ruptures(),
+                         self.source.count_ruptures())
+
+
 class SimpleFaultParametersChecksTestCase(_BaseFaultSourceTestCase):
 
     def test_mesh_spacing_too_small(self):
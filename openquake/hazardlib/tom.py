@@ -65,7 +65,7 @@ class PoissonTOM(object):
         """
         return scipy.stats.poisson(occurrence_rate * self.time_span).pmf(1)
 
-    def sample_number_of_occurrences(self, occurrence_rate):
+    def sample_number_of_occurrences(self, occurrence_rate, rng=None):
         """
         Draw a random sample from the distribution and return a number
         of events to occur.
@@ -75,11 +75,16 @@ class PoissonTOM(object):
 
         :param occurrence_rate:
             The average number of events per year.
+        :param rng:
+            A :class:`numpy.random.RandomState` instance, or ``None``
+            to use the global numpy generator.
         :return:
             Sampled integer number of events to occur within model's
             time span.
         """
-        return numpy.random.poisson(occurrence_rate * self.time_span)
+        if rng is None:
+            rng = numpy.random
+        return rng.poisson(occurrence_rate * self.time_span)
 
     def get_probability_no_exceedance(self, occurrence_rate, poes):
         """